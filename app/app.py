@@ -2,7 +2,8 @@ import os
 from flask import Flask, jsonify, render_template, request
 from flask_cors import CORS
 from dotenv import load_dotenv
-from config.config import Config
+from config.config import Config, db_pool
+from config import unit_of_work
 
 #importa os blueprints
 from back.routes.usuario_routes import usuario_bp
@@ -14,6 +15,7 @@ from back.routes.historico_routes import historico_bp
 from back.routes.horario_routes import horario_bp
 from back.routes.preferencia_routes import preferencia_bp
 from back.routes.aprovacao_routes import aprovacao_bp
+from back.utils import bcrypt_pool, manutencao, agendador, campanha_stream
 #from back.routes.contato_routes import contato_bp
 
 #carrega variáveis de ambiente
@@ -31,6 +33,11 @@ app = Flask(
 app.config["JSON_SORT_KEYS"] = False
 app.config["SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY", "chave insegura para desenvolvimento")
 
+# uma conexão e uma transação por requisição
+unit_of_work.init_app(app, db_pool)
+manutencao.init_app(app)
+agendador.init_app(app)
+
 #CORS SIMPLES permite todas as origens em desenvolvimento configurar origins específicas em produção
 CORS(app)
 
@@ -148,7 +155,11 @@ def health_check():
     # rota da saude kkk
     return jsonify({
         "success": True,
-        "status": "healthy"
+        "status": "healthy",
+        "pool": db_pool.stats(),
+        "bcrypt": bcrypt_pool.stats(),
+        "agendador": agendador.stats(),
+        "sse": campanha_stream.stats()
     }), 200
 
 # tratamentos
@@ -6,7 +6,12 @@ from .models import (
     EstoqueModel,
     HistoricoModel,
     HorarioFuncionamentoModel,
-    PreferenciaModel
+    PreferenciaModel,
+    ArquivoModel,
+    IdempotenciaModel,
+    EstoqueNaoEncontradoError,
+    EstoqueInsuficienteError,
+    SlotIndisponivelError
 )
 
 __all__ = [
@@ -17,5 +22,10 @@ __all__ = [
     'EstoqueModel',
     'HistoricoModel',
     'HorarioFuncionamentoModel',
-    'PreferenciaModel'
+    'PreferenciaModel',
+    'ArquivoModel',
+    'IdempotenciaModel',
+    'EstoqueNaoEncontradoError',
+    'EstoqueInsuficienteError',
+    'SlotIndisponivelError'
 ]
\ No newline at end of file
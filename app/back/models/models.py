@@ -1,14 +1,71 @@
+import os
+import random
+from decimal import Decimal
 from config.config import get_db_manager
-from datetime import datetime
-from back.utils.auth_utils import only_numbers, is_cnpj, is_cpf
+from datetime import datetime, date, timedelta
+from back.utils.auth_utils import only_numbers, is_cnpj, is_cpf, invalidar_principal
+from back.utils.hemocentro_service import invalidar_hemocentros
+from back.utils.estoque_service import atualizar_snapshot, invalidar_snapshot
+from back.utils.vagas_service import invalidar_vagas
+from back.utils.slots import intervalo_utc_do_dia_local
+from back.utils.elegibilidade_service import invalidar_elegibilidade
+from back.utils.campanha_service import invalidar_catalogo, tipos_da_campanha, RECEPTORES_COMPATIVEIS
+from back.utils.campanha_stream import publicar as publicar_progresso
+
+class SlotIndisponivelError(ValueError):
+    pass
+
+# filtros por dia viram intervalos [inicio, fim) sobre a coluna, sem DATE(coluna),
+# para o MySQL conseguir usar os índices em data_hora
+def _inicio_do_dia(dia):
+    if isinstance(dia, str):
+        dia = date.fromisoformat(dia[:10])
+    if isinstance(dia, datetime):
+        dia = dia.date()
+    return datetime.combine(dia, datetime.min.time())
+
+def _intervalo_do_dia(dia):
+    inicio = _inicio_do_dia(dia)
+    return inicio, inicio + timedelta(days=1)
+
+# agendamentos encerrados e doações mais velhos que isso vão para as tabelas de arquivo
+# (manutencao arquivar). consultas só leem o arquivo quando o período pedido chega lá
+# ou quando o histórico completo é pedido explicitamente.
+ARQUIVO_RETENCAO_DIAS = max(365, int(os.getenv('ARQUIVO_RETENCAO_DIAS', '730')))
+
+def _corte_arquivo():
+    return datetime.combine(date.today() - timedelta(days=ARQUIVO_RETENCAO_DIAS), datetime.min.time())
+
+def _alcanca_arquivo(desde):
+    return desde is not None and _inicio_do_dia(desde) < _corte_arquivo()
+
+def _tabela_agendamento(incluir_arquivo):
+    return 'AgendamentoCompleto' if incluir_arquivo else 'Agendamento'
+
+def _tabela_historico(incluir_arquivo):
+    return 'HistoricoDoacoesCompleto' if incluir_arquivo else 'HistoricoDoacoes'
 
 class AgendamentoModel:
+    # status que não ocupam vaga no slot
+    STATUS_SEM_VAGA = ('cancelado', 'nao_compareceu')
+    # status de origem aceitos em cada transição feita em lote
+    TRANSICOES_LOTE = {
+        'confirmado': ('pendente',),
+        'nao_compareceu': ('pendente', 'confirmado')
+    }
+
     # ALTER TABLE Agendamento ADD COLUMN tipo_sangue_doado ENUM('sangue_total', 'plaquetas', 'plasma', 'aferese') NOT NULL DEFAULT 'sangue_total';    
     @staticmethod
     def criar(id_usuario, id_hemocentro, data_hora, tipo_sangue_doado='sangue_total',
-              id_campanha=None, status='pendente', observacoes=None):
+              id_campanha=None, status='pendente', observacoes=None, tipo_doacao=None,
+              slot_inicio=None, capacidade_slot=None):
         with get_db_manager() as db:
-            if id_campanha:
+            if slot_inicio is not None:
+                AgendamentoModel._reservar_slot(db, id_hemocentro, slot_inicio, capacidade_slot)
+            # tipo_doacao pode vir pronto do preflight (evita recontar os agendamentos do usuário)
+            if tipo_doacao:
+                tipo_doacao_enum = tipo_doacao
+            elif id_campanha:
                 tipo_doacao_enum = 'campanha'
             else:
                 primeira_vez = AgendamentoModel._verificar_primeira_vez(id_usuario)
@@ -16,9 +73,9 @@ class AgendamentoModel:
             sql = """
                 INSERT INTO Agendamento (
                     id_usuario, id_hemocentro, id_campanha, data_hora, 
-                    status, tipo_doacao, tipo_sangue_doado, observacoes
+                    status, tipo_doacao, tipo_sangue_doado, observacoes, slot_inicio
                 )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
             valores = (
                 id_usuario,
@@ -28,23 +85,110 @@ class AgendamentoModel:
                 status,
                 tipo_doacao_enum,
                 tipo_sangue_doado,
-                observacoes
+                observacoes,
+                slot_inicio
             )
             db.execute(sql, valores)
             agendamento_id = db.lastrowid
             return AgendamentoModel.buscar_por_id(agendamento_id)
     
+    # reserva uma vaga no slot com incremento condicional: sem COUNT(*) e sem overbooking,
+    # o próprio UPDATE decide se ainda há vaga (a linha do slot fica travada até o commit).
+    # slot ainda sem linha: cria já com 1 reserva; se outro pedido criou ao mesmo tempo, tenta o UPDATE de novo.
+    @staticmethod
+    def _reservar_slot(db, id_hemocentro, slot_inicio, capacidade):
+        sql_reservar = """
+            UPDATE AgendamentoSlot
+            SET reservados = reservados + 1
+            WHERE id_hemocentro = %s AND slot_inicio = %s AND reservados < %s
+        """
+        params = (id_hemocentro, slot_inicio, capacidade)
+        db.execute(sql_reservar, params)
+        reservado = db.rowcount > 0
+        if not reservado and capacidade > 0:
+            sql_criar = """
+                INSERT IGNORE INTO AgendamentoSlot (id_hemocentro, slot_inicio, reservados)
+                VALUES (%s, %s, 1)
+            """
+            db.execute(sql_criar, (id_hemocentro, slot_inicio))
+            reservado = db.rowcount > 0
+            if not reservado:
+                db.execute(sql_reservar, params)
+                reservado = db.rowcount > 0
+        if reservado:
+            db.after_commit(lambda: invalidar_vagas(id_hemocentro, slot_inicio))
+            return
+        raise SlotIndisponivelError("Não há mais vagas neste horário. Escolha outro horário.")
+    
+    # devolve a vaga quando o agendamento sai de um status que ocupa vaga (antes de mudar o status)
+    @staticmethod
+    def _liberar_slot(db, agendamento_id):
+        sql_agendamento = """
+            SELECT id_hemocentro, slot_inicio FROM Agendamento
+            WHERE id_agendamento = %s
+            AND status NOT IN ('cancelado', 'nao_compareceu')
+            AND slot_inicio IS NOT NULL
+            FOR UPDATE
+        """
+        db.execute(sql_agendamento, (agendamento_id,))
+        agendamento = db.fetchone()
+        if not agendamento:
+            return
+        id_hemocentro, slot_inicio = agendamento['id_hemocentro'], agendamento['slot_inicio']
+        sql = """
+            UPDATE AgendamentoSlot
+            SET reservados = reservados - 1
+            WHERE id_hemocentro = %s AND slot_inicio = %s AND reservados > 0
+        """
+        db.execute(sql, (id_hemocentro, slot_inicio))
+        db.after_commit(lambda: invalidar_vagas(id_hemocentro, slot_inicio))
+    
+    # tudo que a criação de agendamento precisa validar, numa consulta só.
+    # a linha do usuário fica travada (FOR UPDATE) até o fim da transação da requisição, então
+    # dois pedidos simultâneos do mesmo doador são validados um depois do outro.
+    # as subconsultas não herdam o lock: hemocentro e campanha não são travados.
+    # hemocentro_ativo / campanha_ativa vêm NULL quando o registro não existe.
+    @staticmethod
+    def preflight(id_usuario, id_hemocentro, data_hora, id_campanha=None):
+        # "no mesmo dia" é o dia local do hemocentro; data_hora (UTC) é comparado com os limites dele em UTC
+        dia_inicio, dia_fim = intervalo_utc_do_dia_local(data_hora)
+        with get_db_manager() as db:
+            sql = """
+                SELECT
+                    u.id_usuario,
+                    (SELECT COALESCE(h.ativo, 0) FROM Hemocentros h
+                        WHERE h.id_hemocentro = %s) AS hemocentro_ativo,
+                    (SELECT COALESCE(c.ativa, 0) FROM Campanha c
+                        WHERE c.id_campanha = %s) AS campanha_ativa,
+                    (SELECT COUNT(*) FROM Agendamento a
+                        WHERE a.id_usuario = u.id_usuario
+                        AND a.id_hemocentro = %s
+                        AND a.status = 'pendente'
+                        AND a.data_hora >= %s
+                        AND a.data_hora < %s) AS pendentes_no_dia,
+                    NOT EXISTS (SELECT 1 FROM Agendamento a
+                        WHERE a.id_usuario = u.id_usuario)
+                    AND NOT EXISTS (SELECT 1 FROM AgendamentoArquivo aa
+                        WHERE aa.id_usuario = u.id_usuario) AS primeira_vez
+                FROM Usuario u
+                WHERE u.id_usuario = %s
+                FOR UPDATE
+            """
+            db.execute(sql, (id_hemocentro, id_campanha, id_hemocentro, dia_inicio, dia_fim, id_usuario))
+            result = db.fetchone()
+            return dict(result) if result else None
+    
     @staticmethod
     def _verificar_primeira_vez(id_usuario):
         with get_db_manager() as db:
             sql = """
-                SELECT COUNT(*) as total 
-                FROM Agendamento 
-                WHERE id_usuario = %s
+                SELECT
+                    EXISTS (SELECT 1 FROM Agendamento WHERE id_usuario = %s)
+                    OR EXISTS (SELECT 1 FROM AgendamentoArquivo WHERE id_usuario = %s) AS ja_agendou
             """
-            db.execute(sql, (id_usuario,))
+            db.execute(sql, (id_usuario, id_usuario))
             result = db.fetchone()
-            return result['total'] == 0 if result else True
+            return not result['ja_agendou'] if result else True
     
     @staticmethod
     def buscar_por_id(agendamento_id):
@@ -70,16 +214,16 @@ class AgendamentoModel:
             return dict(result) if result else None
     
     @staticmethod
-    def listar_por_usuario(id_usuario, status=None):
+    def listar_por_usuario(id_usuario, status=None, incluir_arquivo=False):
         with get_db_manager() as db:
-            sql = """
+            sql = f"""
                 SELECT 
                     a.*,
                     h.nome as nome_hemocentro,
                     h.endereco as endereco_hemocentro,
                     h.telefone as telefone_hemocentro,
                     c.nome as nome_campanha
-                FROM Agendamento a
+                FROM {_tabela_agendamento(incluir_arquivo)} a
                 JOIN Hemocentros h ON a.id_hemocentro = h.id_hemocentro
                 LEFT JOIN Campanha c ON a.id_campanha = c.id_campanha
                 WHERE a.id_usuario = %s
@@ -93,9 +237,12 @@ class AgendamentoModel:
             return db.fetchall()
     
     @staticmethod
-    def listar_todos(status=None, id_hemocentro=None, data_inicio=None):
+    # limite/cursor: paginação por (data_hora, id_agendamento) decrescentes; sem limite devolve tudo
+    def listar_todos(status=None, id_hemocentro=None, data_inicio=None, limite=None, cursor=None):
         with get_db_manager() as db:
-            sql = """
+            # data_inicio anterior ao corte do arquivo inclui os agendamentos arquivados
+            tabela = _tabela_agendamento(_alcanca_arquivo(data_inicio))
+            sql = f"""
                 SELECT 
                     a.*,
                     u.nome as nome_usuario,
@@ -104,7 +251,7 @@ class AgendamentoModel:
                     u.tipo_sanguineo as tipo_sanguineo_usuario,
                     h.nome as nome_hemocentro,
                     c.nome as nome_campanha
-                FROM Agendamento a
+                FROM {tabela} a
                 JOIN Usuario u ON a.id_usuario = u.id_usuario
                 JOIN Hemocentros h ON a.id_hemocentro = h.id_hemocentro
                 LEFT JOIN Campanha c ON a.id_campanha = c.id_campanha
@@ -118,9 +265,16 @@ class AgendamentoModel:
                 sql += " AND a.id_hemocentro = %s"
                 params.append(id_hemocentro)
             if data_inicio:
-                sql += " AND DATE(a.data_hora) >= %s"
-                params.append(data_inicio)
-            sql += " ORDER BY a.data_hora DESC"
+                sql += " AND a.data_hora >= %s"
+                params.append(_inicio_do_dia(data_inicio))
+            if cursor:
+                data_hora_cursor, id_cursor = cursor
+                sql += " AND (a.data_hora < %s OR (a.data_hora = %s AND a.id_agendamento < %s))"
+                params.extend([data_hora_cursor, data_hora_cursor, id_cursor])
+            sql += " ORDER BY a.data_hora DESC, a.id_agendamento DESC"
+            if limite:
+                sql += " LIMIT %s"
+                params.append(int(limite))
             db.execute(sql, tuple(params))
             return db.fetchall()
     
@@ -143,6 +297,8 @@ class AgendamentoModel:
         if not campos:
             return False
         with get_db_manager() as db:
+            if campos.get('status') in AgendamentoModel.STATUS_SEM_VAGA:
+                AgendamentoModel._liberar_slot(db, agendamento_id)
             campos_sql = ', '.join([f"{campo} = %s" for campo in campos.keys()])
             sql = f"""
                 UPDATE Agendamento 
@@ -153,6 +309,107 @@ class AgendamentoModel:
             db.execute(sql, tuple(valores))
             return db.rowcount > 0
     
+    # transição de status para vários agendamentos do hemocentro: uma consulta valida todos
+    # (existência, hemocentro e status de origem) e um único UPDATE aplica os válidos.
+    # devolve os ids atualizados e os recusados por motivo.
+    @staticmethod
+    def atualizar_status_em_lote(ids, status_novo, id_hemocentro):
+        origens = AgendamentoModel.TRANSICOES_LOTE[status_novo]
+        resultado = {'atualizados': [], 'nao_encontrados': [], 'sem_permissao': [], 'status_invalido': []}
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return resultado
+        with get_db_manager() as db:
+            marcadores = ', '.join(['%s'] * len(ids))
+            sql = f"""
+                SELECT id_agendamento, id_hemocentro, status, slot_inicio
+                FROM Agendamento
+                WHERE id_agendamento IN ({marcadores})
+                FOR UPDATE
+            """
+            db.execute(sql, tuple(ids))
+            encontrados = {row['id_agendamento']: row for row in db.fetchall()}
+            validos = []
+            for id_agendamento in ids:
+                row = encontrados.get(id_agendamento)
+                if row is None:
+                    resultado['nao_encontrados'].append(id_agendamento)
+                elif row['id_hemocentro'] != id_hemocentro:
+                    resultado['sem_permissao'].append(id_agendamento)
+                elif row['status'] not in origens:
+                    resultado['status_invalido'].append({'id_agendamento': id_agendamento, 'status': row['status']})
+                else:
+                    validos.append(row)
+            if not validos:
+                return resultado
+            marcadores = ', '.join(['%s'] * len(validos))
+            marcadores_origem = ', '.join(['%s'] * len(origens))
+            sql_update = f"""
+                UPDATE Agendamento
+                SET status = %s
+                WHERE id_agendamento IN ({marcadores})
+                AND id_hemocentro = %s
+                AND status IN ({marcadores_origem})
+            """
+            params = [status_novo] + [row['id_agendamento'] for row in validos] + [id_hemocentro] + list(origens)
+            db.execute(sql_update, tuple(params))
+            if status_novo in AgendamentoModel.STATUS_SEM_VAGA:
+                AgendamentoModel._liberar_slots(db, id_hemocentro, [row['slot_inicio'] for row in validos])
+            resultado['atualizados'] = [row['id_agendamento'] for row in validos]
+            return resultado
+    
+    # agendamentos pendentes/confirmados cujo horário passou de "antes_de" viram não compareceu,
+    # no máximo "limite" por chamada (um lote = uma transação curta). devolve quantos mudaram.
+    @staticmethod
+    def marcar_faltas_vencidas(antes_de, limite):
+        with get_db_manager() as db:
+            sql = """
+                SELECT id_agendamento, id_hemocentro, slot_inicio
+                FROM Agendamento
+                WHERE status IN ('pendente', 'confirmado')
+                AND data_hora < %s
+                ORDER BY data_hora
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """
+            db.execute(sql, (antes_de, int(limite)))
+            vencidos = db.fetchall()
+            if not vencidos:
+                return 0
+            marcadores = ', '.join(['%s'] * len(vencidos))
+            sql_update = f"""
+                UPDATE Agendamento
+                SET status = 'nao_compareceu'
+                WHERE id_agendamento IN ({marcadores})
+                AND status IN ('pendente', 'confirmado')
+            """
+            db.execute(sql_update, tuple(row['id_agendamento'] for row in vencidos))
+            atualizados = db.rowcount
+            slots_por_hemocentro = {}
+            for row in vencidos:
+                slots_por_hemocentro.setdefault(row['id_hemocentro'], []).append(row['slot_inicio'])
+            for id_hemocentro, slots_inicio in slots_por_hemocentro.items():
+                AgendamentoModel._liberar_slots(db, id_hemocentro, slots_inicio)
+            return atualizados
+    
+    # devolve uma vaga por item de slots_inicio (linhas já travadas pelo chamador)
+    @staticmethod
+    def _liberar_slots(db, id_hemocentro, slots_inicio):
+        por_slot = {}
+        for slot_inicio in slots_inicio:
+            if slot_inicio is not None:
+                por_slot[slot_inicio] = por_slot.get(slot_inicio, 0) + 1
+        if not por_slot:
+            return
+        sql = """
+            UPDATE AgendamentoSlot
+            SET reservados = GREATEST(reservados - %s, 0)
+            WHERE id_hemocentro = %s AND slot_inicio = %s
+        """
+        db.executemany(sql, [(quantidade, id_hemocentro, slot) for slot, quantidade in por_slot.items()])
+        dias = {slot.date() for slot in por_slot}
+        db.after_commit(lambda: [invalidar_vagas(id_hemocentro, dia) for dia in dias])
+    
     @staticmethod
     def cancelar(agendamento_id):
         return AgendamentoModel.atualizar(agendamento_id, {'status': 'cancelado'})
@@ -207,7 +464,8 @@ class AgendamentoModel:
                 FROM Agendamento a
                 JOIN Usuario u ON a.id_usuario = u.id_usuario
                 JOIN Hemocentros h ON a.id_hemocentro = h.id_hemocentro
-                WHERE a.data_hora BETWEEN NOW() AND DATE_ADD(NOW(), INTERVAL %s DAY)
+                WHERE a.data_hora >= NOW()
+                AND a.data_hora < NOW() + INTERVAL %s DAY
                 AND a.status IN ('pendente', 'confirmado')
             """
             params = [dias]
@@ -221,35 +479,67 @@ class AgendamentoModel:
     @staticmethod
     def deletar(agendamento_id):
         with get_db_manager() as db:
+            AgendamentoModel._liberar_slot(db, agendamento_id)
             sql = "DELETE FROM Agendamento WHERE id_agendamento = %s"
             db.execute(sql, (agendamento_id,))
             return db.rowcount > 0
     
+    # agendamentos que ocupam vaga a partir de uma data (para recalcular slots)
     @staticmethod
-    def verificar_disponibilidade(id_hemocentro, data_hora):
+    def listar_para_recalculo_slots(desde):
         with get_db_manager() as db:
             sql = """
-                SELECT COUNT(*) as total
+                SELECT id_agendamento, id_hemocentro, data_hora, slot_inicio
                 FROM Agendamento
-                WHERE id_hemocentro = %s
-                AND data_hora = %s
+                WHERE data_hora >= %s
                 AND status NOT IN ('cancelado', 'nao_compareceu')
             """
-            db.execute(sql, (id_hemocentro, data_hora))
-            result = db.fetchone()
-            return result['total'] == 0 if result else True
+            db.execute(sql, (desde,))
+            return db.fetchall()
     
+    # grava o slot de cada agendamento e reconstrói os contadores a partir dos agendamentos
     @staticmethod
-    def contar_agendamentos_dia(id_hemocentro, data):
+    def reconstruir_slots(desde, slots_por_agendamento):
         with get_db_manager() as db:
+            if slots_por_agendamento:
+                sql_slot = "UPDATE Agendamento SET slot_inicio = %s WHERE id_agendamento = %s"
+                db.executemany(sql_slot, [(slot, id_ag) for id_ag, slot in slots_por_agendamento.items()])
+            db.execute("DELETE FROM AgendamentoSlot WHERE slot_inicio >= %s", (desde,))
+            sql_contadores = """
+                INSERT INTO AgendamentoSlot (id_hemocentro, slot_inicio, reservados)
+                SELECT id_hemocentro, slot_inicio, COUNT(*)
+                FROM Agendamento
+                WHERE slot_inicio >= %s
+                AND status NOT IN ('cancelado', 'nao_compareceu')
+                GROUP BY id_hemocentro, slot_inicio
+            """
+            db.execute(sql_contadores, (desde,))
+            return db.rowcount
+    
+    # reservas por início de slot num intervalo [inicio, fim) de um hemocentro
+    @staticmethod
+    def reservas_por_slot(id_hemocentro, inicio, fim):
+        with get_db_manager(prepared=True) as db:
+            sql = """
+                SELECT slot_inicio, reservados FROM AgendamentoSlot
+                WHERE id_hemocentro = %s AND slot_inicio >= %s AND slot_inicio < %s
+            """
+            db.execute(sql, (id_hemocentro, inicio, fim))
+            return {row['slot_inicio']: row['reservados'] for row in db.fetchall()}
+    
+    @staticmethod
+    def contar_agendamentos_dia(id_hemocentro, data):
+        inicio, fim = _intervalo_do_dia(data)
+        with get_db_manager(prepared=True) as db:
             sql = """
                 SELECT COUNT(*) as total
                 FROM Agendamento
                 WHERE id_hemocentro = %s
-                AND DATE(data_hora) = %s
                 AND status IN ('pendente', 'confirmado')
+                AND data_hora >= %s
+                AND data_hora < %s
             """
-            db.execute(sql, (id_hemocentro, data))
+            db.execute(sql, (id_hemocentro, inicio, fim))
             result = db.fetchone()
             return result['total'] if result else 0
     
@@ -283,8 +573,9 @@ class AgendamentoModel:
                 FROM Agendamento a
                 JOIN Usuario u ON a.id_usuario = u.id_usuario
                 WHERE a.id_hemocentro = %s
-                AND DATE(a.data_hora) = CURDATE()
                 AND a.status IN ('pendente', 'confirmado')
+                AND a.data_hora >= CURDATE()
+                AND a.data_hora < CURDATE() + INTERVAL 1 DAY
                 ORDER BY a.data_hora ASC
             """
             db.execute(sql, (id_hemocentro,))
@@ -292,7 +583,22 @@ class AgendamentoModel:
 
 ########################################################################
 
+# litros ainda nas fatias de CampanhaProgresso (somados ao valor consolidado na leitura)
+_SQL_LITROS_PENDENTES = """
+    (SELECT COALESCE(SUM(p.litros), 0) FROM CampanhaProgresso p
+        WHERE p.id_campanha = c.id_campanha) as litros_pendentes
+"""
+
+def _somar_progresso(campanha):
+    pendentes = campanha.pop('litros_pendentes', 0) or 0
+    if pendentes:
+        campanha['quantidade_atual_litros'] = float(campanha.get('quantidade_atual_litros') or 0) + float(pendentes)
+    return campanha
+
 class CampanhaModel:
+    # fatias do contador de progresso por campanha
+    FATIAS_PROGRESSO = int(os.getenv('CAMPANHA_PROGRESSO_FATIAS', '8'))
+
     @staticmethod
     def criar(id_hemocentro, nome, descricao, data_inicio, data_fim,
               tipo_sanguineo_necessario=None, quantidade_meta_litros=0, 
@@ -321,12 +627,23 @@ class CampanhaModel:
             )
             db.execute(sql, valores)
             campanha_id = db.lastrowid
+            CampanhaModel._gravar_tipos(db, campanha_id, tipo_sanguineo_necessario)
+            db.after_commit(invalidar_catalogo)
             return CampanhaModel.buscar_por_id(campanha_id)
     
+    # tipos sanguíneos da campanha (CampanhaTipoSanguineo) a partir do texto de exibição
+    @staticmethod
+    def _gravar_tipos(db, campanha_id, tipo_sanguineo_necessario):
+        db.execute("DELETE FROM CampanhaTipoSanguineo WHERE id_campanha = %s", (campanha_id,))
+        tipos = sorted(tipos_da_campanha(tipo_sanguineo_necessario))
+        if tipos:
+            sql = "INSERT INTO CampanhaTipoSanguineo (id_campanha, tipo_sanguineo) VALUES (%s, %s)"
+            db.executemany(sql, [(campanha_id, tipo) for tipo in tipos])
+    
     @staticmethod
     def buscar_por_id(campanha_id):
         with get_db_manager() as db:
-            sql = """
+            sql = f"""
                 SELECT 
                     c.*,
                     h.nome as nome_hemocentro,
@@ -334,26 +651,32 @@ class CampanhaModel:
                     h.cidade,
                     h.estado,
                     h.telefone as telefone_hemocentro,
-                    h.email as email_hemocentro
+                    h.email as email_hemocentro,
+                    {_SQL_LITROS_PENDENTES}
                 FROM Campanha c
                 INNER JOIN Hemocentros h ON c.id_hemocentro = h.id_hemocentro
                 WHERE c.id_campanha = %s
             """
             db.execute(sql, (campanha_id,))
             result = db.fetchone()
-            return dict(result) if result else None
+            return _somar_progresso(dict(result)) if result else None
     
     @staticmethod
+    # compativel_com: tipo do doador; traz campanhas de qualquer tipo que ele pode atender
     def listar_ativas(id_hemocentro=None, tipo_sanguineo_necessario=None, 
-                      apenas_destaque=False, apenas_ativas=True):
+                      apenas_destaque=False, apenas_ativas=True, compativel_com=None):
         with get_db_manager() as db:
-            sql = """
+            sql = f"""
                 SELECT 
                     c.*,
                     h.nome as nome_hemocentro,
                     h.cidade,
                     h.estado,
-                    DATEDIFF(c.data_fim, CURDATE()) as dias_restantes
+                    DATEDIFF(c.data_fim, CURDATE()) as dias_restantes,
+                    (SELECT GROUP_CONCAT(ct.tipo_sanguineo ORDER BY ct.tipo_sanguineo)
+                        FROM CampanhaTipoSanguineo ct
+                        WHERE ct.id_campanha = c.id_campanha) as tipos_sanguineos,
+                    {_SQL_LITROS_PENDENTES}
                 FROM Campanha c
                 INNER JOIN Hemocentros h ON c.id_hemocentro = h.id_hemocentro
                 WHERE c.data_fim >= CURDATE()
@@ -364,14 +687,31 @@ class CampanhaModel:
             if id_hemocentro:
                 sql += " AND c.id_hemocentro = %s"
                 params.append(id_hemocentro)
+            tipos = []
             if tipo_sanguineo_necessario:
-                sql += " AND c.tipo_sanguineo_necessario LIKE %s"
-                params.append(f"%{tipo_sanguineo_necessario}%")
+                tipos.append([tipo_sanguineo_necessario])
+            if compativel_com:
+                tipos.append(RECEPTORES_COMPATIVEIS.get(compativel_com, []))
+            for filtro in tipos:
+                if not filtro:
+                    return []
+                marcadores = ', '.join(['%s'] * len(filtro))
+                sql += f"""
+                    AND c.id_campanha IN (
+                        SELECT ct.id_campanha FROM CampanhaTipoSanguineo ct
+                        WHERE ct.tipo_sanguineo IN ({marcadores})
+                    )
+                """
+                params.extend(filtro)
             if apenas_destaque:
                 sql += " AND c.destaque = TRUE"
             sql += " ORDER BY c.destaque DESC, c.data_inicio DESC"
             db.execute(sql, tuple(params))
-            return db.fetchall()
+            campanhas = db.fetchall()
+            for campanha in campanhas:
+                campanha['tipos_sanguineos'] = campanha['tipos_sanguineos'].split(',') if campanha.get('tipos_sanguineos') else []
+                _somar_progresso(campanha)
+            return campanhas
     
     @staticmethod
     def listar_todas():
@@ -421,16 +761,63 @@ class CampanhaModel:
     def atualizar(campanha_id, campos):
         if not campos:
             return False
-        with get_db_manager() as db:
-            set_clause = ", ".join([f"{campo} = %s" for campo in campos.keys()])
-            sql = f"""
-                UPDATE Campanha 
-                SET {set_clause}
-                WHERE id_campanha = %s
-            """
-            valores = list(campos.values()) + [campanha_id]    
-            db.execute(sql, tuple(valores))
-            return db.rowcount > 0
+        campos = dict(campos)
+        total_informado = campos.pop('quantidade_atual_litros', None)
+        with get_db_manager() as db:
+            alterou = False
+            # antes do UPDATE da campanha: mesma ordem de locks de consolidar_progresso
+            if total_informado is not None:
+                alterou = CampanhaModel._definir_total(db, campanha_id, total_informado)
+            if campos:
+                set_clause = ", ".join([f"{campo} = %s" for campo in campos.keys()])
+                sql = f"""
+                    UPDATE Campanha 
+                    SET {set_clause}
+                    WHERE id_campanha = %s
+                """
+                valores = list(campos.values()) + [campanha_id]    
+                db.execute(sql, tuple(valores))
+                alterou = db.rowcount > 0 or alterou
+            if 'quantidade_meta_litros' in campos:
+                db.after_commit(lambda: publicar_progresso(campanha_id))
+            if 'tipo_sanguineo_necessario' in campos:
+                CampanhaModel._gravar_tipos(db, campanha_id, campos['tipo_sanguineo_necessario'])
+            db.after_commit(invalidar_catalogo)
+            return alterou
+    
+    # total de litros informado à mão. se for o total que já está valendo (consolidado + fatias),
+    # nada muda: o formulário de edição reenviando o valor que carregou não apaga doações
+    # registradas nesse meio tempo. senão os inteiros vão para a campanha e a fração fica na fatia 0.
+    @staticmethod
+    def _definir_total(db, campanha_id, total):
+        novo = Decimal(str(total)).quantize(Decimal('0.001'))
+        db.execute(
+            "SELECT litros FROM CampanhaProgresso WHERE id_campanha = %s FOR UPDATE",
+            (campanha_id,)
+        )
+        pendentes = sum(Decimal(str(row['litros'])) for row in db.fetchall())
+        db.execute(
+            "SELECT quantidade_atual_litros FROM Campanha WHERE id_campanha = %s FOR UPDATE",
+            (campanha_id,)
+        )
+        campanha = db.fetchone()
+        if not campanha:
+            return False
+        if Decimal(campanha['quantidade_atual_litros'] or 0) + pendentes == novo:
+            return False
+        inteiros = int(novo)
+        db.execute(
+            "UPDATE Campanha SET quantidade_atual_litros = %s WHERE id_campanha = %s",
+            (inteiros, campanha_id)
+        )
+        db.execute("DELETE FROM CampanhaProgresso WHERE id_campanha = %s", (campanha_id,))
+        if novo - inteiros > 0:
+            db.execute(
+                "INSERT INTO CampanhaProgresso (id_campanha, fatia, litros) VALUES (%s, 0, %s)",
+                (campanha_id, novo - inteiros)
+            )
+        db.after_commit(lambda: publicar_progresso(campanha_id))
+        return True
     
     @staticmethod
     def desativar(campanha_id):
@@ -440,22 +827,74 @@ class CampanhaModel:
     def ativar(campanha_id):
         return CampanhaModel.atualizar(campanha_id, {'ativa': True})
     
+    # soma numa fatia aleatória do contador: doações simultâneas quase nunca disputam a mesma
+    # linha e nenhuma trava a linha da Campanha
     @staticmethod
     def incrementar_litros(campanha_id, quantidade_litros=0.45):
         with get_db_manager() as db:
             sql = """
-                UPDATE Campanha 
-                SET quantidade_atual_litros = quantidade_atual_litros + %s
-                WHERE id_campanha = %s
+                INSERT INTO CampanhaProgresso (id_campanha, fatia, litros)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE litros = litros + VALUES(litros)
             """
-            db.execute(sql, (quantidade_litros, campanha_id))
+            fatia = random.randrange(CampanhaModel.FATIAS_PROGRESSO)
+            db.execute(sql, (campanha_id, fatia, quantidade_litros))
+            # quem acompanha a campanha ao vivo (SSE) recebe o novo total depois do commit
+            db.after_commit(lambda: publicar_progresso(campanha_id))
             return db.rowcount > 0
     
+    # passa os litros inteiros acumulados nas fatias para Campanha.quantidade_atual_litros (INT)
+    # e deixa a fração numa fatia só. uma transação curta por campanha.
+    @staticmethod
+    def consolidar_progresso(limite=500):
+        with get_db_manager() as db:
+            db.execute("SELECT DISTINCT id_campanha FROM CampanhaProgresso LIMIT %s", (int(limite),))
+            ids = [row['id_campanha'] for row in db.fetchall()]
+        consolidadas = 0
+        for campanha_id in ids:
+            with get_db_manager() as db:
+                db.execute(
+                    "SELECT fatia, litros FROM CampanhaProgresso WHERE id_campanha = %s FOR UPDATE",
+                    (campanha_id,)
+                )
+                fatias = db.fetchall()
+                total = sum(Decimal(str(f['litros'])) for f in fatias)
+                inteiros = int(total)
+                if inteiros <= 0 and len(fatias) <= 1:
+                    continue
+                if inteiros > 0:
+                    db.execute(
+                        "UPDATE Campanha SET quantidade_atual_litros = quantidade_atual_litros + %s WHERE id_campanha = %s",
+                        (inteiros, campanha_id)
+                    )
+                    if db.rowcount == 0:
+                        # campanha apagada: as fatias ficaram órfãs
+                        db.execute("DELETE FROM CampanhaProgresso WHERE id_campanha = %s", (campanha_id,))
+                        continue
+                db.execute("DELETE FROM CampanhaProgresso WHERE id_campanha = %s", (campanha_id,))
+                if total - inteiros > 0:
+                    db.execute(
+                        "INSERT INTO CampanhaProgresso (id_campanha, fatia, litros) VALUES (%s, 0, %s)",
+                        (campanha_id, total - inteiros)
+                    )
+                consolidadas += 1
+        if consolidadas:
+            invalidar_catalogo()
+        return consolidadas
+    
     @staticmethod
     def calcular_progresso(campanha_id):
-        campanha = CampanhaModel.buscar_por_id(campanha_id)
-        if not campanha:
+        with get_db_manager() as db:
+            sql = f"""
+                SELECT c.quantidade_meta_litros, c.quantidade_atual_litros, {_SQL_LITROS_PENDENTES}
+                FROM Campanha c
+                WHERE c.id_campanha = %s
+            """
+            db.execute(sql, (campanha_id,))
+            result = db.fetchone()
+        if not result:
             return None
+        campanha = _somar_progresso(dict(result))
         atual = campanha.get('quantidade_atual_litros', 0)
         meta = campanha.get('quantidade_meta_litros', 1)
         percentual = min((atual / meta) * 100, 100) if meta > 0 else 0
@@ -467,33 +906,15 @@ class CampanhaModel:
             'meta_atingida': atual >= meta
         }
     
-    @staticmethod
-    def listar_em_destaque(limite=5):
-        with get_db_manager() as db:
-            sql = """
-                SELECT 
-                    c.*,
-                    h.nome as nome_hemocentro,
-                    h.cidade,
-                    h.estado,
-                    DATEDIFF(c.data_fim, CURDATE()) as dias_restantes
-                FROM Campanha c
-                INNER JOIN Hemocentros h ON c.id_hemocentro = h.id_hemocentro
-                WHERE c.ativa = TRUE 
-                AND c.destaque = TRUE
-                AND c.data_fim >= CURDATE()
-                ORDER BY c.data_inicio DESC
-                LIMIT %s
-            """
-            db.execute(sql, (limite,))
-            return db.fetchall()
-    
     @staticmethod
     def deletar(campanha_id):
         with get_db_manager() as db:
             sql = "DELETE FROM Campanha WHERE id_campanha = %s"
             db.execute(sql, (campanha_id,))
-            return db.rowcount > 0
+            apagou = db.rowcount > 0
+            db.execute("DELETE FROM CampanhaProgresso WHERE id_campanha = %s", (campanha_id,))
+            db.after_commit(invalidar_catalogo)
+            return apagou
     
     @staticmethod
     def contar_ativas():
@@ -520,27 +941,27 @@ class CampanhaModel:
             result = db.fetchone()
             return result['total'] if result else 0
     
+    # campanhas que já passaram de data_fim deixam de ser ativas (em lote, pelo índice ativa/data_fim)
     @staticmethod
-    def buscar_campanhas_proximas_vencer(dias=7, limite=10):
+    def encerrar_vencidas(limite=1000):
         with get_db_manager() as db:
-            sql = """
-                SELECT 
-                    c.*,
-                    h.nome as nome_hemocentro,
-                    DATEDIFF(c.data_fim, CURDATE()) as dias_restantes
-                FROM Campanha c
-                INNER JOIN Hemocentros h ON c.id_hemocentro = h.id_hemocentro
-                WHERE c.ativa = TRUE
-                AND c.data_fim >= CURDATE()
-                AND c.data_fim <= DATE_ADD(CURDATE(), INTERVAL %s DAY)
-                ORDER BY c.data_fim ASC
-                LIMIT %s
-            """
-            db.execute(sql, (dias, limite))
-            return db.fetchall()
-        
+            db.execute(
+                "UPDATE Campanha SET ativa = FALSE WHERE ativa = TRUE AND data_fim < CURDATE() LIMIT %s",
+                (int(limite),)
+            )
+            encerradas = db.rowcount
+            if encerradas:
+                db.after_commit(invalidar_catalogo)
+            return encerradas
+    
 ################################################################################
 
+class EstoqueNaoEncontradoError(ValueError):
+    pass
+
+class EstoqueInsuficienteError(ValueError):
+    pass
+
 class EstoqueModel:
     # níveis de estoque:
     # - critico: <= 5 unidades
@@ -548,68 +969,215 @@ class EstoqueModel:
     # - normal: 16-30 unidades
     # - bom: > 30 unidades
     @staticmethod
-    def adicionar_estoque(id_hemocentro, tipo_sanguineo, quantidade):
+    def adicionar_estoque(id_hemocentro, tipo_sanguineo, quantidade, id_usuario=None):
         with get_db_manager() as db:
-            sql_check = """
-                SELECT * FROM Estoque 
-                WHERE id_hemocentro = %s AND tipo_sanguineo = %s
+            sql = """
+                INSERT INTO Estoque (id_hemocentro, tipo_sanguineo, quantidade)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE quantidade = quantidade + %s
             """
-            db.execute(sql_check, (id_hemocentro, tipo_sanguineo))
-            estoque_existente = db.fetchone()
-            if estoque_existente:
-                sql_update = """
-                    UPDATE Estoque 
-                    SET quantidade = quantidade + %s
-                    WHERE id_hemocentro = %s AND tipo_sanguineo = %s
-                """
-                db.execute(sql_update, (quantidade, id_hemocentro, tipo_sanguineo))
-            else:
-                sql_insert = """
-                    INSERT INTO Estoque (id_hemocentro, tipo_sanguineo, quantidade)
-                    VALUES (%s, %s, %s)
-                """
-                db.execute(sql_insert, (id_hemocentro, tipo_sanguineo, quantidade))
-            return EstoqueModel.buscar_estoque(id_hemocentro, tipo_sanguineo)
+            db.execute(sql, (id_hemocentro, tipo_sanguineo, quantidade, quantidade))
+            estoque = EstoqueModel._reler(db, id_hemocentro, tipo_sanguineo)
+            EstoqueModel._registrar_movimentacoes(
+                db, id_hemocentro, [(tipo_sanguineo, quantidade, estoque['quantidade'])], 'adicionar', id_usuario
+            )
+            db.after_commit(lambda: atualizar_snapshot(id_hemocentro))
+            return estoque
     
+    # decremento condicional: nunca deixa o estoque negativo, mesmo com terminais concorrentes
     @staticmethod
-    def remover_estoque(id_hemocentro, tipo_sanguineo, quantidade):
+    def remover_estoque(id_hemocentro, tipo_sanguineo, quantidade, id_usuario=None):
         with get_db_manager() as db:
-            estoque_atual = EstoqueModel.buscar_estoque(id_hemocentro, tipo_sanguineo)
-            if not estoque_atual:
-                raise ValueError(f"Estoque de {tipo_sanguineo} não encontrado")
-            quantidade_disponivel = estoque_atual.get('quantidade', 0)
-            if quantidade_disponivel < quantidade:
-                raise ValueError(f"Estoque insuficiente. Disponível: {quantidade_disponivel}")
             sql = """
                 UPDATE Estoque 
                 SET quantidade = quantidade - %s
+                WHERE id_hemocentro = %s AND tipo_sanguineo = %s AND quantidade >= %s
+            """
+            db.execute(sql, (quantidade, id_hemocentro, tipo_sanguineo, quantidade))
+            atualizado = db.rowcount > 0
+            estoque = EstoqueModel._reler(db, id_hemocentro, tipo_sanguineo)
+            if not estoque:
+                raise EstoqueNaoEncontradoError(f"Nenhum estoque de {tipo_sanguineo} encontrado")
+            if not atualizado:
+                raise EstoqueInsuficienteError(
+                    f"Estoque insuficiente. Disponível: {estoque.get('quantidade', 0)} unidade(s)"
+                )
+            EstoqueModel._registrar_movimentacoes(
+                db, id_hemocentro, [(tipo_sanguineo, -quantidade, estoque['quantidade'])], 'remover', id_usuario
+            )
+            db.after_commit(lambda: atualizar_snapshot(id_hemocentro))
+            return estoque
+    
+    @staticmethod
+    def atualizar_quantidade(id_hemocentro, tipo_sanguineo, quantidade, id_usuario=None):
+        with get_db_manager() as db:
+            # valor anterior (travado) só para registrar o delta no livro de movimentações
+            sql_anterior = """
+                SELECT quantidade FROM Estoque 
                 WHERE id_hemocentro = %s AND tipo_sanguineo = %s
+                FOR UPDATE
+            """
+            db.execute(sql_anterior, (id_hemocentro, tipo_sanguineo))
+            anterior = db.fetchone()
+            sql = """
+                INSERT INTO Estoque (id_hemocentro, tipo_sanguineo, quantidade)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE quantidade = %s
             """
-            db.execute(sql, (quantidade, id_hemocentro, tipo_sanguineo))
-            return EstoqueModel.buscar_estoque(id_hemocentro, tipo_sanguineo)
+            db.execute(sql, (id_hemocentro, tipo_sanguineo, quantidade, quantidade))
+            delta = quantidade - ((anterior or {}).get('quantidade') or 0)
+            EstoqueModel._registrar_movimentacoes(
+                db, id_hemocentro, [(tipo_sanguineo, delta, quantidade)], 'ajuste', id_usuario
+            )
+            db.after_commit(lambda: atualizar_snapshot(id_hemocentro))
+            return EstoqueModel._reler(db, id_hemocentro, tipo_sanguineo)
     
+    # aplica várias movimentações numa transação só.
+    # movimentacoes: [{'tipo_sanguineo': 'A+', 'delta': -3}, {'tipo_sanguineo': 'O-', 'quantidade': 12}, ...]
+    # trava as linhas do hemocentro, calcula o valor final de cada tipo e grava tudo num INSERT em lote.
     @staticmethod
-    def atualizar_quantidade(id_hemocentro, tipo_sanguineo, quantidade):
+    def aplicar_movimentacoes(id_hemocentro, movimentacoes, id_usuario=None):
         with get_db_manager() as db:
-            estoque_atual = EstoqueModel.buscar_estoque(id_hemocentro, tipo_sanguineo)
-            if estoque_atual:
-                sql_update = """
-                    UPDATE Estoque 
-                    SET quantidade = %s
-                    WHERE id_hemocentro = %s AND tipo_sanguineo = %s
-                """
-                db.execute(sql_update, (quantidade, id_hemocentro, tipo_sanguineo))
-            else:
-                sql_insert = """
+            sql_lock = """
+                SELECT tipo_sanguineo, quantidade FROM Estoque 
+                WHERE id_hemocentro = %s
+                FOR UPDATE
+            """
+            db.execute(sql_lock, (id_hemocentro,))
+            atuais = {row['tipo_sanguineo']: row['quantidade'] or 0 for row in db.fetchall()}
+            novos = {}
+            for mov in movimentacoes:
+                tipo = mov['tipo_sanguineo']
+                if mov.get('quantidade') is not None:
+                    novos[tipo] = mov['quantidade']
+                    continue
+                atual = novos.get(tipo, atuais.get(tipo))
+                if atual is None and mov['delta'] < 0:
+                    raise EstoqueNaoEncontradoError(f"Nenhum estoque de {tipo} encontrado")
+                resultado = (atual or 0) + mov['delta']
+                if resultado < 0:
+                    raise EstoqueInsuficienteError(
+                        f"Estoque insuficiente de {tipo}. Disponível: {atual} unidade(s)"
+                    )
+                novos[tipo] = resultado
+            if novos:
+                # VALUES(col) mantém os parâmetros só na lista de VALUES, o que permite ao conector
+                # juntar as linhas num único INSERT multi-row
+                sql_upsert = """
                     INSERT INTO Estoque (id_hemocentro, tipo_sanguineo, quantidade)
                     VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE quantidade = VALUES(quantidade)
                 """
-                db.execute(sql_insert, (id_hemocentro, tipo_sanguineo, quantidade))
-            return EstoqueModel.buscar_estoque(id_hemocentro, tipo_sanguineo)
+                db.executemany(sql_upsert, [(id_hemocentro, tipo, qtd) for tipo, qtd in novos.items()])
+                EstoqueModel._registrar_movimentacoes(
+                    db,
+                    id_hemocentro,
+                    [(tipo, qtd - atuais.get(tipo, 0), qtd) for tipo, qtd in novos.items()],
+                    'lote',
+                    id_usuario
+                )
+                db.after_commit(lambda: atualizar_snapshot(id_hemocentro))
+            sql = """
+                SELECT * FROM Estoque 
+                WHERE id_hemocentro = %s
+                ORDER BY tipo_sanguineo
+            """
+            db.execute(sql, (id_hemocentro,))
+            estoques = []
+            for row in db.fetchall():
+                estoque = dict(row)
+                estoque['nivel'] = EstoqueModel._classificar_nivel(estoque['quantidade'])
+                estoques.append(estoque)
+            return estoques
+    
+    # livro de movimentações + agregado do dia, na mesma transação da alteração do estoque.
+    # movimentos: [(tipo_sanguineo, delta, quantidade_resultante), ...]; delta 0 só é registrado
+    # na inicialização (marca o saldo de partida do tipo)
+    @staticmethod
+    def _registrar_movimentacoes(db, id_hemocentro, movimentos, origem, id_usuario=None):
+        movimentos = [m for m in movimentos if m[1] != 0 or origem == 'inicializacao']
+        if not movimentos:
+            return
+        sql_livro = """
+            INSERT INTO MovimentacaoEstoque (
+                id_hemocentro, tipo_sanguineo, delta, quantidade_resultante, origem, id_usuario
+            )
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """
+        db.executemany(sql_livro, [
+            (id_hemocentro, tipo, delta, resultante, origem, id_usuario)
+            for tipo, delta, resultante in movimentos
+        ])
+        sql_diario = """
+            INSERT INTO EstoqueDiario (
+                id_hemocentro, tipo_sanguineo, dia, entradas, saidas, movimentacoes, saldo_final
+            )
+            VALUES (%s, %s, CURDATE(), %s, %s, 1, %s)
+            ON DUPLICATE KEY UPDATE
+                entradas = entradas + VALUES(entradas),
+                saidas = saidas + VALUES(saidas),
+                movimentacoes = movimentacoes + 1,
+                saldo_final = VALUES(saldo_final)
+        """
+        db.executemany(sql_diario, [
+            (id_hemocentro, tipo, max(delta, 0), max(-delta, 0), resultante)
+            for tipo, delta, resultante in movimentos
+        ])
+    
+    # série diária (O(dias)) a partir dos agregados; dias sem movimentação não aparecem
+    @staticmethod
+    def serie_diaria(id_hemocentro, data_inicio, data_fim, tipo_sanguineo=None):
+        with get_db_manager() as db:
+            sql = """
+                SELECT tipo_sanguineo, dia, entradas, saidas, movimentacoes, saldo_final
+                FROM EstoqueDiario
+                WHERE id_hemocentro = %s AND dia BETWEEN %s AND %s
+            """
+            params = [id_hemocentro, data_inicio, data_fim]
+            if tipo_sanguineo:
+                sql += " AND tipo_sanguineo = %s"
+                params.append(tipo_sanguineo)
+            sql += " ORDER BY tipo_sanguineo, dia"
+            db.execute(sql, tuple(params))
+            return db.fetchall()
+    
+    # compactação: o agregado diário já é mantido a cada escrita, então as linhas antigas
+    # do livro podem ser apagadas sem perder a série. apaga em lotes para não segurar locks.
+    @staticmethod
+    def compactar_movimentacoes(dias_retencao=90, tamanho_lote=5000):
+        total = 0
+        while True:
+            with get_db_manager() as db:
+                sql = """
+                    DELETE FROM MovimentacaoEstoque
+                    WHERE data_movimentacao < DATE_SUB(CURDATE(), INTERVAL %s DAY)
+                    ORDER BY id_movimentacao
+                    LIMIT %s
+                """
+                db.execute(sql, (dias_retencao, tamanho_lote))
+                apagadas = db.rowcount
+            total += apagadas
+            if apagadas < tamanho_lote:
+                return total
+    
+    # leitura logo após a escrita, na mesma conexão/transação (vê o valor que acabou de ser gravado)
+    @staticmethod
+    def _reler(db, id_hemocentro, tipo_sanguineo):
+        sql = """
+            SELECT * FROM Estoque 
+            WHERE id_hemocentro = %s AND tipo_sanguineo = %s
+        """
+        db.execute(sql, (id_hemocentro, tipo_sanguineo))
+        result = db.fetchone()
+        if result:
+            estoque = dict(result)
+            estoque['nivel'] = EstoqueModel._classificar_nivel(estoque['quantidade'])
+            return estoque
+        return None
     
     @staticmethod
     def buscar_estoque(id_hemocentro, tipo_sanguineo):
-        with get_db_manager() as db:
+        with get_db_manager(prepared=True) as db:
             sql = """
                 SELECT * FROM Estoque 
                 WHERE id_hemocentro = %s AND tipo_sanguineo = %s
@@ -624,7 +1192,7 @@ class EstoqueModel:
     
     @staticmethod
     def listar_estoque_hemocentro(id_hemocentro):
-        with get_db_manager() as db:
+        with get_db_manager(prepared=True) as db:
             sql = """
                 SELECT * FROM Estoque 
                 WHERE id_hemocentro = %s
@@ -702,19 +1270,22 @@ class EstoqueModel:
     def inicializar_estoque_hemocentro(id_hemocentro):
         tipos_sanguineos = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
         with get_db_manager() as db:
-            for tipo in tipos_sanguineos:
-                sql_check = """
-                    SELECT id_estoque FROM Estoque 
-                    WHERE id_hemocentro = %s AND tipo_sanguineo = %s
+            # tipos já existentes ficam como estão
+            db.execute("SELECT tipo_sanguineo FROM Estoque WHERE id_hemocentro = %s FOR UPDATE", (id_hemocentro,))
+            existentes = {row['tipo_sanguineo'] for row in db.fetchall()}
+            novos = [tipo for tipo in tipos_sanguineos if tipo not in existentes]
+            if novos:
+                sql_insert = """
+                    INSERT INTO Estoque (id_hemocentro, tipo_sanguineo, quantidade)
+                    VALUES (%s, %s, 0)
+                    ON DUPLICATE KEY UPDATE quantidade = quantidade
                 """
-                db.execute(sql_check, (id_hemocentro, tipo))
-                existe = db.fetchone()
-                if not existe:
-                    sql_insert = """
-                        INSERT INTO Estoque (id_hemocentro, tipo_sanguineo, quantidade)
-                        VALUES (%s, %s, 0)
-                    """
-                    db.execute(sql_insert, (id_hemocentro, tipo))
+                db.executemany(sql_insert, [(id_hemocentro, tipo) for tipo in novos])
+                # saldo inicial no livro: a série de cada tipo começa de um zero registrado
+                EstoqueModel._registrar_movimentacoes(
+                    db, id_hemocentro, [(tipo, 0, 0) for tipo in novos], 'inicializacao'
+                )
+            db.after_commit(lambda: atualizar_snapshot(id_hemocentro))
         return True
     
     @staticmethod
@@ -807,7 +1378,7 @@ class HemocentroModel:
 
     @staticmethod
     def buscar_por_id(hemocentro_id):
-        with get_db_manager() as db:
+        with get_db_manager(prepared=True) as db:
             sql = "SELECT * FROM Hemocentros WHERE id_hemocentro = %s"
             db.execute(sql, (hemocentro_id,))
             result = db.fetchone()
@@ -820,7 +1391,7 @@ class HemocentroModel:
         cnpj_limpo = only_numbers(cnpj)
         if len(cnpj_limpo) != 14:
             return None
-        with get_db_manager() as db:
+        with get_db_manager(prepared=True) as db:
             sql = "SELECT * FROM Hemocentros WHERE cnpj = %s"
             db.execute(sql, (cnpj_limpo,))
             result = db.fetchone()
@@ -828,7 +1399,7 @@ class HemocentroModel:
     
     @staticmethod
     def buscar_por_email(email):
-        with get_db_manager() as db:
+        with get_db_manager(prepared=True) as db:
             sql = "SELECT * FROM Hemocentros WHERE email = %s"
             db.execute(sql, (email.lower().strip(),))
             result = db.fetchone()
@@ -856,6 +1427,14 @@ class HemocentroModel:
             db.execute(sql)
             return db.fetchall()
     
+    # caches que dependem dos dados do hemocentro são limpos depois do commit
+    @staticmethod
+    def _apos_alteracao(db, id_hemocentro, cnpj=None):
+        db.after_commit(lambda: invalidar_principal(cnpj=cnpj, id_hemocentro=id_hemocentro))
+        db.after_commit(invalidar_hemocentros)
+        db.after_commit(lambda: invalidar_snapshot(id_hemocentro))
+        db.after_commit(invalidar_catalogo)
+
     @staticmethod
     def atualizar(cnpj, campos):
         if not campos:
@@ -871,6 +1450,7 @@ class HemocentroModel:
             sql = f"UPDATE Hemocentros SET {campos_sql} WHERE cnpj = %s"
             valores = list(campos.values()) + [cnpj_limpo]
             db.execute(sql, tuple(valores))
+            HemocentroModel._apos_alteracao(db, hemocentro['id_hemocentro'], cnpj_limpo)
             return db.rowcount > 0
     
     @staticmethod
@@ -882,6 +1462,7 @@ class HemocentroModel:
             sql = f"UPDATE Hemocentros SET {campos_sql} WHERE id_hemocentro = %s"
             valores = list(campos.values()) + [hemocentro_id]
             db.execute(sql, tuple(valores))
+            HemocentroModel._apos_alteracao(db, hemocentro_id)
             return db.rowcount > 0
     
     @staticmethod
@@ -898,8 +1479,14 @@ class HemocentroModel:
             raise ValueError("CNPJ inválido")
         cnpj_limpo = only_numbers(cnpj)
         with get_db_manager() as db:
+            # id para limpar só os caches deste hemocentro
+            db.execute("SELECT id_hemocentro FROM Hemocentros WHERE cnpj = %s FOR UPDATE", (cnpj_limpo,))
+            hemocentro = db.fetchone()
+            if not hemocentro:
+                return False
             sql = "DELETE FROM Hemocentros WHERE cnpj = %s"
             db.execute(sql, (cnpj_limpo,))
+            HemocentroModel._apos_alteracao(db, hemocentro['id_hemocentro'], cnpj_limpo)
             return db.rowcount > 0
     
     @staticmethod
@@ -966,6 +1553,7 @@ class HistoricoModel:
             )
             db.execute(sql, valores)
             doacao_id = db.lastrowid
+            db.after_commit(lambda: invalidar_elegibilidade(id_usuario))
             return HistoricoModel.buscar_por_id(doacao_id)
     
     @staticmethod
@@ -1006,18 +1594,18 @@ class HistoricoModel:
             return dict(result) if result else None
     
     @staticmethod
-    def listar_por_usuario(id_usuario):
+    def listar_por_usuario(id_usuario, incluir_arquivo=False):
         with get_db_manager() as db:
-            sql = """
+            sql = f"""
                 SELECT 
                     h.*,
                     hem.nome as nome_hemocentro,
                     hem.cidade,
                     hem.endereco,
                     c.nome as nome_campanha
-                FROM HistoricoDoacoes h
+                FROM {_tabela_historico(incluir_arquivo)} h
                 INNER JOIN Hemocentros hem ON h.id_hemocentro = hem.id_hemocentro
-                LEFT JOIN Agendamento a ON h.id_agendamento = a.id_agendamento
+                LEFT JOIN {_tabela_agendamento(incluir_arquivo)} a ON h.id_agendamento = a.id_agendamento
                 LEFT JOIN Campanha c ON a.id_campanha = c.id_campanha
                 WHERE h.id_usuario = %s
                 ORDER BY h.data_doacao DESC
@@ -1029,16 +1617,17 @@ class HistoricoModel:
     def listar_por_hemocentro(id_hemocentro, data_inicio=None, data_fim=None, 
                                tipo_doacao=None, limite=100):
         with get_db_manager() as db:
-            sql = """
+            incluir_arquivo = _alcanca_arquivo(data_inicio)
+            sql = f"""
                 SELECT 
                     h.*,
                     u.nome as nome_doador,
                     u.tipo_sanguineo as tipo_sanguineo_doador,
                     u.email as email_doador,
                     c.nome as nome_campanha
-                FROM HistoricoDoacoes h
+                FROM {_tabela_historico(incluir_arquivo)} h
                 INNER JOIN Usuario u ON h.id_usuario = u.id_usuario
-                LEFT JOIN Agendamento a ON h.id_agendamento = a.id_agendamento
+                LEFT JOIN {_tabela_agendamento(incluir_arquivo)} a ON h.id_agendamento = a.id_agendamento
                 LEFT JOIN Campanha c ON a.id_campanha = c.id_campanha
                 WHERE h.id_hemocentro = %s
             """
@@ -1060,7 +1649,7 @@ class HistoricoModel:
     @staticmethod
     def estatisticas_hemocentro(id_hemocentro, data_inicio=None):
         with get_db_manager() as db:
-            sql = """
+            sql = f"""
                 SELECT 
                     COUNT(*) as total_doacoes,
                     SUM(quantidade_ml) as total_ml,
@@ -1068,7 +1657,7 @@ class HistoricoModel:
                     COUNT(DISTINCT id_usuario) as total_doadores,
                     tipo_doacao,
                     COUNT(*) as qtd_por_tipo
-                FROM HistoricoDoacoes
+                FROM {_tabela_historico(_alcanca_arquivo(data_inicio))}
                 WHERE id_hemocentro = %s
             """
             params = [id_hemocentro]
@@ -1177,7 +1766,7 @@ class HistoricoModel:
             sql = """
                 SELECT * FROM HistoricoDoacoes
                 WHERE id_usuario = %s
-                ORDER BY data_doacao DESC
+                ORDER BY data_doacao DESC, id_doacao DESC
                 LIMIT 1
             """
             db.execute(sql, (id_usuario,))
@@ -1187,8 +1776,14 @@ class HistoricoModel:
     @staticmethod
     def deletar(doacao_id):
         with get_db_manager() as db:
+            db.execute("SELECT id_usuario FROM HistoricoDoacoes WHERE id_doacao = %s", (doacao_id,))
+            doacao = db.fetchone()
+            if not doacao:
+                return False
             sql = "DELETE FROM HistoricoDoacoes WHERE id_doacao = %s"
             db.execute(sql, (doacao_id,))
+            id_usuario = doacao['id_usuario']
+            db.after_commit(lambda: invalidar_elegibilidade(id_usuario))
             return db.rowcount > 0
     
     @staticmethod
@@ -1213,6 +1808,120 @@ class HistoricoModel:
 
 #####################################################################################
 
+# move agendamentos encerrados (e as doações ligadas a eles) e doações avulsas mais velhos
+# que o corte para as tabelas de arquivo, em lotes: cada lote é uma transação curta.
+class ArquivoModel:
+    @staticmethod
+    def arquivar_lote(limite):
+        corte = _corte_arquivo()
+        with get_db_manager() as db:
+            sql = """
+                SELECT id_agendamento FROM Agendamento
+                WHERE status IN ('realizado', 'cancelado', 'nao_compareceu')
+                AND data_hora < %s
+                ORDER BY data_hora
+                LIMIT %s
+                FOR UPDATE
+            """
+            db.execute(sql, (corte, int(limite)))
+            ids = [row['id_agendamento'] for row in db.fetchall()]
+            movidos = {'agendamentos': 0, 'doacoes': 0}
+            if ids:
+                marcadores = ', '.join(['%s'] * len(ids))
+                db.execute(f"""
+                    INSERT INTO HistoricoDoacoesArquivo
+                    SELECT * FROM HistoricoDoacoes WHERE id_agendamento IN ({marcadores})
+                """, tuple(ids))
+                db.execute(f"DELETE FROM HistoricoDoacoes WHERE id_agendamento IN ({marcadores})", tuple(ids))
+                movidos['doacoes'] += db.rowcount
+                db.execute(f"""
+                    INSERT INTO AgendamentoArquivo
+                    SELECT * FROM Agendamento WHERE id_agendamento IN ({marcadores})
+                """, tuple(ids))
+                db.execute(f"DELETE FROM Agendamento WHERE id_agendamento IN ({marcadores})", tuple(ids))
+                movidos['agendamentos'] = db.rowcount
+            # doações registradas sem agendamento
+            sql_avulsas = """
+                SELECT id_doacao FROM HistoricoDoacoes
+                WHERE id_agendamento IS NULL AND data_doacao < %s
+                ORDER BY data_doacao
+                LIMIT %s
+                FOR UPDATE
+            """
+            db.execute(sql_avulsas, (corte.date(), int(limite)))
+            ids_doacao = [row['id_doacao'] for row in db.fetchall()]
+            if ids_doacao:
+                marcadores = ', '.join(['%s'] * len(ids_doacao))
+                db.execute(f"""
+                    INSERT INTO HistoricoDoacoesArquivo
+                    SELECT * FROM HistoricoDoacoes WHERE id_doacao IN ({marcadores})
+                """, tuple(ids_doacao))
+                db.execute(f"DELETE FROM HistoricoDoacoes WHERE id_doacao IN ({marcadores})", tuple(ids_doacao))
+                movidos['doacoes'] += db.rowcount
+            return movidos
+    
+    # contadores de slots que já passaram do corte não servem mais para nada
+    @staticmethod
+    def limpar_slots_antigos():
+        with get_db_manager() as db:
+            db.execute("DELETE FROM AgendamentoSlot WHERE slot_inicio < %s", (_corte_arquivo(),))
+            return db.rowcount
+
+#####################################################################################
+
+# respostas guardadas por Idempotency-Key (ver back/utils/idempotencia.py)
+class IdempotenciaModel:
+    # registra a chave como "em andamento" dentro da transação da requisição.
+    # se outra requisição com a mesma chave ainda não terminou, o INSERT espera o commit dela;
+    # devolve False quando a chave já existia.
+    @staticmethod
+    def reservar(id_usuario, chave, rota, hash_requisicao, ttl_horas):
+        with get_db_manager() as db:
+            db.execute(
+                "DELETE FROM ChaveIdempotencia WHERE id_usuario = %s AND chave = %s AND expira_em <= NOW()",
+                (id_usuario, chave)
+            )
+            sql = """
+                INSERT IGNORE INTO ChaveIdempotencia (id_usuario, chave, rota, hash_requisicao, expira_em)
+                VALUES (%s, %s, %s, %s, NOW() + INTERVAL %s HOUR)
+            """
+            db.execute(sql, (id_usuario, chave, rota, hash_requisicao, int(ttl_horas)))
+            return db.rowcount > 0
+    
+    # leitura com lock compartilhado: enxerga o commit da requisição original mesmo com o
+    # snapshot da transação atual já aberto
+    @staticmethod
+    def buscar(id_usuario, chave):
+        with get_db_manager() as db:
+            sql = """
+                SELECT rota, hash_requisicao, status_code, resposta
+                FROM ChaveIdempotencia
+                WHERE id_usuario = %s AND chave = %s AND expira_em > NOW()
+                LOCK IN SHARE MODE
+            """
+            db.execute(sql, (id_usuario, chave))
+            result = db.fetchone()
+            return dict(result) if result else None
+    
+    @staticmethod
+    def concluir(id_usuario, chave, status_code, resposta):
+        with get_db_manager() as db:
+            sql = """
+                UPDATE ChaveIdempotencia
+                SET status_code = %s, resposta = %s
+                WHERE id_usuario = %s AND chave = %s
+            """
+            db.execute(sql, (status_code, resposta, id_usuario, chave))
+            return db.rowcount > 0
+    
+    @staticmethod
+    def limpar_expiradas(limite=5000):
+        with get_db_manager() as db:
+            db.execute("DELETE FROM ChaveIdempotencia WHERE expira_em <= NOW() LIMIT %s", (int(limite),))
+            return db.rowcount
+
+#####################################################################################
+
 class HorarioFuncionamentoModel:
     DIAS_VALIDOS = ['domingo', 'segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado']
     @staticmethod
@@ -1237,6 +1946,7 @@ class HorarioFuncionamentoModel:
                 observacao
             )
             db.execute(sql, valores)
+            db.after_commit(invalidar_hemocentros)
             horario_id = db.lastrowid
             return HorarioFuncionamentoModel.buscar_por_id(horario_id)
     
@@ -1286,6 +1996,26 @@ class HorarioFuncionamentoModel:
             db.execute(sql, (id_hemocentro,))
             return db.fetchall()
     
+    # horários de vários hemocentros numa consulta só, agrupados por id_hemocentro
+    @staticmethod
+    def listar_por_hemocentros(ids_hemocentro, incluir_inativos=False):
+        agrupados = {id_hemocentro: [] for id_hemocentro in ids_hemocentro}
+        if not agrupados:
+            return agrupados
+        with get_db_manager() as db:
+            marcadores = ', '.join(['%s'] * len(agrupados))
+            sql = f"""
+                SELECT * FROM HorarioFuncionamento 
+                WHERE id_hemocentro IN ({marcadores})
+            """
+            if not incluir_inativos:
+                sql += " AND ativo = TRUE"
+            sql += " ORDER BY id_hemocentro, FIELD(dia_semana, 'domingo', 'segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado')"
+            db.execute(sql, tuple(agrupados.keys()))
+            for row in db.fetchall():
+                agrupados[row['id_hemocentro']].append(row)
+            return agrupados
+    
     @staticmethod
     def atualizar(horario_id, campos):
         if not campos:
@@ -1301,6 +2031,7 @@ class HorarioFuncionamentoModel:
             """
             valores = list(campos.values()) + [horario_id]
             db.execute(sql, tuple(valores))
+            db.after_commit(invalidar_hemocentros)
             return db.rowcount > 0
     
     @staticmethod
@@ -1308,6 +2039,7 @@ class HorarioFuncionamentoModel:
         with get_db_manager() as db:
             sql = "DELETE FROM HorarioFuncionamento WHERE id_horario = %s"
             db.execute(sql, (horario_id,))
+            db.after_commit(invalidar_hemocentros)
             return db.rowcount > 0
     
     @staticmethod
@@ -1638,7 +2370,7 @@ class UsuarioModel:
     
     @staticmethod
     def buscar_por_id(usuario_id):
-        with get_db_manager() as db:
+        with get_db_manager(prepared=True) as db:
             sql = "SELECT * FROM Usuario WHERE id_usuario = %s"
             db.execute(sql, (usuario_id,))
             result = db.fetchone()
@@ -1646,7 +2378,7 @@ class UsuarioModel:
     
     @staticmethod
     def buscar_por_email(email):
-        with get_db_manager() as db:
+        with get_db_manager(prepared=True) as db:
             sql = "SELECT * FROM Usuario WHERE email = %s"
             db.execute(sql, (email.lower().strip(),))
             result = db.fetchone()
@@ -1726,6 +2458,7 @@ class UsuarioModel:
             sql = f"UPDATE Usuario SET {campos_sql} WHERE id_usuario = %s"
             valores = list(campos_validos.values()) + [usuario_id]
             db.execute(sql, tuple(valores))
+            db.after_commit(lambda: invalidar_principal(id_usuario=usuario_id))
             return db.rowcount > 0
     
     @staticmethod
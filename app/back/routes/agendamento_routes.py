@@ -1,6 +1,11 @@
 from flask import Blueprint, request, jsonify, g
-from back.models import AgendamentoModel, HemocentroModel, CampanhaModel, UsuarioModel
+from back.models import AgendamentoModel, HemocentroModel, CampanhaModel, UsuarioModel, SlotIndisponivelError
 from back.utils.auth_utils import requer_doador, requer_colaborador
+from back.utils.idempotencia import idempotente
+from back.utils.elegibilidade_service import proxima_doacao_do_tipo, calcular_proxima_doacao, NOMES_TIPO
+from back.utils.hemocentro_service import agenda_do_hemocentro, janelas_do_dia, invalidar_hemocentros
+from back.utils.slots import slot_de, para_hora_local, FUSO_HORARIO
+from back.utils.paginacao import tamanho_pagina, codificar_cursor, decodificar_cursor, resposta_em_stream
 from datetime import datetime, timezone, timedelta
 
 agendamento_bp = Blueprint('agendamento_bp', __name__)
@@ -8,6 +13,7 @@ agendamento_bp = Blueprint('agendamento_bp', __name__)
 # criar agendamento
 @agendamento_bp.route('/agendamentos', methods=['POST'])
 @requer_doador
+@idempotente
 def criar_agendamento(current_user):
     try:
         data = request.json or {}
@@ -18,12 +24,22 @@ def criar_agendamento(current_user):
                     "success": False, 
                     "message": f"Campo obrigatório faltando: {campo}"
                 }), 400
+        # convertido uma vez: caches de vagas e hemocentros são indexados pelo id inteiro
+        try:
+            id_hemocentro = int(data['id_hemocentro'])
+        except (ValueError, TypeError):
+            return jsonify({
+                "success": False,
+                "message": "id_hemocentro inválido"
+            }), 400
         try:
             data_hora_str = data['data_hora'].replace('Z', '+00:00')
             data_agendamento = datetime.fromisoformat(data_hora_str)
+            # sem fuso (datetime-local do formulário): hora local do hemocentro
             if data_agendamento.tzinfo is None:
-                data_agendamento = data_agendamento.replace(tzinfo=timezone.utc)
-            data_hora_mysql = data_agendamento.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                data_agendamento = data_agendamento.replace(tzinfo=FUSO_HORARIO)
+            data_hora_utc = data_agendamento.astimezone(timezone.utc).replace(tzinfo=None)
+            data_hora_mysql = data_hora_utc.strftime('%Y-%m-%d %H:%M:%S')
             agora = datetime.now(timezone.utc)
             if data_agendamento <= agora:
                 return jsonify({
@@ -55,31 +71,7 @@ def criar_agendamento(current_user):
                 "success": False,
                 "message": f"Tipo de sangue inválido. Valores aceitos: {', '.join(tipos_sangue_validos)}"
             }), 400
-        hemocentro = HemocentroModel.buscar_por_id(data['id_hemocentro'])
-        if not hemocentro:
-            return jsonify({
-                "success": False,
-                "message": "Hemocentro não encontrado"
-            }), 404
-        if not hemocentro.get('ativo', False):
-            return jsonify({
-                "success": False,
-                "message": "Este hemocentro está temporariamente desativado"
-            }), 400
         id_campanha = data.get('id_campanha')
-        if id_campanha:
-            campanha = CampanhaModel.buscar_por_id(id_campanha)
-            if not campanha:
-                return jsonify({
-                    "success": False,
-                    "message": "Campanha não encontrada"
-                }), 404
-            
-            if not campanha.get('ativa', False):
-                return jsonify({
-                    "success": False,
-                    "message": "Esta campanha não está mais ativa"
-                }), 400
         usuario = g.current_user
         if usuario.get('data_nascimento'):
             data_nasc = usuario['data_nascimento']
@@ -96,60 +88,93 @@ def criar_agendamento(current_user):
                     "success": False,
                     "message": "A doação de sangue é permitida até os 69 anos"
                 }), 400
-            
-        ultima_doacao = AgendamentoModel.buscar_ultima_doacao_realizada(g.id_usuario)
-        if ultima_doacao:
-            ultima_data = ultima_doacao.get('data_hora')
-            if isinstance(ultima_data, str):
-                ultima_data = datetime.fromisoformat(ultima_data.replace('Z', '+00:00'))
-            
-            if ultima_data.tzinfo is None:
-                ultima_data = ultima_data.replace(tzinfo=timezone.utc)
-
-            dias_desde_ultima = (data_agendamento - ultima_data).days
-            
-            if tipo_sangue == 'sangue_total':
-                intervalo_minimo = 75
-                tipo_intervalo = "sangue total"
-            elif tipo_sangue in ['plaquetas', 'plasma']:
-                intervalo_minimo = 2
-                tipo_intervalo = tipo_sangue
-            else:
-                intervalo_minimo = 7
-                tipo_intervalo = "aférese"
-            
-            if dias_desde_ultima < intervalo_minimo:
-                dias_faltando = intervalo_minimo - dias_desde_ultima
-                return jsonify({
-                    "success": False,
-                    "message": f"Intervalo mínimo entre doações de {tipo_intervalo} não respeitado. Aguarde {dias_faltando} dias",
-                    "proxima_doacao_permitida": (ultima_data + timedelta(days=intervalo_minimo)).isoformat()
-                }), 400
-        
-        agendamentos_existentes = AgendamentoModel.listar_por_usuario(
+        # hemocentro, campanha, última doação, pendências no dia e primeira vez numa consulta só
+        preflight = AgendamentoModel.preflight(
             id_usuario=g.id_usuario,
-            status='pendente'
+            id_hemocentro=id_hemocentro,
+            data_hora=data_hora_utc,
+            id_campanha=id_campanha
         )
-        for ag in agendamentos_existentes:
-            ag_data = ag.get('data_hora')
-            if isinstance(ag_data, str):
-                ag_data = datetime.fromisoformat(ag_data.replace('Z', '+00:00'))
+        if not preflight:
+            return jsonify({
+                "success": False,
+                "message": "Usuário inválido ou inativo"
+            }), 403
+        if preflight['hemocentro_ativo'] is None:
+            return jsonify({
+                "success": False,
+                "message": "Hemocentro não encontrado"
+            }), 404
+        if not preflight['hemocentro_ativo']:
+            return jsonify({
+                "success": False,
+                "message": "Este hemocentro está temporariamente desativado"
+            }), 400
+        if id_campanha:
+            if preflight['campanha_ativa'] is None:
+                return jsonify({
+                    "success": False,
+                    "message": "Campanha não encontrada"
+                }), 404
             
-            if (ag_data.date() == data_agendamento.date() and 
-                ag.get('id_hemocentro') == data['id_hemocentro']):
+            if not preflight['campanha_ativa']:
                 return jsonify({
                     "success": False,
-                    "message": "Você já possui um agendamento pendente para este dia neste hemocentro"
+                    "message": "Esta campanha não está mais ativa"
                 }), 400
             
+        # intervalo entre doações: mesma fonte (HistoricoDoacoes) e regra do GET /elegibilidade
+        dia_agendamento = para_hora_local(data_agendamento).date()
+        proxima_permitida = proxima_doacao_do_tipo(g.id_usuario, tipo_sangue)
+        if proxima_permitida and dia_agendamento < proxima_permitida:
+            dias_faltando = (proxima_permitida - dia_agendamento).days
+            return jsonify({
+                "success": False,
+                "message": f"Intervalo mínimo entre doações de {NOMES_TIPO[tipo_sangue]} não respeitado. Aguarde {dias_faltando} dias",
+                "proxima_doacao_permitida": proxima_permitida.isoformat()
+            }), 400
+        
+        if preflight['pendentes_no_dia']:
+            return jsonify({
+                "success": False,
+                "message": "Você já possui um agendamento pendente para este dia neste hemocentro"
+            }), 400
+        
+        if id_campanha:
+            tipo_doacao = 'campanha'
+        else:
+            tipo_doacao = 'primeira_vez' if preflight['primeira_vez'] else 'espontanea'
+        
+        # slot do horário pedido (grade vem do cache de hemocentros)
+        agenda = agenda_do_hemocentro(id_hemocentro)
+        if agenda is None:
+            invalidar_hemocentros()
+            agenda = agenda_do_hemocentro(id_hemocentro)
+        if agenda is None:
+            return jsonify({
+                "success": False,
+                "message": "Este hemocentro está temporariamente desativado"
+            }), 400
+        # grade e slots em hora local do hemocentro
+        data_hora_local = para_hora_local(data_agendamento)
+        slot_inicio = slot_de(data_hora_local, janelas_do_dia(agenda, data_hora_local), agenda['duracao'])
+        if slot_inicio is None:
+            return jsonify({
+                "success": False,
+                "message": "Horário fora do funcionamento do hemocentro"
+            }), 400
+            
         agendamento = AgendamentoModel.criar(
             id_usuario=g.id_usuario,
-            id_hemocentro=data['id_hemocentro'],
+            id_hemocentro=id_hemocentro,
             data_hora=data_hora_mysql,
             tipo_sangue_doado=tipo_sangue,
             id_campanha=id_campanha,
             status='pendente',
-            observacoes=data.get('observacoes', '').strip() if data.get('observacoes') else None
+            observacoes=data.get('observacoes', '').strip() if data.get('observacoes') else None,
+            tipo_doacao=tipo_doacao,
+            slot_inicio=slot_inicio,
+            capacidade_slot=agenda['capacidade']
         )
         
         return jsonify({
@@ -158,6 +183,8 @@ def criar_agendamento(current_user):
             "agendamento": agendamento
         }), 201
         
+    except SlotIndisponivelError as e:
+        return jsonify({"success": False, "message": str(e)}), 409
     except ValueError as ve:
         return jsonify({"success": False, "message": str(ve)}), 400
     except Exception as e:
@@ -176,9 +203,12 @@ def listar_meus_agendamentos(current_user):
     try:
         status = request.args.get('status')
         apenas_futuros = request.args.get('futuro', 'false').lower() == 'true'
+        # ?arquivo=true inclui agendamentos antigos já arquivados
+        incluir_arquivo = request.args.get('arquivo', 'false').lower() == 'true'
         agendamentos = AgendamentoModel.listar_por_usuario(
             id_usuario=g.id_usuario,
-            status=status
+            status=status,
+            incluir_arquivo=incluir_arquivo
         )
         if apenas_futuros:
             agora = datetime.now() 
@@ -266,16 +296,33 @@ def listar_todos_agendamentos(current_user):
                     "success": False,
                     "message": "Formato de data_inicio inválido. Use YYYY-MM-DD"
                 }), 400
+        try:
+            limite = tamanho_pagina(request.args.get('limite'))
+            cursor = decodificar_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "message": "Parâmetros de paginação inválidos (limite ou cursor)"
+            }), 400
+        # uma linha a mais só para saber se existe próxima página
         agendamentos = AgendamentoModel.listar_todos(
             status=status,
             id_hemocentro=g.id_hemocentro,
-            data_inicio=data_inicio
+            data_inicio=data_inicio,
+            limite=limite + 1,
+            cursor=cursor
         )
-        return jsonify({
+        next_cursor = None
+        if len(agendamentos) > limite:
+            agendamentos = agendamentos[:limite]
+            ultimo = agendamentos[-1]
+            next_cursor = codificar_cursor(ultimo['data_hora'], ultimo['id_agendamento'])
+        return resposta_em_stream({
             "success": True,
             "total": len(agendamentos),
-            "agendamentos": agendamentos
-        }), 200
+            "limite": limite,
+            "next_cursor": next_cursor
+        }, "agendamentos", agendamentos)
         
     except Exception as e:
         print(f"[ERRO] Listar todos agendamentos: {str(e)}")
@@ -370,16 +417,7 @@ def marcar_realizado(current_user, id_agendamento):
         try:
             # calcular próxima doação permitida
             tipo_doacao = agendamento.get('tipo_sangue_doado', 'sangue_total')
-            agora = datetime.now()
-            
-            if tipo_doacao == 'sangue_total':
-                proxima_doacao = agora + timedelta(days=75)
-            elif tipo_doacao in ['plaquetas', 'plasma']:
-                proxima_doacao = agora + timedelta(days=2)
-            elif tipo_doacao == 'aferese':
-                proxima_doacao = agora + timedelta(days=7)
-            else:
-                proxima_doacao = agora + timedelta(days=60)
+            proxima_doacao = calcular_proxima_doacao(tipo_doacao)
             
             # quantidade padrão de sangue coletado (pode ser parametrizado depois)
             quantidade_ml = 450
@@ -487,4 +525,52 @@ def marcar_nao_compareceu(current_user, id_agendamento):
         return jsonify({
             "success": False,
             "message": "Erro ao atualizar agendamento"
-        }), 500
\ No newline at end of file
+        }), 500
+
+# confirmar ou marcar falta de vários agendamentos de uma vez
+# body: {"ids": [1, 2, 3], "status": "confirmado" | "nao_compareceu"}
+@agendamento_bp.route('/agendamentos/lote/status', methods=['PATCH'])
+@requer_colaborador
+def atualizar_status_lote(current_user):
+    try:
+        data = request.json or {}
+        status_novo = str(data.get('status', '')).strip().lower()
+        if status_novo not in AgendamentoModel.TRANSICOES_LOTE:
+            return jsonify({
+                "success": False,
+                "message": f"Status inválido. Valores aceitos: {', '.join(AgendamentoModel.TRANSICOES_LOTE)}"
+            }), 400
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return jsonify({
+                "success": False,
+                "message": "Informe a lista de ids"
+            }), 400
+        if len(ids) > 500:
+            return jsonify({
+                "success": False,
+                "message": "Máximo 500 agendamentos por lote"
+            }), 400
+        try:
+            ids = [int(id_agendamento) for id_agendamento in ids]
+        except (ValueError, TypeError):
+            return jsonify({
+                "success": False,
+                "message": "Os ids devem ser números inteiros"
+            }), 400
+        resultado = AgendamentoModel.atualizar_status_em_lote(ids, status_novo, g.id_hemocentro)
+        recusados = len(resultado['nao_encontrados']) + len(resultado['sem_permissao']) + len(resultado['status_invalido'])
+        return jsonify({
+            "success": True,
+            "message": f"{len(resultado['atualizados'])} agendamento(s) atualizado(s), {recusados} recusado(s)",
+            **resultado
+        }), 200
+        
+    except Exception as e:
+        print(f"[ERRO] Atualizar status em lote: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "message": "Erro ao atualizar agendamentos"
+        }), 500
@@ -1,6 +1,13 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, jsonify, g, current_app
 from back.models import CampanhaModel, HemocentroModel
 from back.utils.auth_utils import requer_colaborador
+from back.utils.campanha_service import (
+    listar_campanhas_ativas, campanhas_em_destaque, campanhas_proximas_vencer, CAMPANHAS_VENCENDO_MAX_DIAS
+)
+from back.utils.campanha_stream import (
+    assinar, gerar_eventos, progresso_payload, LimiteAssinantesError, SSE_HEARTBEAT
+)
+from back.utils.http_cache import resposta_condicional
 from datetime import datetime
 
 campanha_bp = Blueprint('campanha_bp', __name__)
@@ -102,25 +109,35 @@ def criar_campanha(current_user):
             "message": "Erro interno do servidor."
         }), 500
 
-# campanhas ativas
+# campanhas ativas (catálogo em memória, ver campanha_service)
 @campanha_bp.route('/campanhas', methods=['GET'])
 def listar_campanhas():
     try:
         id_hemocentro = request.args.get('id_hemocentro', type=int)
         tipo_sanguineo = request.args.get('tipo_sanguineo')
         apenas_destaque = request.args.get('destaque', 'false').lower() == 'true'
+        # compativel_com: tipo do doador (campanhas de todos os tipos que ele pode atender)
+        compativel_com = request.args.get('compativel_com')
+        tipos_validos = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
         if tipo_sanguineo:
-            tipos_validos = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
             tipo_sanguineo = tipo_sanguineo.strip().upper()
             if tipo_sanguineo not in tipos_validos:
                 return jsonify({
                     "success": False,
                     "message": f"Tipo sanguíneo inválido. Use: {', '.join(tipos_validos)}"
                 }), 400
-        campanhas = CampanhaModel.listar_ativas(
+        if compativel_com:
+            compativel_com = compativel_com.strip().upper()
+            if compativel_com not in tipos_validos:
+                return jsonify({
+                    "success": False,
+                    "message": f"Tipo sanguíneo inválido. Use: {', '.join(tipos_validos)}"
+                }), 400
+        campanhas = listar_campanhas_ativas(
             id_hemocentro=id_hemocentro,
-            tipo_sanguineo_necessario=tipo_sanguineo,
-            apenas_destaque=apenas_destaque
+            tipo_sanguineo=tipo_sanguineo,
+            apenas_destaque=apenas_destaque,
+            compativel_com=compativel_com
         )
         return jsonify({
             "success": True,
@@ -137,6 +154,111 @@ def listar_campanhas():
             "message": "Erro interno do servidor."
         }), 500
 
+# destaques da página inicial (pré-calculados no catálogo)
+@campanha_bp.route('/campanhas/destaque', methods=['GET'])
+def listar_destaques():
+    try:
+        limite = min(max(request.args.get('limite', 5, type=int), 1), 50)
+        campanhas = campanhas_em_destaque(limite)
+        return jsonify({
+            "success": True,
+            "campanhas": campanhas,
+            "total": len(campanhas)
+        }), 200
+    except Exception as e:
+        print(f"[ERRO] Campanhas em destaque: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "message": "Erro interno do servidor."
+        }), 500
+
+# campanhas perto do fim (pré-calculadas no catálogo)
+@campanha_bp.route('/campanhas/vencendo', methods=['GET'])
+def listar_vencendo():
+    try:
+        dias = request.args.get('dias', 7, type=int)
+        if dias < 0 or dias > CAMPANHAS_VENCENDO_MAX_DIAS:
+            return jsonify({
+                "success": False,
+                "message": f"dias deve estar entre 0 e {CAMPANHAS_VENCENDO_MAX_DIAS}."
+            }), 400
+        limite = min(max(request.args.get('limite', 10, type=int), 1), 50)
+        campanhas = campanhas_proximas_vencer(dias, limite)
+        return jsonify({
+            "success": True,
+            "campanhas": campanhas,
+            "total": len(campanhas)
+        }), 200
+    except Exception as e:
+        print(f"[ERRO] Campanhas próximas de vencer: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "message": "Erro interno do servidor."
+        }), 500
+
+# progresso de uma campanha (polling com ETag; é o fallback do stream)
+@campanha_bp.route('/campanhas/<int:campanha_id>/progresso', methods=['GET'])
+def progresso_campanha(campanha_id):
+    try:
+        payload = progresso_payload(campanha_id)
+        if payload is None:
+            return jsonify({
+                "success": False,
+                "message": "Campanha não encontrada."
+            }), 404
+        return resposta_condicional({"success": True, "progresso": payload['dados']}, payload['etag'])
+    except Exception as e:
+        print(f"[ERRO] Progresso da campanha: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "message": "Erro interno do servidor."
+        }), 500
+
+# progresso ao vivo (Server-Sent Events). cada conexão ocupa uma thread do servidor
+# (precisa de servidor com threads); lotado -> 503 e o cliente faz polling em /progresso
+@campanha_bp.route('/campanhas/<int:campanha_id>/stream', methods=['GET'])
+def stream_campanha(campanha_id):
+    try:
+        # estado inicial lido aqui, dentro da requisição; o gerador não toca no banco
+        inicial = progresso_payload(campanha_id)
+        if inicial is None:
+            return jsonify({
+                "success": False,
+                "message": "Campanha não encontrada."
+            }), 404
+        try:
+            assinante = assinar(campanha_id)
+        except LimiteAssinantesError:
+            response = jsonify({
+                "success": False,
+                "message": "Muitas conexões abertas, use o polling.",
+                "polling": f"/api/campanhas/{campanha_id}/progresso"
+            })
+            response.status_code = 503
+            response.headers['Retry-After'] = str(SSE_HEARTBEAT)
+            return response
+        response = current_app.response_class(
+            gerar_eventos(assinante, inicial),
+            mimetype='text/event-stream'
+        )
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    except Exception as e:
+        print(f"[ERRO] Stream da campanha: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "message": "Erro interno do servidor."
+        }), 500
+
 # buscar campanha por id
 @campanha_bp.route('/campanhas/<int:campanha_id>', methods=['GET'])
 @requer_colaborador
@@ -255,13 +377,15 @@ def atualizar_campanha(current_user, campanha_id):
                 }), 400
         if 'quantidade_atual_litros' in campos_para_atualizar:
             try:
-                quantidade = int(campos_para_atualizar['quantidade_atual_litros'])
-                if quantidade < 0:
+                # litros com fração (o total exibido inclui as fatias ainda não consolidadas)
+                quantidade = float(campos_para_atualizar['quantidade_atual_litros'])
+                if not 0 <= quantidade < float('inf'):
                     raise ValueError
+                campos_para_atualizar['quantidade_atual_litros'] = quantidade
             except (ValueError, TypeError):
                 return jsonify({
                     "success": False,
-                    "message": "Quantidade atual deve ser um número inteiro não-negativo."
+                    "message": "Quantidade atual deve ser um número não-negativo."
                 }), 400
         CampanhaModel.atualizar(campanha_id, campos_para_atualizar)
         return jsonify({
@@ -1,11 +1,12 @@
 from flask import Blueprint, request, jsonify, g
-from back.models import EstoqueModel, HemocentroModel
+from back.models import EstoqueModel, EstoqueNaoEncontradoError, EstoqueInsuficienteError
 from back.utils.auth_utils import requer_colaborador, validar_tipo_sanguineo
+from back.utils.estoque_service import obter_snapshot, resumir_estoque
+from back.utils.hemocentro_service import hemocentro_padrao
+from back.utils.http_cache import resposta_condicional
+from datetime import date, datetime, timedelta
 
 estoque_bp = Blueprint('estoque_bp', __name__)
-def obter_hemocentro_sistema():
-    hemocentros = HemocentroModel.listar_ativos()
-    return hemocentros[0] if hemocentros else None
 
 # adcionar no estoque
 @estoque_bp.route('/estoque/adicionar', methods=['POST'])
@@ -46,7 +47,8 @@ def adicionar_estoque(current_user):
         estoque_atualizado = EstoqueModel.adicionar_estoque(
             id_hemocentro=g.id_hemocentro,
             tipo_sanguineo=tipo_sanguineo,
-            quantidade=quantidade
+            quantidade=quantidade,
+            id_usuario=g.id_usuario
         )
         return jsonify({
             "success": True,
@@ -93,31 +95,27 @@ def remover_estoque(current_user):
                 "success": False, 
                 "message": "Quantidade deve ser um número inteiro"
             }), 400
-        estoque_atual = EstoqueModel.buscar_estoque(
-            id_hemocentro=g.id_hemocentro,
-            tipo_sanguineo=tipo_sanguineo
-        )
-        if not estoque_atual:
-            return jsonify({
-                "success": False,
-                "message": f"Nenhum estoque de {tipo_sanguineo} encontrado"
-            }), 404
-        quantidade_disponivel = estoque_atual.get('quantidade', 0)
-        if quantidade_disponivel < quantidade:
-            return jsonify({
-                "success": False,
-                "message": f"Estoque insuficiente. Disponível: {quantidade_disponivel} unidade(s)"
-            }), 400
         estoque_atualizado = EstoqueModel.remover_estoque(
             id_hemocentro=g.id_hemocentro,
             tipo_sanguineo=tipo_sanguineo,
-            quantidade=quantidade
+            quantidade=quantidade,
+            id_usuario=g.id_usuario
         )
         return jsonify({
             "success": True,
             "message": f"{quantidade} unidade(s) de {tipo_sanguineo} removida(s) do estoque",
             "estoque": estoque_atualizado
         }), 200
+    except EstoqueNaoEncontradoError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 404
+    except EstoqueInsuficienteError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
     except Exception as e:
         print(f"[ERRO] Remover estoque: {str(e)}")
         import traceback
@@ -127,35 +125,18 @@ def remover_estoque(current_user):
             "message": "Erro ao remover do estoque"
         }), 500
 
-# publico consultar estoque
+# publico consultar estoque (snapshot em memória, com ETag)
 @estoque_bp.route('/estoque', methods=['GET'])
 def consultar_estoque():
     try:
-        hemocentro = obter_hemocentro_sistema()
-        if not hemocentro:
+        id_hemocentro = hemocentro_padrao()
+        snapshot = obter_snapshot(id_hemocentro) if id_hemocentro else None
+        if not snapshot:
             return jsonify({
                 "success": False,
                 "message": "Hemocentro não encontrado"
             }), 404
-        estoque = EstoqueModel.listar_estoque_hemocentro(hemocentro['id_hemocentro'])
-        total_unidades = sum(item.get('quantidade', 0) for item in estoque)
-        tipos_criticos = sum(1 for item in estoque if item.get('nivel') == 'critico')
-        return jsonify({
-            "success": True,
-            "hemocentro": {
-                "id_hemocentro": hemocentro['id_hemocentro'],
-                "nome": hemocentro['nome'],
-                "endereco": hemocentro.get('endereco'),
-                "cidade": hemocentro.get('cidade'),
-                "telefone": hemocentro.get('telefone')
-            },
-            "estoque": estoque,
-            "resumo": {
-                "total_unidades": total_unidades,
-                "tipos_disponiveis": len(estoque),
-                "tipos_criticos": tipos_criticos
-            }
-        }), 200
+        return resposta_condicional(snapshot['payload'], snapshot['etag'])
     except Exception as e:
         print(f"[ERRO] Consultar estoque: {str(e)}")
         import traceback
@@ -267,7 +248,8 @@ def atualizar_estoque_direto(current_user):
         estoque_atualizado = EstoqueModel.atualizar_quantidade(
             id_hemocentro=g.id_hemocentro,
             tipo_sanguineo=tipo_sanguineo,
-            quantidade=quantidade
+            quantidade=quantidade,
+            id_usuario=g.id_usuario
         )
         return jsonify({
             "success": True,
@@ -283,40 +265,163 @@ def atualizar_estoque_direto(current_user):
             "message": "Erro ao atualizar estoque"
         }), 500
     
+# movimentação em lote (fechamento de turno): vários tipos numa requisição e numa transação.
+# cada item traz "delta" (soma/subtrai) ou "quantidade" (valor absoluto)
+@estoque_bp.route('/estoque/lote', methods=['POST'])
+@requer_colaborador
+def movimentar_estoque_lote(current_user):
+    try:
+        data = request.json or {}
+        itens = data.get('movimentacoes')
+        if not isinstance(itens, list) or not itens:
+            return jsonify({
+                "success": False,
+                "message": "Informe a lista de movimentacoes"
+            }), 400
+        if len(itens) > 50:
+            return jsonify({
+                "success": False,
+                "message": "Máximo 50 movimentações por lote"
+            }), 400
+        movimentacoes = []
+        for posicao, item in enumerate(itens, start=1):
+            if not isinstance(item, dict) or not item.get('tipo_sanguineo'):
+                return jsonify({
+                    "success": False,
+                    "message": f"Movimentação {posicao}: campo obrigatório faltando: tipo_sanguineo"
+                }), 400
+            tipo_sanguineo = str(item['tipo_sanguineo']).strip().upper()
+            if not validar_tipo_sanguineo(tipo_sanguineo):
+                return jsonify({
+                    "success": False,
+                    "message": f"Movimentação {posicao}: tipo sanguíneo inválido. Use: A+, A-, B+, B-, AB+, AB-, O+, O-"
+                }), 400
+            if ('delta' in item) == ('quantidade' in item):
+                return jsonify({
+                    "success": False,
+                    "message": f"Movimentação {posicao}: informe 'delta' ou 'quantidade' (apenas um)"
+                }), 400
+            try:
+                if 'delta' in item:
+                    delta = int(item['delta'])
+                    if delta == 0 or abs(delta) > 1000:
+                        return jsonify({
+                            "success": False,
+                            "message": f"Movimentação {posicao}: delta deve ser diferente de zero e no máximo 1000 unidades"
+                        }), 400
+                    movimentacoes.append({'tipo_sanguineo': tipo_sanguineo, 'delta': delta})
+                else:
+                    quantidade = int(item['quantidade'])
+                    if quantidade < 0:
+                        return jsonify({
+                            "success": False,
+                            "message": f"Movimentação {posicao}: quantidade não pode ser negativa"
+                        }), 400
+                    movimentacoes.append({'tipo_sanguineo': tipo_sanguineo, 'quantidade': quantidade})
+            except (ValueError, TypeError):
+                return jsonify({
+                    "success": False,
+                    "message": f"Movimentação {posicao}: valor deve ser um número inteiro"
+                }), 400
+        estoque = EstoqueModel.aplicar_movimentacoes(g.id_hemocentro, movimentacoes, id_usuario=g.id_usuario)
+        return jsonify({
+            "success": True,
+            "message": f"{len(movimentacoes)} movimentação(ões) aplicada(s) ao estoque",
+            "estoque": estoque,
+            "resumo": resumir_estoque(estoque)
+        }), 200
+    except EstoqueNaoEncontradoError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 404
+    except EstoqueInsuficienteError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        print(f"[ERRO] Movimentar estoque em lote: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "message": "Erro ao movimentar estoque"
+        }), 500
+
+# série diária do estoque do hemocentro (agregados de EstoqueDiario)
+@estoque_bp.route('/estoque/historico', methods=['GET'])
+@requer_colaborador
+def historico_estoque(current_user):
+    try:
+        hoje = date.today()
+        try:
+            data_fim = datetime.strptime(request.args['ate'], '%Y-%m-%d').date() if request.args.get('ate') else hoje
+            data_inicio = datetime.strptime(request.args['de'], '%Y-%m-%d').date() if request.args.get('de') else data_fim - timedelta(days=30)
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "message": "Formato de data inválido. Use YYYY-MM-DD"
+            }), 400
+        if data_inicio > data_fim:
+            return jsonify({
+                "success": False,
+                "message": "Data inicial deve ser anterior à final"
+            }), 400
+        if (data_fim - data_inicio).days > 366:
+            return jsonify({
+                "success": False,
+                "message": "Período máximo de 366 dias"
+            }), 400
+        tipo_sanguineo = request.args.get('tipo_sanguineo')
+        if tipo_sanguineo:
+            tipo_sanguineo = tipo_sanguineo.strip().upper()
+            if not validar_tipo_sanguineo(tipo_sanguineo):
+                return jsonify({
+                    "success": False,
+                    "message": "Tipo sanguíneo inválido"
+                }), 400
+        serie = EstoqueModel.serie_diaria(g.id_hemocentro, data_inicio, data_fim, tipo_sanguineo)
+        por_tipo = {}
+        for ponto in serie:
+            por_tipo.setdefault(ponto['tipo_sanguineo'], []).append({
+                "dia": ponto['dia'].isoformat(),
+                "entradas": ponto['entradas'],
+                "saidas": ponto['saidas'],
+                "movimentacoes": ponto['movimentacoes'],
+                "saldo_final": ponto['saldo_final']
+            })
+        return jsonify({
+            "success": True,
+            "de": data_inicio.isoformat(),
+            "ate": data_fim.isoformat(),
+            "series": por_tipo
+        }), 200
+    except Exception as e:
+        print(f"[ERRO] Histórico de estoque: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "message": "Erro ao consultar histórico do estoque"
+        }), 500
+
 #consultar estoque por hemocentro específico
 @estoque_bp.route('/estoque/hemocentro/<int:id_hemocentro>', methods=['GET'])
 def consultar_estoque_por_hemocentro(id_hemocentro):
     try:
-        hemocentro = HemocentroModel.buscar_por_id(id_hemocentro)
-        if not hemocentro:
+        snapshot = obter_snapshot(id_hemocentro)
+        if not snapshot:
             return jsonify({
                 "success": False,
                 "message": "Hemocentro não encontrado"
             }), 404
-        if not hemocentro.get('ativo'):
+        if not snapshot['ativo']:
             return jsonify({
                 "success": False,
                 "message": "Hemocentro inativo"
             }), 404
-        estoque = EstoqueModel.listar_estoque_hemocentro(id_hemocentro)
-        total_unidades = sum(item.get('quantidade', 0) for item in estoque)
-        tipos_criticos = sum(1 for item in estoque if item.get('nivel') == 'critico')
-        return jsonify({
-            "success": True,
-            "hemocentro": {
-                "id_hemocentro": hemocentro['id_hemocentro'],
-                "nome": hemocentro['nome'],
-                "endereco": hemocentro.get('endereco'),
-                "cidade": hemocentro.get('cidade'),
-                "telefone": hemocentro.get('telefone')
-            },
-            "estoque": estoque,
-            "resumo": {
-                "total_unidades": total_unidades,
-                "tipos_disponiveis": len(estoque),
-                "tipos_criticos": tipos_criticos
-            }
-        }), 200
+        return resposta_condicional(snapshot['payload'], snapshot['etag'])
     except Exception as e:
         print(f"[ERRO] Consultar estoque por hemocentro: {str(e)}")
         import traceback
@@ -324,4 +429,4 @@ def consultar_estoque_por_hemocentro(id_hemocentro):
         return jsonify({
             "success": False,
             "message": "Erro ao consultar estoque"
-        }), 500
\ No newline at end of file
+        }), 500
@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify, g
 from back.utils.auth_utils import requer_colaborador, only_numbers, validar_email, validar_telefone, is_cnpj
 from back.utils.aprovacao_service import criar_solicitacao_aprovacao
+from back.utils.hemocentro_service import listar_hemocentros_com_horarios
+from back.utils.vagas_service import vagas_por_dia, VAGAS_MAX_DIAS
+from back.utils.slots import para_utc, hoje_local, FUSO_HORARIO
+from datetime import datetime, date, timedelta
 from back.models import HemocentroModel
 
 hemocentro_bp = Blueprint('hemocentro_bp', __name__)
@@ -139,77 +143,11 @@ def cadastrar_novo_hemocentro():
             "message": "Erro interno ao cadastrar hemocentro"
         }), 500
 
-# listar hemocentros COM HORÁRIOS
+# listar hemocentros COM HORÁRIOS (lote + grade semanal em cache, ver hemocentro_service)
 @hemocentro_bp.route('/hemocentros', methods=['GET'])
 def listar_hemocentros():
     try:
-        from back.models import HorarioFuncionamentoModel
-        from datetime import datetime, time, timedelta
-        hemocentros = HemocentroModel.listar_ativos()
-        # adicionar horários para cada hemocentro
-        for hemo in hemocentros:
-            # buscar horários
-            horarios = HorarioFuncionamentoModel.listar_por_hemocentro(
-                id_hemocentro=hemo['id_hemocentro'],
-                incluir_inativos=False
-            )
-            # mmapear dias da semana
-            DIAS_NUMERO_PARA_NOME = [
-                'domingo', 'segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado'
-            ]
-            DIAS_SEMANA_NOMES = [
-                'Domingo', 'Segunda-feira', 'Terça-feira', 'Quarta-feira',
-                'Quinta-feira', 'Sexta-feira', 'Sábado'
-            ]
-            # formatar horários
-            horarios_formatados = []
-            for horario in horarios:
-                dia_nome_banco = horario.get('dia_semana', 'domingo')
-                try:
-                    dia_numero = DIAS_NUMERO_PARA_NOME.index(dia_nome_banco)
-                    horario['dia_semana_numero'] = dia_numero
-                    horario['dia_semana_nome'] = DIAS_SEMANA_NOMES[dia_numero]
-                except ValueError:
-                    horario['dia_semana_numero'] = 0
-                    horario['dia_semana_nome'] = 'Domingo'
-                # converter timedelta para string no formato "HH:MM:SS"
-                if isinstance(horario.get('horario_abertura'), timedelta):
-                    total_seconds = int(horario['horario_abertura'].total_seconds())
-                    hours = total_seconds // 3600
-                    minutes = (total_seconds % 3600) // 60
-                    seconds = total_seconds % 60
-                    horario['horario_abertura'] = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-                if isinstance(horario.get('horario_fechamento'), timedelta):
-                    total_seconds = int(horario['horario_fechamento'].total_seconds())
-                    hours = total_seconds // 3600
-                    minutes = (total_seconds % 3600) // 60
-                    seconds = total_seconds % 60
-                    horario['horario_fechamento'] = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-                horarios_formatados.append(horario)
-            # ordenar por dia da semana
-            horarios_formatados.sort(key=lambda x: x.get('dia_semana_numero', 0))
-            hemo['horarios'] = horarios_formatados
-            # verificar se está aberto agora
-            agora = datetime.now()
-            dia_atual = (agora.weekday() + 1) % 7  # converter para 0=domingo
-            hora_atual = agora.time()
-            hemo['aberto_agora'] = False
-            for h in horarios_formatados:
-                if h.get('dia_semana_numero') == dia_atual and h.get('ativo', False):
-                    abertura = h['horario_abertura']
-                    fechamento = h['horario_fechamento']
-                    # converter strings para time se necessário
-                    if isinstance(abertura, str):
-                        if len(abertura.split(':')) == 2:
-                            abertura += ':00'
-                        abertura = time.fromisoformat(abertura)
-                    if isinstance(fechamento, str):
-                        if len(fechamento.split(':')) == 2:
-                            fechamento += ':00'
-                        fechamento = time.fromisoformat(fechamento)
-                    if abertura <= hora_atual <= fechamento:
-                        hemo['aberto_agora'] = True
-                        break
+        hemocentros = listar_hemocentros_com_horarios()
         return jsonify({
             "success": True,
             "hemocentros": hemocentros,
@@ -224,6 +162,64 @@ def listar_hemocentros():
             "message": "Erro ao listar hemocentros"
         }), 500
 
+# slots livres de um hemocentro (?from=YYYY-MM-DD&to=YYYY-MM-DD, dias locais, padrão: próximos 7 dias).
+# "inicio" é a hora local do hemocentro com o offset (aceito como está pelo POST /agendamentos);
+# só entram slots que ainda podem ser agendados.
+@hemocentro_bp.route('/hemocentros/<int:id_hemocentro>/slots', methods=['GET'])
+def listar_slots_hemocentro(id_hemocentro):
+    try:
+        try:
+            de = date.fromisoformat(request.args['from']) if request.args.get('from') else hoje_local()
+            ate = date.fromisoformat(request.args['to']) if request.args.get('to') else de + timedelta(days=6)
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "message": "Formato de data inválido. Use YYYY-MM-DD"
+            }), 400
+        if ate < de:
+            return jsonify({
+                "success": False,
+                "message": "A data final deve ser igual ou posterior à inicial"
+            }), 400
+        if (ate - de).days + 1 > VAGAS_MAX_DIAS:
+            return jsonify({
+                "success": False,
+                "message": f"Intervalo máximo de {VAGAS_MAX_DIAS} dias"
+            }), 400
+        dias = vagas_por_dia(id_hemocentro, de, ate)
+        if dias is None:
+            return jsonify({
+                "success": False,
+                "message": "Hemocentro não encontrado ou inativo"
+            }), 404
+        # mesma janela aceita na criação do agendamento: 24h a 6 meses
+        # slots estão em hora local; a janela é conferida em UTC
+        agora = datetime.utcnow()
+        minimo = agora + timedelta(hours=24)
+        maximo = agora + timedelta(days=180)
+        resultado = []
+        for dia, slots in dias:
+            livres = [
+                {"inicio": slot.replace(tzinfo=FUSO_HORARIO).isoformat(), "vagas": vagas}
+                for slot, vagas in slots
+                if vagas > 0 and minimo <= para_utc(slot) <= maximo
+            ]
+            resultado.append({"data": dia.isoformat(), "slots": livres})
+        return jsonify({
+            "success": True,
+            "id_hemocentro": id_hemocentro,
+            "dias": resultado,
+            "total_slots": sum(len(d['slots']) for d in resultado)
+        }), 200
+    except Exception as e:
+        print(f"[ERRO] Listar slots do hemocentro: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "message": "Erro ao listar horários disponíveis"
+        }), 500
+
 # buscar hemocentro por cnpj
 # @hemocentro_bp.route('/hemocentros/<cnpj>', methods=['GET'])
 # def buscar_hemocentro(cnpj):
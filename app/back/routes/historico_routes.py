@@ -1,28 +1,15 @@
 from flask import Blueprint, request, jsonify, g
 from back.utils.auth_utils import requer_colaborador, requer_doador, token_required
+from back.utils.idempotencia import idempotente
+from back.utils.elegibilidade_service import calcular_proxima_doacao, elegibilidade
 from back.models import HistoricoModel, AgendamentoModel, CampanhaModel
-from datetime import datetime, timedelta
+from datetime import datetime
 
 historico_bp = Blueprint('historico_bp', __name__)
-# calculo de próxima doação
-def calcular_proxima_doacao(tipo_doacao):
-    agora = datetime.now()
-    if tipo_doacao == 'sangue_total':
-        #intervalo médio 75 dias (entre 60-90)
-        return agora + timedelta(days=75)
-    elif tipo_doacao in ['plaquetas', 'plasma']:
-        #intervalo 48 horas
-        return agora + timedelta(days=2)
-    elif tipo_doacao == 'aferese':
-        #intervalo 1 semana
-        return agora + timedelta(days=7)
-    else:
-        #padrão 60 dias
-        return agora + timedelta(days=60)
-
 # registrar doação
 @historico_bp.route('/doacoes/registrar', methods=['POST'])
 @requer_colaborador
+@idempotente
 def registrar_doacao(current_user):
     try:
         data = request.json or {}
@@ -125,12 +112,32 @@ def registrar_doacao(current_user):
             "message": "Erro ao registrar doação"
         }), 500
 
+# elegibilidade do doador para cada tipo de doação (próxima data permitida)
+@historico_bp.route('/elegibilidade', methods=['GET'])
+@requer_doador
+def consultar_elegibilidade(current_user):
+    try:
+        return jsonify({
+            "success": True,
+            **elegibilidade(g.id_usuario)
+        }), 200
+    except Exception as e:
+        print(f"[ERRO] Consultar elegibilidade: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "message": "Erro ao consultar elegibilidade"
+        }), 500
+
 # historico e doação (doador)
 @historico_bp.route('/minhas-doacoes', methods=['GET'])
 @requer_doador
 def minhas_doacoes(current_user):
     try:
-        historico = HistoricoModel.listar_por_usuario(g.id_usuario)
+        # ?arquivo=true inclui doações antigas já arquivadas
+        incluir_arquivo = request.args.get('arquivo', 'false').lower() == 'true'
+        historico = HistoricoModel.listar_por_usuario(g.id_usuario, incluir_arquivo=incluir_arquivo)
         total_doacoes = len(historico)
         total_ml = sum(d.get('quantidade_ml', 0) for d in historico)
         proxima_doacao = None
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify, g
 from back.models import HorarioFuncionamentoModel, HemocentroModel
 from back.utils.auth_utils import requer_colaborador
 from datetime import time, datetime
+from back.utils.slots import FUSO_HORARIO
 
 horario_bp = Blueprint('horario_bp', __name__)
 # busca hemocentro (só retorna um que tenha no sistema)
@@ -289,7 +290,7 @@ def esta_aberto_agora():
                 "success": False,
                 "message": "Hemocentro não encontrado"
             }), 404
-        agora = datetime.now()
+        agora = datetime.now(FUSO_HORARIO)
         dia_atual = agora.weekday()
         dia_atual = (dia_atual + 1) % 7
         dia_nome_banco = numero_para_dia(dia_atual)
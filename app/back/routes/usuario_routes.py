@@ -2,7 +2,8 @@ from flask import Blueprint, request, jsonify, g
 from back.utils.auth_utils import (
     token_required, requer_doador, gerar_token, hash_senha, verificar_senha,
     only_numbers, validar_email, validar_senha_forte, validar_telefone,
-    validar_tipo_sanguineo, is_cpf, is_cnpj
+    validar_tipo_sanguineo, is_cpf, is_cnpj, senha_precisa_rehash,
+    SenhaSobrecargaError, resposta_sobrecarga
 )
 from back.utils.aprovacao_service import criar_solicitacao_aprovacao
 from back.models import UsuarioModel, HemocentroModel
@@ -123,6 +124,8 @@ def cadastrar_doador():
         }), 201
     except ValueError as ve:
         return jsonify({"success": False, "message": str(ve)}), 400
+    except SenhaSobrecargaError as e:
+        return resposta_sobrecarga(e)
     except Exception as e:
         print(f"[ERRO] Cadastrar doador: {str(e)}")
         import traceback
@@ -274,6 +277,8 @@ def cadastrar_colaborador():
         }), 201
     except ValueError as ve:
         return jsonify({"success": False, "message": str(ve)}), 400
+    except SenhaSobrecargaError as e:
+        return resposta_sobrecarga(e)
     except Exception as e:
         print(f"[ERRO] Cadastrar colaborador: {str(e)}")
         import traceback
@@ -337,6 +342,12 @@ def login():
                 "success": False,
                 "message": "Credenciais incorretas"
             }), 401
+        # senha gravada com outro custo de bcrypt: aproveita a senha em mãos para refazer o hash
+        if senha_precisa_rehash(usuario['senha']):
+            try:
+                UsuarioModel.atualizar(usuario['id_usuario'], {'senha': hash_senha(senha)})
+            except SenhaSobrecargaError:
+                pass
         # gerar token
         tipo_usuario = usuario.get('tipo_usuario', 'doador')
         token = gerar_token(
@@ -381,6 +392,8 @@ def login():
             "token": token,
             "usuario": usuario_response
         }), 200
+    except SenhaSobrecargaError as e:
+        return resposta_sobrecarga(e)
     except Exception as e:
         print(f"[ERRO] Login: {str(e)}")
         import traceback
@@ -580,6 +593,8 @@ def alterar_senha(current_user):
             "success": True,
             "message": "Senha alterada com sucesso"
         }), 200
+    except SenhaSobrecargaError as e:
+        return resposta_sobrecarga(e)
     except Exception as e:
         print(f"[ERRO] Alterar senha: {str(e)}")
         import traceback
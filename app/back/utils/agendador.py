@@ -0,0 +1,168 @@
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+
+# tarefas periódicas rodando numa thread do próprio processo da API.
+# com vários workers (gunicorn) cada processo tem seu agendador, mas cada execução pega
+# antes um lock nomeado do MySQL (GET_LOCK): só um processo roda a tarefa por vez e os
+# outros apenas registram a rodada como ignorada.
+# - AGENDADOR_ATIVO: liga/desliga as tarefas neste processo
+# - AGENDADOR_FALTAS_INTERVALO: segundos entre varreduras de não comparecimento
+# - AGENDADOR_FALTAS_TOLERANCIA_HORAS: quanto tempo depois do horário o agendamento ainda pode ser baixado manualmente
+# - AGENDADOR_FALTAS_LOTE / AGENDADOR_FALTAS_MAX_LOTES: tamanho do lote e lotes por varredura
+# - AGENDADOR_PROGRESSO_INTERVALO: segundos entre consolidações do progresso das campanhas
+# - AGENDADOR_CAMPANHAS_INTERVALO: segundos entre rodadas de encerramento de campanhas vencidas
+#   (vencem uma vez por dia; fora da virada a rodada é um UPDATE que não acha nada)
+AGENDADOR_ATIVO = os.getenv('AGENDADOR_ATIVO', 'True').lower() in ('true', '1', 'yes')
+AGENDADOR_FALTAS_INTERVALO = int(os.getenv('AGENDADOR_FALTAS_INTERVALO', '600'))
+AGENDADOR_FALTAS_TOLERANCIA_HORAS = int(os.getenv('AGENDADOR_FALTAS_TOLERANCIA_HORAS', '24'))
+AGENDADOR_FALTAS_LOTE = int(os.getenv('AGENDADOR_FALTAS_LOTE', '500'))
+AGENDADOR_FALTAS_MAX_LOTES = int(os.getenv('AGENDADOR_FALTAS_MAX_LOTES', '20'))
+AGENDADOR_PROGRESSO_INTERVALO = int(os.getenv('AGENDADOR_PROGRESSO_INTERVALO', '30'))
+AGENDADOR_CAMPANHAS_INTERVALO = int(os.getenv('AGENDADOR_CAMPANHAS_INTERVALO', '3600'))
+
+class Tarefa:
+    def __init__(self, nome, intervalo, funcao):
+        self.nome = nome
+        self.intervalo = intervalo
+        self.funcao = funcao
+        self.proxima = time.monotonic() + intervalo
+        self.metricas = {
+            'execucoes': 0,
+            'ignoradas': 0,
+            'erros': 0,
+            'processados_total': 0,
+            'ultimo_processados': None,
+            'ultima_duracao_ms': None,
+            'ultima_execucao': None
+        }
+
+_tarefas = []
+_lock = threading.Lock()
+_thread = None
+_parar = threading.Event()
+
+def registrar(nome, intervalo, funcao):
+    with _lock:
+        _tarefas.append(Tarefa(nome, intervalo, funcao))
+
+# roda a tarefa só se este processo conseguir o lock nomeado (sem esperar)
+def executar(tarefa):
+    from config.config import get_db_connection
+    with get_db_connection() as db:
+        db.execute("SELECT GET_LOCK(%s, 0) AS obtido", (f"hemocamp:{tarefa.nome}",))
+        row = db.fetchone()
+        if not row or not row['obtido']:
+            with _lock:
+                tarefa.metricas['ignoradas'] += 1
+            return None
+        inicio = time.monotonic()
+        try:
+            processados = tarefa.funcao()
+        except Exception as e:
+            with _lock:
+                tarefa.metricas['erros'] += 1
+            print(f"[ERRO] Tarefa agendada {tarefa.nome}: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return None
+        finally:
+            db.execute("SELECT RELEASE_LOCK(%s) AS liberado", (f"hemocamp:{tarefa.nome}",))
+            db.fetchone()
+        duracao_ms = round((time.monotonic() - inicio) * 1000, 1)
+        with _lock:
+            tarefa.metricas['execucoes'] += 1
+            tarefa.metricas['processados_total'] += processados or 0
+            tarefa.metricas['ultimo_processados'] = processados
+            tarefa.metricas['ultima_duracao_ms'] = duracao_ms
+            tarefa.metricas['ultima_execucao'] = datetime.now().isoformat(timespec='seconds')
+        if processados:
+            print(f"[INFO] Tarefa agendada {tarefa.nome}: {processados} registro(s) em {duracao_ms} ms")
+        return processados
+
+def _loop():
+    while not _parar.is_set():
+        agora = time.monotonic()
+        with _lock:
+            vencidas = [t for t in _tarefas if t.proxima <= agora]
+        for tarefa in vencidas:
+            try:
+                executar(tarefa)
+            except Exception as e:
+                print(f"[ERRO] Agendador ({tarefa.nome}): {str(e)}")
+            tarefa.proxima = time.monotonic() + tarefa.intervalo
+        with _lock:
+            espera = min((t.proxima for t in _tarefas), default=agora + 60) - time.monotonic()
+        _parar.wait(max(1.0, espera))
+
+def iniciar():
+    global _thread
+    with _lock:
+        if _thread is not None or not _tarefas:
+            return
+        _thread = threading.Thread(target=_loop, name='agendador', daemon=True)
+        _thread.start()
+
+def parar():
+    _parar.set()
+
+def stats():
+    with _lock:
+        return {
+            'ativo': _thread is not None and _thread.is_alive(),
+            'tarefas': {t.nome: dict(t.metricas, intervalo=t.intervalo) for t in _tarefas}
+        }
+
+# agendamentos pendentes/confirmados que passaram do horário (com tolerância) viram não compareceu
+def varrer_faltas():
+    from back.models import AgendamentoModel
+    # data_hora é gravada em UTC
+    antes_de = datetime.utcnow() - timedelta(hours=AGENDADOR_FALTAS_TOLERANCIA_HORAS)
+    total = 0
+    for _ in range(AGENDADOR_FALTAS_MAX_LOTES):
+        processados = AgendamentoModel.marcar_faltas_vencidas(antes_de, AGENDADOR_FALTAS_LOTE)
+        total += processados
+        if processados < AGENDADOR_FALTAS_LOTE:
+            break
+    return total
+
+# respostas de Idempotency-Key vencidas
+def limpar_idempotencia():
+    from back.models import IdempotenciaModel
+    total = 0
+    while True:
+        apagadas = IdempotenciaModel.limpar_expiradas(5000)
+        total += apagadas
+        if apagadas < 5000:
+            return total
+
+# litros das fatias de CampanhaProgresso para a Campanha
+def consolidar_progresso_campanhas():
+    from back.models import CampanhaModel
+    return CampanhaModel.consolidar_progresso()
+
+# campanhas vencidas saem do conjunto ativo; o catálogo deste processo é recarregado
+# já com destaque e "próximas de vencer" recalculados (os outros recarregam na virada do dia)
+def encerrar_campanhas_vencidas():
+    from back.models import CampanhaModel
+    from back.utils.campanha_service import recarregar_catalogo
+    total = 0
+    while True:
+        encerradas = CampanhaModel.encerrar_vencidas(1000)
+        total += encerradas
+        if encerradas < 1000:
+            break
+    recarregar_catalogo()
+    return total
+
+# a thread sobe na primeira requisição: comandos "flask ..." e o processo
+# observador do reloader não iniciam o agendador
+def init_app(app):
+    if not AGENDADOR_ATIVO:
+        return
+    registrar('varrer-faltas', AGENDADOR_FALTAS_INTERVALO, varrer_faltas)
+    registrar('limpar-idempotencia', 3600, limpar_idempotencia)
+    registrar('consolidar-progresso-campanhas', AGENDADOR_PROGRESSO_INTERVALO, consolidar_progresso_campanhas)
+    registrar('encerrar-campanhas-vencidas', AGENDADOR_CAMPANHAS_INTERVALO, encerrar_campanhas_vencidas)
+    app.before_request(iniciar)
@@ -1,11 +1,13 @@
 import re
 import jwt
 import os
-import bcrypt
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from flask import request, jsonify, g
 from back.utils.validators import only_numbers, is_cnpj, is_cpf
+from back.utils.cache_utils import TTLCache
+from back.utils import bcrypt_pool
+from back.utils.bcrypt_pool import SenhaSobrecargaError
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,6 +16,13 @@ SECRET_KEY = os.getenv('JWT_SECRET_KEY')
 ALGORITHM = 'HS256'
 TOKEN_EXPIRATION_HOURS = 24
 
+# cache do usuário autenticado (e do hemocentro do colaborador), por id_usuario.
+# invalidado pelos models sempre que Usuario ou Hemocentros mudam.
+PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', '60'))
+_principais = TTLCache(ttl=PRINCIPAL_CACHE_TTL, max_entries=int(os.getenv('PRINCIPAL_CACHE_SIZE', '5000')))
+# só o que token_required e as rotas leem de g.current_user (senha_hash não fica em memória)
+CAMPOS_PRINCIPAL = ('id_usuario', 'tipo_usuario', 'nome', 'email', 'ativo', 'cpf', 'cnpj', 'data_nascimento')
+
 # validação cpf e cnpj
 def mascara_cnpj(cnpj: str) -> str:
     if not cnpj:
@@ -54,12 +63,25 @@ def validar_cnpj_hemocentro(cnpj: str) -> tuple[bool, str]:
         return False, "CNPJ inválido"
     return True, ""
 
-# hash de senha (bycript)
+# hash de senha (bycript), executado no pool de processos; pode lançar SenhaSobrecargaError
 def hash_senha(senha: str) -> str:
-    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt_pool.gerar_hash(senha)
 
 def verificar_senha(senha: str, senha_hash: str) -> bool:
-    return bcrypt.checkpw(senha.encode('utf-8'), senha_hash.encode('utf-8'))
+    return bcrypt_pool.conferir_hash(senha, senha_hash)
+
+# hash gerado com custo diferente do configurado (BCRYPT_ROUNDS)
+def senha_precisa_rehash(senha_hash: str) -> bool:
+    return bcrypt_pool.precisa_rehash(senha_hash)
+
+def resposta_sobrecarga(erro):
+    response = jsonify({
+        "success": False,
+        "message": str(erro)
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(erro.retry_after)
+    return response
 
 # jwt
 def gerar_token(id_usuario: int, tipo_usuario: str, nome: str, email: str) -> str:
@@ -84,9 +106,40 @@ def verificar_token(token: str):
     
 #############################################################################################
 
+# cache de principal
+def _carregar_principal(id_usuario):
+    from back.models import UsuarioModel, HemocentroModel
+    principal = _principais.get(id_usuario)
+    if principal is not None:
+        return principal
+    geracao = _principais.geracao()
+    usuario = UsuarioModel.buscar_por_id(id_usuario)
+    if not usuario:
+        return None
+    hemocentro = None
+    if usuario['tipo_usuario'] == 'colaborador' and usuario.get('cnpj'):
+        hemocentro = HemocentroModel.buscar_por_cnpj(usuario['cnpj'])
+    usuario = {campo: usuario[campo] for campo in CAMPOS_PRINCIPAL if campo in usuario}
+    principal = {'usuario': usuario, 'hemocentro': hemocentro}
+    _principais.set(id_usuario, principal, geracao=geracao)
+    return principal
+
+def invalidar_principal(id_usuario=None, cnpj=None, id_hemocentro=None):
+    if id_usuario is not None:
+        _principais.pop(id_usuario)
+    if cnpj is not None:
+        cnpj = only_numbers(cnpj)
+        _principais.remover_se(lambda _, p: only_numbers(p['usuario'].get('cnpj') or '') == cnpj)
+    if id_hemocentro is not None:
+        _principais.remover_se(
+            lambda _, p: p['hemocentro'] is not None and p['hemocentro']['id_hemocentro'] == id_hemocentro
+        )
+
+def limpar_cache_principais():
+    _principais.clear()
+
 # decorators
 def token_required(f):
-    from back.models import UsuarioModel, HemocentroModel
     @wraps(f)
     def decorated(*args, **kwargs):
         token = None
@@ -111,7 +164,8 @@ def token_required(f):
                     "success": False,
                     "message": "Token inválido ou expirado."
                 }), 401
-            usuario = UsuarioModel.buscar_por_id(current_user['id_usuario'])
+            principal = _carregar_principal(current_user['id_usuario'])
+            usuario = dict(principal['usuario']) if principal else None
             if not usuario or not usuario.get('ativo', True):
                 return jsonify({
                     "success": False,
@@ -125,8 +179,9 @@ def token_required(f):
             if usuario['tipo_usuario'] == 'colaborador':
                 cnpj = usuario.get('cnpj')
                 if cnpj:
-                    hemocentro = HemocentroModel.buscar_por_cnpj(cnpj)
+                    hemocentro = principal['hemocentro']
                     if hemocentro:
+                        hemocentro = dict(hemocentro)
                         g.hemocentro = hemocentro
                         g.id_hemocentro = hemocentro['id_hemocentro']
                         g.cnpj_hemocentro = cnpj
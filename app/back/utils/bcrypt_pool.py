@@ -0,0 +1,119 @@
+import os
+import atexit
+import threading
+import bcrypt
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# bcrypt roda em processos separados (fora do GIL) para não travar as threads do servidor.
+# a fila é limitada: quando enche, a requisição é recusada na hora em vez de esperar.
+# - BCRYPT_ROUNDS: custo usado nos novos hashes (senhas com custo diferente são refeitas no login)
+# - BCRYPT_WORKERS: processos dedicados (0 = roda na própria thread, útil em desenvolvimento)
+# - BCRYPT_QUEUE_SIZE: operações aceitas ao mesmo tempo (rodando + esperando)
+# - BCRYPT_QUEUE_TIMEOUT: quanto esperar por uma vaga antes de recusar
+# - BCRYPT_TIMEOUT: tempo máximo esperando o resultado
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', str(os.cpu_count() or 2)))
+BCRYPT_QUEUE_SIZE = int(os.getenv('BCRYPT_QUEUE_SIZE', str(max(1, BCRYPT_WORKERS) * 4)))
+BCRYPT_QUEUE_TIMEOUT = float(os.getenv('BCRYPT_QUEUE_TIMEOUT', '0'))
+BCRYPT_TIMEOUT = float(os.getenv('BCRYPT_TIMEOUT', '10'))
+BCRYPT_RETRY_AFTER = 1
+
+class SenhaSobrecargaError(Exception):
+    def __init__(self, message="Servidor ocupado, tente novamente em instantes", retry_after=BCRYPT_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# executadas nos processos do pool (precisam ser funções de módulo)
+def _gerar_hash(senha, rounds):
+    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+def _conferir_hash(senha, senha_hash):
+    return bcrypt.checkpw(senha.encode('utf-8'), senha_hash.encode('utf-8'))
+
+_vagas = threading.BoundedSemaphore(BCRYPT_QUEUE_SIZE)
+# vagas em uso, só para o stats (o semáforo não expõe o contador)
+_ocupadas = 0
+_ocupadas_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+# criado sob demanda para não herdar processos no fork do reloader/gunicorn
+def _obter_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=BCRYPT_WORKERS)
+    return _executor
+
+def _encerrar():
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+
+atexit.register(_encerrar)
+
+def _reservar_vaga():
+    global _ocupadas
+    if BCRYPT_QUEUE_TIMEOUT > 0:
+        obtida = _vagas.acquire(timeout=BCRYPT_QUEUE_TIMEOUT)
+    else:
+        obtida = _vagas.acquire(blocking=False)
+    if obtida:
+        with _ocupadas_lock:
+            _ocupadas += 1
+    return obtida
+
+def _liberar_vaga():
+    global _ocupadas
+    with _ocupadas_lock:
+        _ocupadas -= 1
+    _vagas.release()
+
+def _executar(funcao, *args):
+    if not _reservar_vaga():
+        raise SenhaSobrecargaError()
+    if BCRYPT_WORKERS <= 0:
+        try:
+            return funcao(*args)
+        finally:
+            _liberar_vaga()
+    try:
+        future = _obter_executor().submit(funcao, *args)
+    except Exception:
+        _liberar_vaga()
+        raise
+    # a vaga só é devolvida quando o processo termina, mesmo se a requisição desistir antes
+    future.add_done_callback(lambda _: _liberar_vaga())
+    try:
+        return future.result(timeout=BCRYPT_TIMEOUT)
+    except FuturesTimeoutError:
+        raise SenhaSobrecargaError()
+
+def gerar_hash(senha, rounds=None):
+    return _executar(_gerar_hash, senha, rounds or BCRYPT_ROUNDS)
+
+def conferir_hash(senha, senha_hash):
+    return _executar(_conferir_hash, senha, senha_hash)
+
+# "$2b$12$..." -> 12
+def custo_do_hash(senha_hash):
+    try:
+        return int(senha_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def precisa_rehash(senha_hash):
+    return custo_do_hash(senha_hash) != BCRYPT_ROUNDS
+
+def stats():
+    with _ocupadas_lock:
+        ocupadas = _ocupadas
+    return {
+        'workers': BCRYPT_WORKERS,
+        'rounds': BCRYPT_ROUNDS,
+        'fila_max': BCRYPT_QUEUE_SIZE,
+        'vagas_livres': BCRYPT_QUEUE_SIZE - ocupadas
+    }
@@ -0,0 +1,63 @@
+import time
+import threading
+from collections import OrderedDict
+
+# cache em memória com expiração por tempo e limite de entradas (LRU).
+# a "geração" evita que uma leitura feita antes de uma invalidação
+# grave no cache um valor que já ficou velho.
+class TTLCache:
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self._geracao = 0
+
+    def geracao(self):
+        with self._lock:
+            return self._geracao
+
+    def get(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            valor, expira_em = entrada
+            if expira_em <= time.monotonic():
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor, geracao=None, ttl=None):
+        with self._lock:
+            if geracao is not None and geracao != self._geracao:
+                return False
+            self._entradas[chave] = (valor, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entries:
+                self._entradas.popitem(last=False)
+            return True
+
+    def pop(self, chave):
+        with self._lock:
+            self._geracao += 1
+            entrada = self._entradas.pop(chave, None)
+            return entrada[0] if entrada else None
+
+    def remover_se(self, condicao):
+        with self._lock:
+            self._geracao += 1
+            chaves = [chave for chave, (valor, _) in self._entradas.items() if condicao(chave, valor)]
+            for chave in chaves:
+                del self._entradas[chave]
+            return len(chaves)
+
+    def clear(self):
+        with self._lock:
+            self._geracao += 1
+            self._entradas.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entradas)
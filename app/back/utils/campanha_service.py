@@ -0,0 +1,122 @@
+import os
+import re
+from datetime import date
+from back.utils.cache_utils import TTLCache
+
+# catálogo em memória das campanhas ativas (landing page): carregado numa consulta só,
+# com índices por tipo sanguíneo e por hemocentro, então os filtros viram consultas a dicionário.
+# recarregado depois do commit de qualquer escrita em campanhas e na virada do dia
+# (dias_restantes e campanhas encerradas mudam à meia-noite).
+# a lista de destaque e a de "próximas de vencer" saem prontas da carga; a tarefa agendada
+# "encerrar-campanhas-vencidas" desativa as vencidas no banco e já recarrega o catálogo.
+CAMPANHAS_CACHE_TTL = int(os.getenv('CAMPANHAS_CACHE_TTL', '300'))
+# maior janela aceita em campanhas_proximas_vencer
+CAMPANHAS_VENCENDO_MAX_DIAS = 30
+_cache = TTLCache(ttl=CAMPANHAS_CACHE_TTL, max_entries=1)
+_CHAVE = 'ativas'
+
+TIPOS_SANGUINEOS = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+# mesma regra do preenchimento da migração 006: tipo sem letra antes e sinal colado (B+ não casa em AB+)
+_PADRAO_TIPO = re.compile(r'(?<![A-Z])(AB|A|B|O)([+-])')
+
+# compatibilidade ABO/Rh de hemácias: para quem cada tipo de doador pode doar
+RECEPTORES_COMPATIVEIS = {
+    'O-': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'],
+    'O+': ['O+', 'A+', 'B+', 'AB+'],
+    'A-': ['A-', 'A+', 'AB-', 'AB+'],
+    'A+': ['A+', 'AB+'],
+    'B-': ['B-', 'B+', 'AB-', 'AB+'],
+    'B+': ['B+', 'AB+'],
+    'AB-': ['AB-', 'AB+'],
+    'AB+': ['AB+']
+}
+
+def invalidar_catalogo():
+    _cache.clear()
+
+# "AB+" é só AB+ (o LIKE '%B+%' antigo também casava com AB+); "Todos" vale para qualquer tipo
+def tipos_da_campanha(valor):
+    if not valor:
+        return set()
+    valor = valor.upper()
+    if 'TODOS' in valor:
+        return set(TIPOS_SANGUINEOS)
+    return {grupo + fator for grupo, fator in _PADRAO_TIPO.findall(valor)}
+
+def _carregar():
+    from back.models import CampanhaModel
+    campanhas = CampanhaModel.listar_ativas()
+    por_tipo = {tipo: [] for tipo in TIPOS_SANGUINEOS}
+    por_hemocentro = {}
+    destaque = []
+    vencendo = []
+    for posicao, campanha in enumerate(campanhas):
+        for tipo in campanha.get('tipos_sanguineos', []):
+            por_tipo[tipo].append(posicao)
+        por_hemocentro.setdefault(campanha['id_hemocentro'], []).append(posicao)
+        if campanha.get('destaque'):
+            destaque.append(posicao)
+        if campanha['dias_restantes'] <= CAMPANHAS_VENCENDO_MAX_DIAS:
+            vencendo.append(posicao)
+    vencendo.sort(key=lambda p: (campanhas[p]['dias_restantes'], p))
+    return {
+        'dia': date.today(),
+        'campanhas': campanhas,
+        'por_tipo': por_tipo,
+        'por_hemocentro': por_hemocentro,
+        'destaque': destaque,
+        'vencendo': vencendo
+    }
+
+def recarregar_catalogo():
+    _cache.clear()
+    return len(_catalogo()['campanhas'])
+
+def _catalogo():
+    catalogo = _cache.get(_CHAVE)
+    if catalogo is None or catalogo['dia'] != date.today():
+        geracao = _cache.geracao()
+        catalogo = _carregar()
+        _cache.set(_CHAVE, catalogo, geracao=geracao)
+    return catalogo
+
+# mesma ordem de CampanhaModel.listar_ativas (destaque primeiro, mais recentes antes).
+# compativel_com: tipo do doador; traz as campanhas de todos os tipos que ele pode atender
+def listar_campanhas_ativas(id_hemocentro=None, tipo_sanguineo=None, apenas_destaque=False, compativel_com=None):
+    catalogo = _catalogo()
+    filtros = []
+    if id_hemocentro:
+        filtros.append(catalogo['por_hemocentro'].get(id_hemocentro, []))
+    if tipo_sanguineo:
+        filtros.append(catalogo['por_tipo'].get(tipo_sanguineo, []))
+    if compativel_com:
+        posicoes = set()
+        for tipo in RECEPTORES_COMPATIVEIS.get(compativel_com, []):
+            posicoes.update(catalogo['por_tipo'][tipo])
+        filtros.append(sorted(posicoes))
+    if apenas_destaque:
+        filtros.append(catalogo['destaque'])
+    if not filtros:
+        return list(catalogo['campanhas'])
+    filtros.sort(key=len)
+    posicoes = filtros[0]
+    for outro in filtros[1:]:
+        permitidas = set(outro)
+        posicoes = [p for p in posicoes if p in permitidas]
+    return [catalogo['campanhas'][p] for p in posicoes]
+
+# destaques mais recentes primeiro (destaques vêm antes no catálogo, por data_inicio DESC)
+def campanhas_em_destaque(limite=5):
+    catalogo = _catalogo()
+    return [catalogo['campanhas'][p] for p in catalogo['destaque'][:limite]]
+
+# terminam em até `dias` dias (inclusive hoje), as mais próximas do fim primeiro
+def campanhas_proximas_vencer(dias=7, limite=10):
+    catalogo = _catalogo()
+    resultado = []
+    for posicao in catalogo['vencendo']:
+        campanha = catalogo['campanhas'][posicao]
+        if campanha['dias_restantes'] > dias or len(resultado) >= limite:
+            break
+        resultado.append(campanha)
+    return resultado
@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import threading
+from back.utils.http_cache import calcular_etag
+
+# progresso das campanhas ao vivo (Server-Sent Events) com pub/sub dentro do processo.
+# - incrementar_litros publica depois do commit; um único emissor recalcula o progresso
+#   uma vez por campanha e entrega o mesmo payload para todos os assinantes dela
+# - coalescência: no máximo SSE_ATUALIZACOES_POR_SEGUNDO envios por campanha; publicações
+#   no meio do intervalo viram um envio só no fim dele
+# - cada conexão SSE ocupa uma thread do servidor, então o total de assinantes é limitado
+#   (SSE_MAX_ASSINANTES); acima disso o cliente recebe 503 e usa GET .../progresso com ETag
+SSE_MAX_ASSINANTES = int(os.getenv('SSE_MAX_ASSINANTES', '200'))
+SSE_ATUALIZACOES_POR_SEGUNDO = float(os.getenv('SSE_ATUALIZACOES_POR_SEGUNDO', '2'))
+SSE_HEARTBEAT = int(os.getenv('SSE_HEARTBEAT', '15'))
+SSE_RETRY_MS = 5000
+
+class LimiteAssinantesError(Exception):
+    pass
+
+# guarda só o payload mais recente: assinante lento pula versões intermediárias
+class Assinante:
+    def __init__(self, campanha_id):
+        self.campanha_id = campanha_id
+        self._evento = threading.Event()
+        self._payload = None
+
+    def entregar(self, payload):
+        self._payload = payload
+        self._evento.set()
+
+    def aguardar(self, timeout):
+        self._evento.wait(timeout)
+        self._evento.clear()
+        payload, self._payload = self._payload, None
+        return payload
+
+class _Canal:
+    def __init__(self):
+        self.assinantes = set()
+        self.pendente = False
+        self.ultimo_envio = 0.0
+
+_canais = {}
+_lock = threading.Lock()
+_acordar = threading.Event()
+_emissor = None
+_total_assinantes = 0
+
+def progresso_payload(campanha_id):
+    from back.models import CampanhaModel
+    progresso = CampanhaModel.calcular_progresso(campanha_id)
+    if progresso is None:
+        return None
+    payload = {'id_campanha': campanha_id, **progresso}
+    return {'dados': payload, 'etag': calcular_etag(payload)}
+
+def assinar(campanha_id):
+    global _total_assinantes
+    with _lock:
+        if _total_assinantes >= SSE_MAX_ASSINANTES:
+            raise LimiteAssinantesError()
+        assinante = Assinante(campanha_id)
+        _canais.setdefault(campanha_id, _Canal()).assinantes.add(assinante)
+        _total_assinantes += 1
+        _iniciar_emissor()
+    return assinante
+
+def cancelar(assinante):
+    global _total_assinantes
+    with _lock:
+        canal = _canais.get(assinante.campanha_id)
+        if canal is None or assinante not in canal.assinantes:
+            return
+        canal.assinantes.discard(assinante)
+        _total_assinantes -= 1
+        if not canal.assinantes:
+            del _canais[assinante.campanha_id]
+
+# chamado depois do commit de alterações no progresso; sem assinantes não faz nada
+def publicar(campanha_id):
+    with _lock:
+        canal = _canais.get(campanha_id)
+        if canal is None:
+            return
+        canal.pendente = True
+    _acordar.set()
+
+def _iniciar_emissor():
+    global _emissor
+    if _emissor is None or not _emissor.is_alive():
+        _emissor = threading.Thread(target=_emitir, name='campanha-stream', daemon=True)
+        _emissor.start()
+
+def _emitir():
+    intervalo = 1.0 / SSE_ATUALIZACOES_POR_SEGUNDO
+    while True:
+        agora = time.monotonic()
+        prontos, espera = [], None
+        with _lock:
+            for campanha_id, canal in _canais.items():
+                if not canal.pendente:
+                    continue
+                falta = canal.ultimo_envio + intervalo - agora
+                if falta <= 0:
+                    canal.pendente = False
+                    canal.ultimo_envio = agora
+                    prontos.append(campanha_id)
+                else:
+                    espera = falta if espera is None else min(espera, falta)
+        for campanha_id in prontos:
+            try:
+                payload = progresso_payload(campanha_id)
+            except Exception as e:
+                print(f"[ERRO] Progresso da campanha {campanha_id} (stream): {str(e)}")
+                continue
+            if payload is None:
+                continue
+            with _lock:
+                assinantes = list(_canais[campanha_id].assinantes) if campanha_id in _canais else []
+            for assinante in assinantes:
+                assinante.entregar(payload)
+        _acordar.wait(espera if espera is not None else SSE_HEARTBEAT)
+        _acordar.clear()
+
+def formatar_evento(payload):
+    return f"event: progresso\nid: {payload['etag']}\ndata: {json.dumps(payload['dados'], default=str)}\n\n"
+
+# corpo da resposta SSE: estado atual, depois um evento por atualização e comentários de keep-alive
+def gerar_eventos(assinante, inicial):
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        yield formatar_evento(inicial)
+        while True:
+            payload = assinante.aguardar(SSE_HEARTBEAT)
+            yield formatar_evento(payload) if payload else ": ping\n\n"
+    finally:
+        cancelar(assinante)
+
+def stats():
+    with _lock:
+        return {
+            'assinantes': _total_assinantes,
+            'max_assinantes': SSE_MAX_ASSINANTES,
+            'campanhas': len(_canais)
+        }
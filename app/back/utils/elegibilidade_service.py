@@ -0,0 +1,85 @@
+import os
+from datetime import datetime, timedelta
+from back.utils.cache_utils import TTLCache
+from back.utils.slots import hoje_local
+
+# regras de intervalo entre doações num lugar só (agendamento, registro de doação e perfil).
+# a última doação de cada doador (HistoricoDoacoes, inclusive as registradas sem agendamento)
+# fica em cache; HistoricoModel.criar/deletar invalidam depois do commit, então a
+# elegibilidade não precisa ser reconsultada a cada chamada.
+INTERVALOS_DIAS = {
+    'sangue_total': 75,
+    'plaquetas': 2,
+    'plasma': 2,
+    'aferese': 7
+}
+INTERVALO_PADRAO_DIAS = 60
+NOMES_TIPO = {
+    'sangue_total': 'sangue total',
+    'plaquetas': 'plaquetas',
+    'plasma': 'plasma',
+    'aferese': 'aférese'
+}
+
+ELEGIBILIDADE_CACHE_TTL = int(os.getenv('ELEGIBILIDADE_CACHE_TTL', '3600'))
+_cache = TTLCache(ttl=ELEGIBILIDADE_CACHE_TTL, max_entries=int(os.getenv('ELEGIBILIDADE_CACHE_SIZE', '10000')))
+
+def intervalo_minimo(tipo_doacao):
+    return INTERVALOS_DIAS.get(tipo_doacao, INTERVALO_PADRAO_DIAS)
+
+# data a partir da qual o doador pode doar de novo depois de uma doação do tipo informado
+def calcular_proxima_doacao(tipo_doacao, data_base=None):
+    return (data_base or datetime.now()) + timedelta(days=intervalo_minimo(tipo_doacao))
+
+# próxima doação permitida de um tipo, dada a última doação realizada (qualquer tipo)
+def proxima_doacao_permitida(ultima_doacao, tipo_doacao):
+    if ultima_doacao is None:
+        return None
+    return ultima_doacao + timedelta(days=intervalo_minimo(tipo_doacao))
+
+def invalidar_elegibilidade(id_usuario):
+    _cache.pop(id_usuario)
+
+def _carregar_ultima_doacao(id_usuario):
+    from back.models import HistoricoModel
+    return HistoricoModel.buscar_ultima_doacao(id_usuario)
+
+def _ultima_doacao(id_usuario):
+    entrada = _cache.get(id_usuario)
+    if entrada is None:
+        geracao = _cache.geracao()
+        ultima = _carregar_ultima_doacao(id_usuario)
+        entrada = {
+            'data': ultima['data_doacao'] if ultima else None,
+            'tipo': ultima.get('tipo_doacao') if ultima else None,
+            'proxima': ultima.get('proxima_doacao_permitida') if ultima else None
+        }
+        _cache.set(id_usuario, entrada, geracao=geracao)
+    return entrada
+
+# primeiro dia em que o doador pode doar o tipo pedido (None = sem restrição).
+# é a regra usada no agendamento e em "tipos" do GET /elegibilidade
+def proxima_doacao_do_tipo(id_usuario, tipo_doacao):
+    return proxima_doacao_permitida(_ultima_doacao(id_usuario)['data'], tipo_doacao)
+
+# elegibilidade por tipo de doação (datas, como em HistoricoDoacoes). o "pode_doar" geral
+# vale para o tipo que o doador doou por último, não para o tipo de intervalo mais curto
+def elegibilidade(id_usuario, hoje=None):
+    hoje = hoje or hoje_local()
+    ultima = _ultima_doacao(id_usuario)
+    tipos = {}
+    for tipo in INTERVALOS_DIAS:
+        proxima = proxima_doacao_do_tipo(id_usuario, tipo)
+        tipos[tipo] = {
+            'intervalo_dias': intervalo_minimo(tipo),
+            'proxima_doacao_permitida': proxima.isoformat() if proxima else None,
+            'pode_doar': proxima is None or hoje >= proxima
+        }
+    proxima = ultima['proxima'] or proxima_doacao_permitida(ultima['data'], ultima['tipo'])
+    return {
+        'ultima_doacao': ultima['data'].isoformat() if ultima['data'] else None,
+        'tipo_ultima_doacao': ultima['tipo'],
+        'proxima_doacao_permitida': proxima.isoformat() if proxima else None,
+        'tipos': tipos,
+        'pode_doar': proxima is None or hoje >= proxima
+    }
@@ -0,0 +1,64 @@
+import os
+from back.utils.cache_utils import TTLCache
+from back.utils.http_cache import calcular_etag
+
+# snapshot público do estoque por hemocentro (níveis, totais, críticos e ETag já calculados).
+# reconstruído depois do commit de qualquer escrita no Estoque do hemocentro;
+# o TTL só cobre escritas feitas fora deste processo.
+ESTOQUE_CACHE_TTL = int(os.getenv('ESTOQUE_CACHE_TTL', '60'))
+_snapshots = TTLCache(ttl=ESTOQUE_CACHE_TTL, max_entries=int(os.getenv('ESTOQUE_CACHE_SIZE', '500')))
+
+def resumir_estoque(estoque):
+    return {
+        "total_unidades": sum(item.get('quantidade', 0) for item in estoque),
+        "tipos_disponiveis": len(estoque),
+        "tipos_criticos": sum(1 for item in estoque if item.get('nivel') == 'critico')
+    }
+
+def _montar_snapshot(id_hemocentro):
+    from back.models import EstoqueModel, HemocentroModel
+    hemocentro = HemocentroModel.buscar_por_id(id_hemocentro)
+    if not hemocentro:
+        return None
+    estoque = EstoqueModel.listar_estoque_hemocentro(id_hemocentro)
+    payload = {
+        "success": True,
+        "hemocentro": {
+            "id_hemocentro": hemocentro['id_hemocentro'],
+            "nome": hemocentro['nome'],
+            "endereco": hemocentro.get('endereco'),
+            "cidade": hemocentro.get('cidade'),
+            "telefone": hemocentro.get('telefone')
+        },
+        "estoque": estoque,
+        "resumo": resumir_estoque(estoque)
+    }
+    return {
+        'ativo': bool(hemocentro.get('ativo')),
+        'payload': payload,
+        'etag': calcular_etag(payload)
+    }
+
+def obter_snapshot(id_hemocentro):
+    snapshot = _snapshots.get(id_hemocentro)
+    if snapshot is None:
+        geracao = _snapshots.geracao()
+        snapshot = _montar_snapshot(id_hemocentro)
+        if snapshot is None:
+            return None
+        _snapshots.set(id_hemocentro, snapshot, geracao=geracao)
+    return snapshot
+
+# chamado pelos models depois do commit: descarta e já deixa o snapshot novo pronto
+def atualizar_snapshot(id_hemocentro):
+    _snapshots.pop(id_hemocentro)
+    try:
+        obter_snapshot(id_hemocentro)
+    except Exception as e:
+        print(f"[AVISO] Reconstruir snapshot de estoque {id_hemocentro}: {str(e)}")
+
+def invalidar_snapshot(id_hemocentro=None):
+    if id_hemocentro is None:
+        _snapshots.clear()
+    else:
+        _snapshots.pop(id_hemocentro)
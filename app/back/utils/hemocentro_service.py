@@ -0,0 +1,137 @@
+import os
+from datetime import datetime, time, timedelta
+from back.utils.cache_utils import TTLCache
+from back.utils.slots import DURACAO_SLOT_PADRAO, CAPACIDADE_SLOT_PADRAO, FUSO_HORARIO
+
+# lista pública de hemocentros (mapa): hemocentros ativos + horários carregados em lote,
+# já formatados, com a grade semanal pronta para responder "aberto agora" sem recalcular.
+# invalidada pelos models quando hemocentros ou horários mudam.
+HEMOCENTROS_CACHE_TTL = int(os.getenv('HEMOCENTROS_CACHE_TTL', '300'))
+_cache = TTLCache(ttl=HEMOCENTROS_CACHE_TTL, max_entries=1)
+_CHAVE = 'ativos'
+
+DIAS_NUMERO_PARA_NOME = [
+    'domingo', 'segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado'
+]
+DIAS_SEMANA_NOMES = [
+    'Domingo', 'Segunda-feira', 'Terça-feira', 'Quarta-feira',
+    'Quinta-feira', 'Sexta-feira', 'Sábado'
+]
+
+def invalidar_hemocentros():
+    _cache.clear()
+
+# muda a cada invalidação (caches derivados dos horários usam na chave)
+def versao_hemocentros():
+    return _cache.geracao()
+
+# timedelta do MySQL -> "HH:MM:SS"
+def _formatar_hora(valor):
+    if not isinstance(valor, timedelta):
+        return valor
+    total_seconds = int(valor.total_seconds())
+    hours = total_seconds // 3600
+    minutes = (total_seconds % 3600) // 60
+    seconds = total_seconds % 60
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+def _para_time(valor):
+    if isinstance(valor, time):
+        return valor
+    if isinstance(valor, timedelta):
+        return (datetime.min + valor).time()
+    if len(valor.split(':')) == 2:
+        valor += ':00'
+    return time.fromisoformat(valor)
+
+def _formatar_horario(horario):
+    horario = dict(horario)
+    dia_nome_banco = horario.get('dia_semana', 'domingo')
+    try:
+        dia_numero = DIAS_NUMERO_PARA_NOME.index(dia_nome_banco)
+    except ValueError:
+        dia_numero = 0
+    horario['dia_semana_numero'] = dia_numero
+    horario['dia_semana_nome'] = DIAS_SEMANA_NOMES[dia_numero]
+    horario['horario_abertura'] = _formatar_hora(horario.get('horario_abertura'))
+    horario['horario_fechamento'] = _formatar_hora(horario.get('horario_fechamento'))
+    return horario
+
+# grade semanal: dia (0=domingo) -> lista de (abertura, fechamento) dos horários ativos
+def _montar_grade(horarios):
+    grade = {}
+    for h in horarios:
+        if not h.get('ativo', False):
+            continue
+        grade.setdefault(h['dia_semana_numero'], []).append(
+            (_para_time(h['horario_abertura']), _para_time(h['horario_fechamento']))
+        )
+    return grade
+
+def _carregar():
+    from back.models import HemocentroModel, HorarioFuncionamentoModel
+    hemocentros = HemocentroModel.listar_ativos()
+    horarios_por_hemocentro = HorarioFuncionamentoModel.listar_por_hemocentros(
+        [hemo['id_hemocentro'] for hemo in hemocentros],
+        incluir_inativos=False
+    )
+    itens = []
+    for hemo in hemocentros:
+        horarios = [_formatar_horario(h) for h in horarios_por_hemocentro.get(hemo['id_hemocentro'], [])]
+        horarios.sort(key=lambda x: x.get('dia_semana_numero', 0))
+        hemo = dict(hemo)
+        hemo['horarios'] = horarios
+        itens.append((hemo, _montar_grade(horarios)))
+    return {'itens': itens, 'por_id': {hemo['id_hemocentro']: (hemo, grade) for hemo, grade in itens}}
+
+# horários de funcionamento estão na hora local do hemocentro, não na do servidor
+def esta_aberto(grade, agora=None):
+    agora = agora or datetime.now(FUSO_HORARIO)
+    dia_atual = (agora.weekday() + 1) % 7  # converter para 0=domingo
+    hora_atual = agora.time()
+    return any(abertura <= hora_atual <= fechamento for abertura, fechamento in grade.get(dia_atual, ()))
+
+def _dados():
+    dados = _cache.get(_CHAVE)
+    if dados is None:
+        geracao = _cache.geracao()
+        dados = _carregar()
+        _cache.set(_CHAVE, dados, geracao=geracao)
+    return dados
+
+def _itens():
+    return _dados()['itens']
+
+# primeiro hemocentro ativo em ordem alfabética (o "hemocentro do sistema" do estoque público)
+def hemocentro_padrao():
+    itens = _itens()
+    return itens[0][0]['id_hemocentro'] if itens else None
+
+def listar_hemocentros_com_horarios(agora=None):
+    itens = _itens()
+    agora = agora or datetime.now(FUSO_HORARIO)
+    resultado = []
+    for hemo, grade in itens:
+        hemo = dict(hemo)
+        hemo['aberto_agora'] = esta_aberto(grade, agora)
+        resultado.append(hemo)
+    return resultado
+
+# configuração de agenda de um hemocentro ativo (None se não estiver ativo)
+def agenda_do_hemocentro(id_hemocentro):
+    item = _dados()['por_id'].get(id_hemocentro)
+    if item is None:
+        return None
+    hemo, grade = item
+    return {
+        'duracao': hemo.get('duracao_slot_minutos') or DURACAO_SLOT_PADRAO,
+        'capacidade': hemo.get('capacidade_slot') or CAPACIDADE_SLOT_PADRAO,
+        'grade': grade,
+        'tem_horarios': bool(hemo['horarios'])
+    }
+
+# janelas de funcionamento no dia; None quando o hemocentro não cadastrou horários
+def janelas_do_dia(agenda, dia):
+    if not agenda['tem_horarios']:
+        return None
+    return agenda['grade'].get((dia.weekday() + 1) % 7, [])
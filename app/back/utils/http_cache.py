@@ -0,0 +1,19 @@
+import json
+import hashlib
+from flask import request, jsonify, current_app
+
+# ETag forte calculado sobre o conteúdo serializado
+def calcular_etag(dados):
+    conteudo = json.dumps(dados, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+# responde 304 quando o cliente já tem a versão atual (If-None-Match), senão 200 com ETag.
+# no-cache: o cliente pode guardar, mas precisa revalidar a cada uso.
+def resposta_condicional(payload, etag, cache_control='public, no-cache'):
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,67 @@
+import os
+import hashlib
+from functools import wraps
+from flask import request, jsonify, g, current_app
+
+# Idempotency-Key: o cliente manda a mesma chave ao repetir um POST (timeout, rede instável)
+# e recebe a resposta da primeira execução, sem o handler rodar de novo.
+# a chave vale por usuário e fica guardada por IDEMPOTENCIA_TTL_HORAS; respostas 5xx não são
+# guardadas (a transação da requisição é desfeita e o cliente pode tentar de novo).
+IDEMPOTENCIA_TTL_HORAS = int(os.getenv('IDEMPOTENCIA_TTL_HORAS', '24'))
+CABECALHO = 'Idempotency-Key'
+TAMANHO_MAXIMO_CHAVE = 100
+
+def _hash_requisicao():
+    conteudo = hashlib.sha256()
+    conteudo.update(request.method.encode('utf-8'))
+    conteudo.update(request.path.encode('utf-8'))
+    conteudo.update(request.get_data())
+    return conteudo.hexdigest()
+
+def _reenviar(registro, hash_requisicao):
+    if registro['hash_requisicao'] != hash_requisicao:
+        return jsonify({
+            "success": False,
+            "message": f"{CABECALHO} já usada com outra requisição"
+        }), 422
+    if registro['status_code'] is None:
+        return jsonify({
+            "success": False,
+            "message": "Requisição com esta chave ainda está em processamento"
+        }), 409
+    resposta = current_app.response_class(
+        registro['resposta'],
+        status=registro['status_code'],
+        mimetype='application/json'
+    )
+    resposta.headers['Idempotent-Replayed'] = 'true'
+    return resposta
+
+# usar depois do decorator de autenticação (precisa de g.id_usuario)
+def idempotente(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        from back.models import IdempotenciaModel
+        chave = request.headers.get(CABECALHO)
+        if not chave:
+            return f(*args, **kwargs)
+        chave = chave.strip()
+        if not chave or len(chave) > TAMANHO_MAXIMO_CHAVE:
+            return jsonify({
+                "success": False,
+                "message": f"{CABECALHO} inválida (máximo {TAMANHO_MAXIMO_CHAVE} caracteres)"
+            }), 400
+        hash_requisicao = _hash_requisicao()
+        if not IdempotenciaModel.reservar(g.id_usuario, chave, request.path, hash_requisicao, IDEMPOTENCIA_TTL_HORAS):
+            registro = IdempotenciaModel.buscar(g.id_usuario, chave)
+            if registro is None:
+                return jsonify({
+                    "success": False,
+                    "message": "Requisição com esta chave ainda está em processamento"
+                }), 409
+            return _reenviar(registro, hash_requisicao)
+        resposta = current_app.make_response(f(*args, **kwargs))
+        if resposta.status_code < 500:
+            IdempotenciaModel.concluir(g.id_usuario, chave, resposta.status_code, resposta.get_data(as_text=True))
+        return resposta
+    return decorated
@@ -0,0 +1,121 @@
+import click
+from flask.cli import AppGroup
+
+# comandos de manutenção rodados fora das requisições (cron ou manualmente):
+#   flask --app app manutencao compactar-estoque --dias 90
+#   flask --app app manutencao verificar-indices
+#   flask --app app manutencao arquivar
+#   flask --app app manutencao encerrar-campanhas
+manutencao_cli = AppGroup('manutencao', help='Tarefas de manutenção do banco')
+
+@manutencao_cli.command('compactar-estoque')
+@click.option('--dias', default=90, show_default=True, help='Dias de movimentações detalhadas mantidos')
+@click.option('--lote', default=5000, show_default=True, help='Linhas apagadas por transação')
+def compactar_estoque(dias, lote):
+    from back.models import EstoqueModel
+    apagadas = EstoqueModel.compactar_movimentacoes(dias_retencao=dias, tamanho_lote=lote)
+    click.echo(f"{apagadas} movimentação(ões) anteriores a {dias} dias compactadas (agregados diários mantidos).")
+
+@manutencao_cli.command('recalcular-slots')
+@click.option('--desde', default=None, help='Data inicial (YYYY-MM-DD); padrão: hoje')
+def recalcular_slots(desde):
+    from datetime import datetime
+    from back.models import AgendamentoModel
+    from back.utils.hemocentro_service import agenda_do_hemocentro, janelas_do_dia, invalidar_hemocentros
+    from back.utils.slots import slot_de, para_hora_local, para_utc, hoje_local
+    # --desde é um dia local (como slot_inicio); data_hora dos agendamentos está em UTC
+    inicio = datetime.strptime(desde, '%Y-%m-%d') if desde else datetime.combine(hoje_local(), datetime.min.time())
+    invalidar_hemocentros()
+    slots = {}
+    for ag in AgendamentoModel.listar_para_recalculo_slots(para_utc(inicio)):
+        agenda = agenda_do_hemocentro(ag['id_hemocentro'])
+        if agenda is None:
+            continue
+        data_hora_local = para_hora_local(ag['data_hora'])
+        slot = slot_de(data_hora_local, janelas_do_dia(agenda, data_hora_local), agenda['duracao'])
+        if slot != ag['slot_inicio']:
+            slots[ag['id_agendamento']] = slot
+    contadores = AgendamentoModel.reconstruir_slots(inicio, slots)
+    click.echo(f"{len(slots)} agendamento(s) com slot atualizado, {contadores} contador(es) de slot reconstruído(s).")
+
+@manutencao_cli.command('arquivar')
+@click.option('--lote', default=1000, show_default=True, help='Registros movidos por transação')
+def arquivar(lote):
+    from back.models import ArquivoModel
+    from back.models.models import ARQUIVO_RETENCAO_DIAS
+    total = {'agendamentos': 0, 'doacoes': 0}
+    while True:
+        movidos = ArquivoModel.arquivar_lote(lote)
+        total['agendamentos'] += movidos['agendamentos']
+        total['doacoes'] += movidos['doacoes']
+        if movidos['agendamentos'] < lote and movidos['doacoes'] < lote:
+            break
+    slots = ArquivoModel.limpar_slots_antigos()
+    click.echo(f"{total['agendamentos']} agendamento(s) e {total['doacoes']} doação(ões) com mais de "
+               f"{ARQUIVO_RETENCAO_DIAS} dias arquivados; {slots} contador(es) de slot removido(s).")
+
+@manutencao_cli.command('encerrar-campanhas')
+def encerrar_campanhas():
+    from back.utils.agendador import encerrar_campanhas_vencidas
+    encerradas = encerrar_campanhas_vencidas()
+    click.echo(f"{encerradas} campanha(s) vencida(s) desativada(s).")
+
+# consultas de agenda mais frequentes (mesmos filtros dos models) e o índice que cada uma deve usar.
+# serve como checagem de regressão depois de mexer em consultas ou índices de Agendamento.
+CONSULTAS_INDEXADAS = [
+    (
+        'agendamentos do dia por hemocentro',
+        """SELECT COUNT(*) FROM Agendamento
+           WHERE id_hemocentro = %s AND status IN ('pendente', 'confirmado')
+           AND data_hora >= %s AND data_hora < %s""",
+        lambda inicio, fim: (1, inicio, fim),
+        'idx_agendamento_hemocentro_status_data'
+    ),
+    (
+        'listagem do hemocentro por status a partir de uma data',
+        """SELECT a.id_agendamento FROM Agendamento a
+           WHERE a.id_hemocentro = %s AND a.status = 'pendente' AND a.data_hora >= %s
+           ORDER BY a.data_hora DESC""",
+        lambda inicio, fim: (1, inicio),
+        'idx_agendamento_hemocentro_status_data'
+    ),
+    (
+        'pendentes do doador no dia',
+        """SELECT COUNT(*) FROM Agendamento a
+           WHERE a.id_usuario = %s AND a.id_hemocentro = %s AND a.status = 'pendente'
+           AND a.data_hora >= %s AND a.data_hora < %s""",
+        lambda inicio, fim: (1, 1, inicio, fim),
+        'idx_agendamento_usuario_status_data'
+    ),
+    (
+        'última doação realizada do doador',
+        """SELECT MAX(a.data_hora) FROM Agendamento a
+           WHERE a.id_usuario = %s AND a.status = 'realizado'""",
+        lambda inicio, fim: (1,),
+        'idx_agendamento_usuario_status_data'
+    ),
+]
+
+@manutencao_cli.command('verificar-indices')
+def verificar_indices():
+    from datetime import datetime, date, timedelta
+    from config.config import get_db_connection
+    inicio = datetime.combine(date.today(), datetime.min.time())
+    fim = inicio + timedelta(days=1)
+    falhas = 0
+    with get_db_connection() as db:
+        for nome, sql, parametros, indice in CONSULTAS_INDEXADAS:
+            db.execute("EXPLAIN " + sql, parametros(inicio, fim))
+            plano = db.fetchall()
+            linha = next((p for p in plano if p.get('table') == 'a' or p.get('table') == 'Agendamento'), plano[0])
+            # "Select tables optimized away": o MIN/MAX foi resolvido direto no índice
+            ok = linha.get('key') == indice or 'optimized away' in (linha.get('Extra') or '')
+            if not ok:
+                falhas += 1
+            click.echo(f"[{'OK' if ok else 'FALHA'}] {nome}: type={linha.get('type')} key={linha.get('key')} "
+                       f"rows={linha.get('rows')} (esperado {indice})")
+    if falhas:
+        raise click.ClickException(f"{falhas} consulta(s) sem o índice esperado")
+
+def init_app(app):
+    app.cli.add_command(manutencao_cli)
@@ -0,0 +1,43 @@
+import os
+import base64
+from datetime import datetime
+
+# paginação por chave (keyset): o cursor guarda (data_hora, id) do último item da página,
+# então a próxima página começa direto no índice em vez de pular linhas com OFFSET.
+PAGINA_PADRAO = int(os.getenv('PAGINA_PADRAO', '50'))
+PAGINA_MAXIMA = int(os.getenv('PAGINA_MAXIMA', '200'))
+
+def tamanho_pagina(valor):
+    if valor in (None, ''):
+        return PAGINA_PADRAO
+    limite = int(valor)
+    if limite < 1:
+        raise ValueError("limite deve ser maior que zero")
+    return min(limite, PAGINA_MAXIMA)
+
+def codificar_cursor(data_hora, id_registro):
+    bruto = f"{data_hora.strftime('%Y-%m-%dT%H:%M:%S')}|{id_registro}"
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decodificar_cursor(cursor):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        data_hora, id_registro = bruto.split('|')
+        return datetime.fromisoformat(data_hora), int(id_registro)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor inválido")
+
+# corpo JSON gerado item a item: a página não vira uma única string gigante na memória.
+# cabecalho: campos do objeto de resposta que vêm antes da lista
+def resposta_em_stream(cabecalho, chave_lista, itens, status=200):
+    from flask import current_app
+    json = current_app.json
+
+    def gerar():
+        inicio = json.dumps(cabecalho)
+        yield inicio[:-1] + (', ' if cabecalho else '') + json.dumps(chave_lista) + ': ['
+        for i, item in enumerate(itens):
+            yield (', ' if i else '') + json.dumps(item)
+        yield ']}'
+
+    return current_app.response_class(gerar(), status=status, mimetype='application/json')
@@ -0,0 +1,61 @@
+import os
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+# slots de agendamento: cada janela de funcionamento (HorarioFuncionamento) é dividida em
+# intervalos de duracao_slot_minutos a partir do horário de abertura.
+# hemocentro sem horários cadastrados usa uma grade simples a partir da meia-noite.
+# horários de funcionamento, slot_inicio e AgendamentoSlot estão na hora local dos hemocentros
+# (HEMOCENTRO_FUSO_HORARIO); Agendamento.data_hora é gravado em UTC. converter antes de cruzar os dois.
+DURACAO_SLOT_PADRAO = 30
+CAPACIDADE_SLOT_PADRAO = 4
+FUSO_HORARIO = ZoneInfo(os.getenv('HEMOCENTRO_FUSO_HORARIO', 'America/Sao_Paulo'))
+
+# datetime com fuso (naive = UTC, como Agendamento.data_hora) -> hora local naive
+def para_hora_local(data_hora):
+    if data_hora.tzinfo is None:
+        data_hora = data_hora.replace(tzinfo=timezone.utc)
+    return data_hora.astimezone(FUSO_HORARIO).replace(tzinfo=None)
+
+# hora local naive -> UTC naive
+def para_utc(hora_local):
+    return hora_local.replace(tzinfo=FUSO_HORARIO).astimezone(timezone.utc).replace(tzinfo=None)
+
+def hoje_local():
+    return datetime.now(FUSO_HORARIO).date()
+
+# [início, fim) em UTC naive do dia local que contém data_hora (naive = UTC)
+def intervalo_utc_do_dia_local(data_hora):
+    dia = para_hora_local(data_hora).replace(hour=0, minute=0, second=0, microsecond=0)
+    return para_utc(dia), para_utc(dia + timedelta(days=1))
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+# início do slot que contém data_hora (hora local), ou None se estiver fora do funcionamento.
+# janelas: [(abertura, fechamento), ...] do dia da semana de data_hora
+def slot_de(data_hora, janelas, duracao_minutos):
+    minuto = data_hora.hour * 60 + data_hora.minute
+    dia = data_hora.replace(hour=0, minute=0, second=0, microsecond=0)
+    if janelas is None:
+        return dia + timedelta(minutes=(minuto // duracao_minutos) * duracao_minutos)
+    for abertura, fechamento in janelas:
+        inicio, fim = _minutos(abertura), _minutos(fechamento)
+        if inicio <= minuto < fim:
+            return dia + timedelta(minutes=inicio + ((minuto - inicio) // duracao_minutos) * duracao_minutos)
+    return None
+
+# todos os inícios de slot de um dia
+def slots_do_dia(dia, janelas, duracao_minutos):
+    base = datetime(dia.year, dia.month, dia.day)
+    if janelas is None:
+        janelas_min = [(0, 24 * 60)]
+    else:
+        janelas_min = [(_minutos(abertura), _minutos(fechamento)) for abertura, fechamento in janelas]
+    slots = []
+    for inicio, fim in sorted(janelas_min):
+        minuto = inicio
+        while minuto < fim:
+            slots.append(base + timedelta(minutes=minuto))
+            minuto += duracao_minutos
+    return slots
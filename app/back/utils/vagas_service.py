@@ -0,0 +1,57 @@
+import os
+from datetime import date, datetime, timedelta
+from back.utils.cache_utils import TTLCache
+from back.utils.hemocentro_service import agenda_do_hemocentro, janelas_do_dia, versao_hemocentros
+from back.utils.slots import slots_do_dia
+
+# vagas por slot de um hemocentro, em cache por (hemocentro, dia).
+# os dias que faltam no cache são montados juntos: uma consulta por intervalo nos contadores
+# de AgendamentoSlot + a grade de horários que já está em memória.
+# reservas e liberações invalidam o dia do slot depois do commit; mudanças de horário
+# invalidam tudo pela versão do cache de hemocentros, que faz parte da chave.
+VAGAS_CACHE_TTL = int(os.getenv('VAGAS_CACHE_TTL', '120'))
+VAGAS_MAX_DIAS = int(os.getenv('VAGAS_MAX_DIAS', '31'))
+_cache = TTLCache(ttl=VAGAS_CACHE_TTL, max_entries=int(os.getenv('VAGAS_CACHE_SIZE', '5000')))
+
+def invalidar_vagas(id_hemocentro, dia):
+    if isinstance(dia, datetime):
+        dia = dia.date()
+    _cache.remover_se(lambda chave, _: chave[0] == id_hemocentro and chave[1] == dia)
+
+def _montar_dias(id_hemocentro, agenda, dias):
+    from back.models import AgendamentoModel
+    inicio = datetime.combine(dias[0], datetime.min.time())
+    fim = datetime.combine(dias[-1] + timedelta(days=1), datetime.min.time())
+    reservados = AgendamentoModel.reservas_por_slot(id_hemocentro, inicio, fim)
+    capacidade = agenda['capacidade']
+    montados = {}
+    for dia in dias:
+        slots = slots_do_dia(dia, janelas_do_dia(agenda, dia), agenda['duracao'])
+        montados[dia] = [
+            (slot, max(capacidade - reservados.get(slot, 0), 0))
+            for slot in slots
+        ]
+    return montados
+
+# [(dia, [(inicio_slot, vagas), ...]), ...] de "de" até "ate" (inclusive); None se o hemocentro não está ativo
+def vagas_por_dia(id_hemocentro, de, ate):
+    agenda = agenda_do_hemocentro(id_hemocentro)
+    if agenda is None:
+        return None
+    versao = versao_hemocentros()
+    dias = [de + timedelta(days=i) for i in range((ate - de).days + 1)]
+    resultado = {}
+    faltando = []
+    for dia in dias:
+        slots = _cache.get((id_hemocentro, dia, versao))
+        if slots is None:
+            faltando.append(dia)
+        else:
+            resultado[dia] = slots
+    if faltando:
+        geracao = _cache.geracao()
+        montados = _montar_dias(id_hemocentro, agenda, faltando)
+        for dia, slots in montados.items():
+            _cache.set((id_hemocentro, dia, versao), slots, geracao=geracao)
+        resultado.update(montados)
+    return [(dia, resultado[dia]) for dia in dias]
@@ -1,7 +1,8 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from .database_manager import DatabaseConnection
+from .database_manager import DatabaseConnection, ConnectionPool
+from .unit_of_work import unidade_atual
 
 BASE_DIR = Path(__file__).resolve().parent
 ENV_PATH = BASE_DIR / 'configs.env'
@@ -16,8 +17,30 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT','51504'))
 }
 
-def get_db_connection():
-    return DatabaseConnection(**DB_CONFIG)
+# pool de conexões compartilhado por todos os models
+DB_POOL_CONFIG = {
+    'size': int(os.getenv('DB_POOL_SIZE', '10')),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+    'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+    'ping_interval': float(os.getenv('DB_POOL_PING_INTERVAL', '5')),
+    'statement_cache_size': int(os.getenv('DB_STATEMENT_CACHE_SIZE', '32'))
+}
+
+# permite desligar os prepared statements sem mexer nos models
+DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'True').lower() == 'true'
+
+db_pool = ConnectionPool(**DB_CONFIG, **DB_POOL_CONFIG)
+
+# dentro de uma requisição o bloco entra na unidade de trabalho ativa (mesma conexão e transação)
+# prepared=True: consultas quentes reaproveitam o prepared statement já aberto na conexão
+def get_db_connection(prepared=False):
+    return DatabaseConnection(
+        **DB_CONFIG,
+        pool=db_pool,
+        unit_of_work=unidade_atual(),
+        prepared=prepared and DB_PREPARED_STATEMENTS
+    )
 
 #mudando nome para evitar conflito
 get_db_manager = get_db_connection
@@ -1,30 +1,382 @@
+import time
+import threading
+from collections import deque, OrderedDict
 import mysql.connector
 from mysql.connector import Error
 
+class PoolTimeoutError(Error):
+    pass
+
+COMANDOS_PREPARAVEIS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# contadores do cache de prepared statements (compartilhados por todas as conexões do pool)
+class StatementStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def registrar(self, hit=False, miss=False, eviction=False):
+        with self._lock:
+            self.hits += hit
+            self.misses += miss
+            self.evictions += eviction
+
+    def as_dict(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+# LRU de prepared statements de UMA conexão, indexado pelo texto do SQL.
+# cada entrada é um cursor preparado que mantém o handle do statement no servidor.
+class StatementCache:
+    def __init__(self, connection, capacity, stats):
+        self._connection = connection
+        self.capacity = max(1, capacity)
+        self._stats = stats
+        self._entradas = OrderedDict()
+
+    def cursor_para(self, sql):
+        entrada = self._entradas.get(sql)
+        if entrada is not None:
+            self._entradas.move_to_end(sql)
+            self._stats.registrar(hit=True)
+            return entrada
+        self._stats.registrar(miss=True)
+        if len(self._entradas) >= self.capacity:
+            _, (cursor_antigo, _) = self._entradas.popitem(last=False)
+            self._stats.registrar(eviction=True)
+            try:
+                cursor_antigo.close()
+            except Error:
+                pass
+        # guarda a própria string: o conector só reaproveita o statement se receber o mesmo objeto
+        entrada = (self._connection.cursor(prepared=True), sql)
+        self._entradas[sql] = entrada
+        return entrada
+
+    def descartar(self, sql):
+        entrada = self._entradas.pop(sql, None)
+        if entrada is not None:
+            try:
+                entrada[0].close()
+            except Error:
+                pass
+
+    def close(self):
+        while self._entradas:
+            self.descartar(next(iter(self._entradas)))
+
+# resultado já lido de um prepared statement (imita a interface do cursor)
+class ResultadoPreparado:
+    def __init__(self, cursor):
+        self.lastrowid = cursor.lastrowid
+        self.rowcount = cursor.rowcount
+        self._linhas = deque()
+        if cursor.description:
+            colunas = cursor.column_names
+            self._linhas.extend(dict(zip(colunas, linha)) for linha in cursor.fetchall())
+            self.rowcount = len(self._linhas)
+
+    def fetchone(self):
+        return self._linhas.popleft() if self._linhas else None
+
+    def fetchall(self):
+        linhas = list(self._linhas)
+        self._linhas.clear()
+        return linhas
+
+# conexão física guardada no pool
+class PooledConnection:
+    def __init__(self, connection, statement_cache_size=32, statement_stats=None):
+        self.connection = connection
+        self.criada_em = time.monotonic()
+        self.usada_em = self.criada_em
+        self.statements = StatementCache(connection, statement_cache_size, statement_stats or StatementStats())
+
+    def idade(self):
+        return time.monotonic() - self.criada_em
+
+    def ociosa_ha(self):
+        return time.monotonic() - self.usada_em
+
+# pool limitado e thread-safe de conexões mysql
+# - size: máximo de conexões abertas ao mesmo tempo
+# - timeout: segundos esperando uma conexão livre antes de desistir
+# - max_lifetime: conexões mais velhas que isso são recicladas
+# - max_idle: conexões paradas há mais tempo que isso são fechadas
+# - ping_interval: ao emprestar, faz ping se a conexão ficou parada mais que isso (0 = sempre)
+# - statement_cache_size: quantos prepared statements cada conexão mantém abertos
+class ConnectionPool:
+    def __init__(self, host, database, user, password, port, size=10, timeout=10,
+                 max_lifetime=1800, max_idle=300, ping_interval=5, statement_cache_size=32):
+        self._connect_args = {
+            'host': host,
+            'database': database,
+            'user': user,
+            'password': password,
+            'port': port
+        }
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.ping_interval = ping_interval
+        self.statement_cache_size = statement_cache_size
+        self.statement_stats = StatementStats()
+        self._ociosas = deque()
+        self._total = 0
+        self._cond = threading.Condition(threading.Lock())
+
+    def _abrir(self):
+        connection = mysql.connector.connect(**self._connect_args)
+        print("Conexão feita com sucesso.")
+        return PooledConnection(connection, self.statement_cache_size, self.statement_stats)
+
+    def _fechar(self, pooled):
+        try:
+            pooled.statements.close()
+            pooled.connection.close()
+            print("Conexão encerrada.")
+        except Error:
+            pass
+
+    def _expirada(self, pooled):
+        if self.max_lifetime and pooled.idade() > self.max_lifetime:
+            return True
+        if self.max_idle and pooled.ociosa_ha() > self.max_idle:
+            return True
+        return False
+
+    def _saudavel(self, pooled):
+        if pooled.ociosa_ha() < self.ping_interval:
+            return True
+        try:
+            pooled.connection.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    # remove conexões vencidas da fila (chamado com o lock)
+    def _despejar_expiradas(self):
+        descartadas = [p for p in self._ociosas if self._expirada(p)]
+        for pooled in descartadas:
+            self._ociosas.remove(pooled)
+            self._total -= 1
+        if descartadas:
+            self._cond.notify(len(descartadas))
+        return descartadas
+
+    def acquire(self):
+        prazo = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                descartadas = self._despejar_expiradas()
+                pooled = None
+                criar = False
+                while pooled is None and not criar:
+                    if self._ociosas:
+                        pooled = self._ociosas.pop()
+                    elif self._total < self.size:
+                        self._total += 1
+                        criar = True
+                    else:
+                        restante = prazo - time.monotonic()
+                        if restante <= 0:
+                            raise PoolTimeoutError(
+                                msg=f"Nenhuma conexão livre no pool após {self.timeout}s (tamanho {self.size})"
+                            )
+                        self._cond.wait(restante)
+            for velha in descartadas:
+                self._fechar(velha)
+            if criar:
+                try:
+                    return self._abrir()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+            if self._saudavel(pooled):
+                return pooled
+            # conexão morta: descarta e tenta de novo
+            self._descartar(pooled)
+
+    def release(self, pooled, discard=False):
+        if discard or self._expirada(pooled):
+            self._descartar(pooled)
+            return
+        pooled.usada_em = time.monotonic()
+        with self._cond:
+            self._ociosas.append(pooled)
+            self._cond.notify()
+
+    def _descartar(self, pooled):
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+        self._fechar(pooled)
+
+    def close_all(self):
+        with self._cond:
+            ociosas = list(self._ociosas)
+            self._ociosas.clear()
+            self._total -= len(ociosas)
+            self._cond.notify_all()
+        for pooled in ociosas:
+            self._fechar(pooled)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'tamanho': self.size,
+                'abertas': self._total,
+                'ociosas': len(self._ociosas),
+                'em_uso': self._total - len(self._ociosas),
+                'statements': self.statement_stats.as_dict()
+            }
+
+# transação compartilhada por todos os blocos "with get_db_manager()" de uma requisição.
+# a conexão só é emprestada do pool no primeiro uso e volta no commit/rollback final.
+class UnitOfWork:
+    def __init__(self, pool):
+        self._pool = pool
+        self._pooled = None
+        self.ativo = True
+        self.profundidade = 0
+        self.alterado = False
+        self._savepoints = 0
+        self._callbacks = []
+
+    @property
+    def pooled(self):
+        if self._pooled is None:
+            self._pooled = self._pool.acquire()
+        return self._pooled
+
+    @property
+    def connection(self):
+        return self.pooled.connection
+
+    def after_commit(self, callback):
+        self._callbacks.append(callback)
+
+    # abre um bloco; no bloco mais externo, se já houve escrita, cria um savepoint
+    # para que a falha desse bloco desfaça só o que ele fez
+    def abrir_bloco(self, cursor):
+        self.profundidade += 1
+        if self.profundidade > 1:
+            return None
+        marca = {'callbacks': len(self._callbacks), 'savepoint': None}
+        if self.alterado:
+            self._savepoints += 1
+            marca['savepoint'] = f"uow_sp_{self._savepoints}"
+            cursor.execute(f"SAVEPOINT {marca['savepoint']}")
+        return marca
+
+    def fechar_bloco(self, cursor, marca, falhou):
+        self.profundidade -= 1
+        if marca is None or not falhou:
+            return
+        del self._callbacks[marca['callbacks']:]
+        if marca['savepoint']:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {marca['savepoint']}")
+        else:
+            self.connection.rollback()
+            self.alterado = False
+
+    def commit(self):
+        if not self.ativo:
+            return
+        self.ativo = False
+        callbacks, self._callbacks = self._callbacks, []
+        if self._pooled is None:
+            return
+        try:
+            self._pooled.connection.commit()
+        except Exception:
+            self._reverter()
+            raise
+        self._devolver(discard=False)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[ERRO] Callback pós-commit: {str(e)}")
+
+    def rollback(self):
+        if not self.ativo:
+            return
+        self.ativo = False
+        self._callbacks = []
+        if self._pooled is not None:
+            self._reverter()
+
+    def _reverter(self):
+        try:
+            self._pooled.connection.rollback()
+            self._devolver(discard=False)
+        except Exception:
+            self._devolver(discard=True)
+
+    def _devolver(self, discard):
+        pooled, self._pooled = self._pooled, None
+        self._pool.release(pooled, discard=discard)
+
 class DatabaseConnection:
-    def __init__(self, host, database, user, password,port):
+    # prepared=True executa SELECT/INSERT/UPDATE/DELETE como prepared statements,
+    # reaproveitando o handle já preparado naquela conexão (evita parse/plano no servidor)
+    def __init__(self, host, database, user, password, port, pool=None, unit_of_work=None, prepared=False):
         self.host = host
         self.database = database
         self.user = user
         self.password = password
         self.port = port
+        self._pool = pool
+        self._uow = unit_of_work
+        self._prepared = prepared
+        self._pooled = None
         self._connection = None
         self._cursor = None
+        self._resultado = None
+        self._statements = None
+        self._marca = None
+        self._callbacks = []
 
     def connect(self):
         try:
-            self._connection = mysql.connector.connect(
-                host=self.host,
-                database=self.database,
-                user=self.user,
-                password=self.password,
-                port=self.port
-            )
-            self._cursor = self._connection.cursor(dictionary=True)
-            print("Conexão feita com sucesso.")
+            if self._uow:
+                self._connection = self._uow.connection
+                self._statements = self._uow.pooled.statements
+            elif self._pool:
+                self._pooled = self._pool.acquire()
+                self._connection = self._pooled.connection
+                self._statements = self._pooled.statements
+            else:
+                self._connection = mysql.connector.connect(
+                    host=self.host,
+                    database=self.database,
+                    user=self.user,
+                    password=self.password,
+                    port=self.port
+                )
+                print("Conexão feita com sucesso.")
+                self._statements = StatementCache(self._connection, 32, StatementStats())
+            self._cursor = self._connection.cursor(dictionary=True, buffered=True)
+            self._resultado = self._cursor
+            if self._uow:
+                self._marca = self._uow.abrir_bloco(self._cursor)
             return self
         except Error as e:
             print(f"Erro na conexão: {e}")
+            if not self._uow:
+                self._devolver(discard=True)
             raise
 
     def __enter__(self):
@@ -32,43 +384,115 @@ class DatabaseConnection:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._uow:
+            self._sair_da_unidade(exc_type)
+            return
         if self._connection:
+            quebrada = False
             try:
                 if exc_type:
                     print(f"Ocorreu um erro: {exc_type}. Revertendo...")
                     self._connection.rollback()
                 else:
                     self._connection.commit()
+            except Error:
+                quebrada = True
+                raise
             finally:
                 if self._cursor:
-                    self._cursor.close()
-                self._connection.close()
-                print("Conexão encerrada.")
-    
+                    try:
+                        self._cursor.close()
+                    except Error:
+                        quebrada = True
+                self._devolver(discard=quebrada)
+            if not exc_type:
+                self._executar_callbacks()
+
+    # bloco dentro de uma unidade de trabalho: não faz commit, só desfaz o próprio trabalho se falhar
+    def _sair_da_unidade(self, exc_type):
+        try:
+            if exc_type:
+                print(f"Ocorreu um erro: {exc_type}. Revertendo bloco...")
+            self._uow.fechar_bloco(self._cursor, self._marca, bool(exc_type))
+        finally:
+            if self._cursor:
+                self._cursor.close()
+            self._connection, self._cursor, self._resultado = None, None, None
+
+    def _devolver(self, discard=False):
+        connection, self._connection, self._cursor, self._resultado = self._connection, None, None, None
+        if self._pooled:
+            pooled, self._pooled = self._pooled, None
+            self._pool.release(pooled, discard=discard)
+        elif connection:
+            if self._statements:
+                self._statements.close()
+            connection.close()
+            print("Conexão encerrada.")
+
+    # agenda uma função para rodar depois que a transação for confirmada
+    def after_commit(self, callback):
+        if self._uow:
+            self._uow.after_commit(callback)
+        else:
+            self._callbacks.append(callback)
+
+    def _executar_callbacks(self):
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[ERRO] Callback pós-commit: {str(e)}")
+
+    def _marcar_escrita(self, query):
+        if self._uow and not query.lstrip()[:6].upper() == 'SELECT':
+            self._uow.alterado = True
+
+    def _executar_preparado(self, query, params):
+        cursor, sql = self._statements.cursor_para(query)
+        try:
+            cursor.execute(sql, tuple(params or ()))
+            self._resultado = ResultadoPreparado(cursor)
+        except Error:
+            # statement pode ter ficado inválido (ex.: tabela alterada); prepara de novo na próxima
+            self._statements.descartar(query)
+            raise
+
     def execute_query(self, query, params=None):
-        self._cursor.execute(query, params or ())
-        
+        self.execute(query, params)
+
     def fetch_one(self, query, params=None):
-        self.execute_query(query, params)
-        return self._cursor.fetchone()
-        
+        self.execute(query, params)
+        return self.fetchone()
+
     def fetch_all(self, query, params=None):
-        self.execute_query(query, params)
-        return self._cursor.fetchall()
-    
+        self.execute(query, params)
+        return self.fetchall()
+
     def execute(self, query, params=None):
+        self._marcar_escrita(query)
+        if self._prepared and query.lstrip()[:7].split()[0].upper() in COMANDOS_PREPARAVEIS:
+            self._executar_preparado(query, params)
+            return
+        self._resultado = self._cursor
         self._cursor.execute(query, params or ())
-    
+
+    def executemany(self, query, seq_params):
+        self._marcar_escrita(query)
+        self._resultado = self._cursor
+        self._cursor.executemany(query, seq_params)
+
     def fetchone(self):
-        return self._cursor.fetchone()
-    
+        return self._resultado.fetchone()
+
     def fetchall(self):
-        return self._cursor.fetchall()
-    
+        return self._resultado.fetchall()
+
     @property
     def lastrowid(self):
-        return self._cursor.lastrowid
-    
+        return self._resultado.lastrowid
+
     @property
     def rowcount(self):
-        return self._cursor.rowcount
\ No newline at end of file
+        return self._resultado.rowcount
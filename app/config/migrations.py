@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+from .config import get_db_connection
+
+# migrações versionadas do banco: database/migrations/NNN_descricao.sql, aplicadas em ordem.
+# as versões aplicadas ficam registradas na tabela SchemaMigrations.
+# uso (dentro de app/): python -m config.migrations [status]
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / 'database' / 'migrations'
+
+def _arquivos():
+    return sorted(MIGRATIONS_DIR.glob('*.sql'))
+
+# separa os comandos do arquivo (um ';' no fim da linha encerra o comando; linhas "--" são comentário)
+def _comandos(texto):
+    comandos, atual = [], []
+    for linha in texto.splitlines():
+        if linha.strip().startswith('--') or not linha.strip():
+            continue
+        atual.append(linha)
+        if linha.rstrip().endswith(';'):
+            comandos.append('\n'.join(atual).rstrip().rstrip(';'))
+            atual = []
+    if atual:
+        comandos.append('\n'.join(atual))
+    return comandos
+
+def _garantir_tabela(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS SchemaMigrations (
+            versao VARCHAR(100) NOT NULL,
+            aplicada_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (versao)
+        )
+    """)
+
+def versoes_aplicadas():
+    with get_db_connection() as db:
+        _garantir_tabela(db)
+        db.execute("SELECT versao FROM SchemaMigrations")
+        return {row['versao'] for row in db.fetchall()}
+
+def pendentes():
+    aplicadas = versoes_aplicadas()
+    return [arquivo for arquivo in _arquivos() if arquivo.stem not in aplicadas]
+
+# DDL no MySQL faz commit implícito: cada migração é registrada logo depois de rodar.
+# uma migração que falhe no meio precisa ser escrita de forma idempotente (IF NOT EXISTS etc.)
+def aplicar():
+    aplicadas = []
+    for arquivo in pendentes():
+        print(f"Aplicando migração {arquivo.stem}...")
+        with get_db_connection() as db:
+            for comando in _comandos(arquivo.read_text(encoding='utf-8')):
+                db.execute(comando)
+            db.execute("INSERT INTO SchemaMigrations (versao) VALUES (%s)", (arquivo.stem,))
+        aplicadas.append(arquivo.stem)
+    if not aplicadas:
+        print("Banco já está atualizado.")
+    return aplicadas
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        aplicadas = versoes_aplicadas()
+        for arquivo in _arquivos():
+            print(f"[{'x' if arquivo.stem in aplicadas else ' '}] {arquivo.stem}")
+    else:
+        aplicar()
@@ -0,0 +1,44 @@
+from flask import g, has_app_context
+from .database_manager import UnitOfWork
+
+# unidade de trabalho por requisição: todos os models chamados durante a requisição
+# usam a mesma conexão e a mesma transação, confirmada uma única vez no final.
+# respostas 5xx ou exceções não tratadas desfazem tudo.
+
+def unidade_atual():
+    if not has_app_context():
+        return None
+    uow = g.get('_unit_of_work')
+    if uow is not None and uow.ativo:
+        return uow
+    return None
+
+def init_app(app, pool):
+    @app.before_request
+    def _abrir_unidade():
+        g._unit_of_work = UnitOfWork(pool)
+
+    @app.after_request
+    def _confirmar_unidade(response):
+        uow = g.pop('_unit_of_work', None)
+        if uow is None:
+            return response
+        if response.status_code >= 500:
+            uow.rollback()
+            return response
+        try:
+            uow.commit()
+        except Exception as e:
+            print(f"[ERRO] Commit da requisição: {str(e)}")
+            return app.response_class(
+                '{"success": false, "message": "Erro interno no servidor"}',
+                status=500,
+                mimetype='application/json'
+            )
+        return response
+
+    @app.teardown_request
+    def _liberar_unidade(exc):
+        uow = g.pop('_unit_of_work', None)
+        if uow is not None:
+            uow.rollback()
@@ -293,8 +293,10 @@ function preencherModalEdicao(campanha) {
     campanha.tipo_sanguineo_necessario;
   document.getElementById("edit-meta-litros").value =
     campanha.quantidade_meta_litros;
-  document.getElementById("edit-atual-litros").value =
-    campanha.quantidade_atual_litros;
+  const campoAtual = document.getElementById("edit-atual-litros");
+  campoAtual.value = campanha.quantidade_atual_litros;
+  // só envia o total se o colaborador mudar (evita sobrescrever doações registradas depois)
+  campoAtual.dataset.original = campoAtual.value;
   document.getElementById("edit-objetivo").value = campanha.objetivo || "";
   document.getElementById("edit-ativa").checked = campanha.ativa;
   document.getElementById("edit-destaque").checked = campanha.destaque || false;
@@ -328,13 +330,14 @@ async function salvarEdicaoCampanha(e) {
     quantidade_meta_litros: Number(
       document.getElementById("edit-meta-litros").value
     ),
-    quantidade_atual_litros: Number(
-      document.getElementById("edit-atual-litros").value
-    ),
     objetivo: document.getElementById("edit-objetivo").value.trim(),
     ativa: document.getElementById("edit-ativa").checked,
     destaque: document.getElementById("edit-destaque").checked,
   };
+  const campoAtual = document.getElementById("edit-atual-litros");
+  if (campoAtual.value !== campoAtual.dataset.original) {
+    dadosAtualizados.quantidade_atual_litros = Number(campoAtual.value);
+  }
   console.log("Enviando atualização:", dadosAtualizados);
   try {
     const resp = await fetch(`/api/campanhas/${idCampanha}`, {
@@ -504,16 +504,19 @@ async function amostragemDePagina() {
 
 // gerenciamento de agendamentos
 let filtroAtualAgendamentos = 'pendente';
-// carregar agendamentos do hemocentro
-async function carregarAgendamentosColaborador(status = null) {
+// carregar agendamentos do hemocentro (paginado: cursor continua de onde a página anterior parou)
+async function carregarAgendamentosColaborador(status = null, cursor = null) {
   try {
     const token = localStorage.getItem("token");
     if (!token) {
       alert("Faça login para ver os agendamentos.");
       return;
     }
-    const statusQuery = status ? `?status=${status}` : '';
-    const resp = await fetch(`/api/agendamentos${statusQuery}`, {
+    const params = new URLSearchParams();
+    if (status) params.set('status', status);
+    if (cursor) params.set('cursor', cursor);
+    const query = params.toString() ? `?${params.toString()}` : '';
+    const resp = await fetch(`/api/agendamentos${query}`, {
       method: "GET",
       headers: {
         "Content-Type": "application/json",
@@ -527,7 +530,7 @@ async function carregarAgendamentosColaborador(status = null) {
     }
     const json = await resp.json();
     if (json.success && json.agendamentos) {
-      renderizarAgendamentosColaborador(json.agendamentos);
+      renderizarAgendamentosColaborador(json.agendamentos, !!cursor, json.next_cursor, status);
     } else {
       renderizarAgendamentosColaborador([]);
     }
@@ -538,13 +541,15 @@ async function carregarAgendamentosColaborador(status = null) {
 }
 
 // renderizar tabela de agendamentos
-function renderizarAgendamentosColaborador(agendamentos) {
+function renderizarAgendamentosColaborador(agendamentos, anexar = false, nextCursor = null, status = null) {
   const tbody = document.getElementById("lista-agendamentos-colaborador");
   if (!tbody) {
     console.warn("Tbody 'lista-agendamentos-colaborador' não encontrado");
     return;
   }
-  if (agendamentos.length === 0) {
+  const linhaMais = document.getElementById("linha-carregar-mais-agendamentos");
+  if (linhaMais) linhaMais.remove();
+  if (agendamentos.length === 0 && !anexar) {
     tbody.innerHTML = `
       <tr>
         <td colspan="7" style="text-align: center; padding: 40px; color: #666;">
@@ -581,7 +586,24 @@ function renderizarAgendamentosColaborador(agendamentos) {
       </tr>
     `;
   });
-  tbody.innerHTML = htmlLinhas;
+  if (nextCursor) {
+    htmlLinhas += `
+      <tr id="linha-carregar-mais-agendamentos">
+        <td colspan="7" style="text-align: center; padding: 16px;">
+          <button type="button" id="btn-carregar-mais-agendamentos">Carregar mais</button>
+        </td>
+      </tr>
+    `;
+  }
+  if (anexar) {
+    tbody.insertAdjacentHTML("beforeend", htmlLinhas);
+  } else {
+    tbody.innerHTML = htmlLinhas;
+  }
+  const btnMais = document.getElementById("btn-carregar-mais-agendamentos");
+  if (btnMais) {
+    btnMais.addEventListener("click", () => carregarAgendamentosColaborador(status, nextCursor));
+  }
 }
 
 function formatarStatusAgendamento(status) {
@@ -0,0 +1,30 @@
+-- livro de movimentações do estoque (somente inserção) e agregados diários mantidos a cada escrita
+CREATE TABLE IF NOT EXISTS MovimentacaoEstoque (
+    id_movimentacao BIGINT NOT NULL AUTO_INCREMENT,
+    id_hemocentro INT NOT NULL,
+    tipo_sanguineo VARCHAR(5) NOT NULL,
+    delta INT NOT NULL,
+    quantidade_resultante INT NOT NULL,
+    origem ENUM('adicionar', 'remover', 'ajuste', 'lote', 'inicializacao') NOT NULL,
+    id_usuario INT DEFAULT NULL,
+    data_movimentacao TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_movimentacao),
+    KEY idx_mov_hemocentro_tipo_data (id_hemocentro, tipo_sanguineo, data_movimentacao),
+    KEY idx_mov_data (data_movimentacao),
+    CONSTRAINT MovimentacaoEstoque_ibfk_1 FOREIGN KEY (id_hemocentro)
+        REFERENCES Hemocentros (id_hemocentro) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS EstoqueDiario (
+    id_hemocentro INT NOT NULL,
+    tipo_sanguineo VARCHAR(5) NOT NULL,
+    dia DATE NOT NULL,
+    entradas INT NOT NULL DEFAULT 0,
+    saidas INT NOT NULL DEFAULT 0,
+    movimentacoes INT NOT NULL DEFAULT 0,
+    saldo_final INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_hemocentro, tipo_sanguineo, dia),
+    KEY idx_diario_dia (dia),
+    CONSTRAINT EstoqueDiario_ibfk_1 FOREIGN KEY (id_hemocentro)
+        REFERENCES Hemocentros (id_hemocentro) ON DELETE CASCADE
+);
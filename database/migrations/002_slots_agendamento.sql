@@ -0,0 +1,19 @@
+-- capacidade de agendamento por slot: tamanho e capacidade configuráveis por hemocentro,
+-- contador de reservas por (hemocentro, início do slot) e o slot de cada agendamento.
+-- depois de aplicar, rodar "flask --app app manutencao recalcular-slots" para preencher os existentes.
+ALTER TABLE Hemocentros
+    ADD COLUMN duracao_slot_minutos INT NOT NULL DEFAULT 30,
+    ADD COLUMN capacidade_slot INT NOT NULL DEFAULT 4;
+
+ALTER TABLE Agendamento
+    ADD COLUMN slot_inicio DATETIME DEFAULT NULL,
+    ADD KEY idx_agendamento_slot (id_hemocentro, slot_inicio);
+
+CREATE TABLE IF NOT EXISTS AgendamentoSlot (
+    id_hemocentro INT NOT NULL,
+    slot_inicio DATETIME NOT NULL,
+    reservados INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_hemocentro, slot_inicio),
+    CONSTRAINT AgendamentoSlot_ibfk_1 FOREIGN KEY (id_hemocentro)
+        REFERENCES Hemocentros (id_hemocentro) ON DELETE CASCADE
+);
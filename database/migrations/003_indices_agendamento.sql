@@ -0,0 +1,44 @@
+-- índices compostos para os filtros de agenda (hemocentro/usuário + status + intervalo de data_hora).
+-- idx_usuario e id_hemocentro (nomes do schema original, database/schema_hemocentro.pdf) ficam
+-- cobertos pelo prefixo dos novos índices (inclusive para as FKs), então são removidos depois.
+-- cada passo confere information_schema antes: índice ausente/já criado não interrompe a migração.
+-- conferir o uso com "flask --app app manutencao verificar-indices".
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'Agendamento' AND index_name = 'idx_agendamento_hemocentro_status_data') = 0,
+    'ALTER TABLE Agendamento ADD KEY idx_agendamento_hemocentro_status_data (id_hemocentro, status, data_hora)',
+    'DO 0'
+);
+PREPARE ddl FROM @ddl;
+EXECUTE ddl;
+DEALLOCATE PREPARE ddl;
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'Agendamento' AND index_name = 'idx_agendamento_usuario_status_data') = 0,
+    'ALTER TABLE Agendamento ADD KEY idx_agendamento_usuario_status_data (id_usuario, status, data_hora)',
+    'DO 0'
+);
+PREPARE ddl FROM @ddl;
+EXECUTE ddl;
+DEALLOCATE PREPARE ddl;
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'Agendamento' AND index_name = 'idx_usuario') > 0,
+    'ALTER TABLE Agendamento DROP KEY idx_usuario',
+    'DO 0'
+);
+PREPARE ddl FROM @ddl;
+EXECUTE ddl;
+DEALLOCATE PREPARE ddl;
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'Agendamento' AND index_name = 'id_hemocentro') > 0,
+    'ALTER TABLE Agendamento DROP KEY id_hemocentro',
+    'DO 0'
+);
+PREPARE ddl FROM @ddl;
+EXECUTE ddl;
+DEALLOCATE PREPARE ddl;
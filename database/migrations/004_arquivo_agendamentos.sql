@@ -0,0 +1,18 @@
+-- arquivo de agendamentos encerrados e doações antigas (movidos por "flask --app app manutencao arquivar").
+-- as tabelas de arquivo copiam colunas e índices das originais, sem as FKs (InnoDB não particiona
+-- tabelas com FK, por isso arquivo + view em vez de partições).
+-- as views juntam quente + arquivo para consultas históricas explícitas.
+-- ao alterar colunas de Agendamento/HistoricoDoacoes, alterar também o arquivo e recriar as views.
+CREATE TABLE IF NOT EXISTS AgendamentoArquivo LIKE Agendamento;
+
+CREATE TABLE IF NOT EXISTS HistoricoDoacoesArquivo LIKE HistoricoDoacoes;
+
+CREATE OR REPLACE VIEW AgendamentoCompleto AS
+    SELECT * FROM Agendamento
+    UNION ALL
+    SELECT * FROM AgendamentoArquivo;
+
+CREATE OR REPLACE VIEW HistoricoDoacoesCompleto AS
+    SELECT * FROM HistoricoDoacoes
+    UNION ALL
+    SELECT * FROM HistoricoDoacoesArquivo;
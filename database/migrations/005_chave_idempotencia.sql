@@ -0,0 +1,14 @@
+-- respostas guardadas por Idempotency-Key (por usuário), reenviadas quando o cliente repete o pedido.
+-- linhas expiradas são apagadas pela tarefa agendada "limpar-idempotencia".
+CREATE TABLE IF NOT EXISTS ChaveIdempotencia (
+    id_usuario INT NOT NULL,
+    chave VARCHAR(100) NOT NULL,
+    rota VARCHAR(200) NOT NULL,
+    hash_requisicao CHAR(64) NOT NULL,
+    status_code SMALLINT DEFAULT NULL,
+    resposta MEDIUMTEXT,
+    criada_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expira_em DATETIME NOT NULL,
+    PRIMARY KEY (id_usuario, chave),
+    KEY idx_idempotencia_expira (expira_em)
+);
@@ -0,0 +1,22 @@
+-- tipos sanguíneos de cada campanha numa tabela própria (uma linha por tipo), no lugar do
+-- LIKE em Campanha.tipo_sanguineo_necessario. a coluna de texto continua como rótulo de exibição.
+-- o índice (tipo_sanguineo, id_campanha) atende a busca "campanhas que precisam destes tipos".
+CREATE TABLE IF NOT EXISTS CampanhaTipoSanguineo (
+    id_campanha INT NOT NULL,
+    tipo_sanguineo ENUM('A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-') NOT NULL,
+    PRIMARY KEY (id_campanha, tipo_sanguineo),
+    KEY idx_campanha_tipo (tipo_sanguineo, id_campanha),
+    CONSTRAINT CampanhaTipoSanguineo_ibfk_1 FOREIGN KEY (id_campanha)
+        REFERENCES Campanha (id_campanha) ON DELETE CASCADE
+);
+
+-- dados existentes: tipo inteiro (B+ não casa dentro de AB+); "Todos" vira os 8 tipos
+INSERT IGNORE INTO CampanhaTipoSanguineo (id_campanha, tipo_sanguineo)
+SELECT c.id_campanha, t.tipo
+FROM Campanha c
+CROSS JOIN (
+    SELECT 'A+' AS tipo UNION ALL SELECT 'A-' UNION ALL SELECT 'B+' UNION ALL SELECT 'B-'
+    UNION ALL SELECT 'AB+' UNION ALL SELECT 'AB-' UNION ALL SELECT 'O+' UNION ALL SELECT 'O-'
+) t
+WHERE UPPER(c.tipo_sanguineo_necessario) LIKE '%TODOS%'
+OR UPPER(c.tipo_sanguineo_necessario) REGEXP CONCAT('(^|[^A-Z])', LEFT(t.tipo, LENGTH(t.tipo) - 1), '[', RIGHT(t.tipo, 1), ']');
@@ -0,0 +1,10 @@
+-- progresso das campanhas em contadores fatiados: cada doação soma numa fatia aleatória,
+-- sem travar a linha da Campanha. a tarefa agendada "consolidar-progresso-campanhas" passa
+-- os litros inteiros para Campanha.quantidade_atual_litros e deixa a fração nas fatias.
+-- sem FK para Campanha de propósito: a checagem da FK travaria (em modo compartilhado) a linha da campanha.
+CREATE TABLE IF NOT EXISTS CampanhaProgresso (
+    id_campanha INT NOT NULL,
+    fatia TINYINT NOT NULL,
+    litros DECIMAL(10,3) NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_campanha, fatia)
+);
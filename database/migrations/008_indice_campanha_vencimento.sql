@@ -0,0 +1,23 @@
+-- campanhas ativas por data de término: usado pela tarefa "encerrar-campanhas-vencidas"
+-- (ativa = TRUE AND data_fim < hoje) e pela carga do catálogo (ativa = TRUE AND data_fim >= hoje).
+-- idx_ativa (schema original, database/schema_hemocentro.pdf) fica coberto pelo prefixo do novo índice.
+-- cada passo confere information_schema antes: índice ausente/já criado não interrompe a migração.
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'Campanha' AND index_name = 'idx_campanha_ativa_fim') = 0,
+    'ALTER TABLE Campanha ADD KEY idx_campanha_ativa_fim (ativa, data_fim)',
+    'DO 0'
+);
+PREPARE ddl FROM @ddl;
+EXECUTE ddl;
+DEALLOCATE PREPARE ddl;
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'Campanha' AND index_name = 'idx_ativa') > 0,
+    'ALTER TABLE Campanha DROP KEY idx_ativa',
+    'DO 0'
+);
+PREPARE ddl FROM @ddl;
+EXECUTE ddl;
+DEALLOCATE PREPARE ddl;
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# os módulos da API são importados como no app (back.utils..., config...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
@@ -0,0 +1,41 @@
+from datetime import date
+
+import pytest
+
+# auth_utils importa flask/jwt e o principal é carregado pelos models (conector do MySQL)
+pytest.importorskip('flask')
+pytest.importorskip('jwt')
+pytest.importorskip('mysql.connector')
+
+from back.models import UsuarioModel  # noqa: E402
+from back.utils import auth_utils  # noqa: E402
+
+USUARIO = {
+    'id_usuario': 3,
+    'tipo_usuario': 'doador',
+    'nome': 'Ana',
+    'email': 'ana@example.com',
+    'cpf': '52998224725',
+    'ativo': True,
+    'data_nascimento': date(1990, 5, 1),
+    'senha_hash': '$2b$12$abcdefghijklmnopqrstuv',
+    'telefone': '11999999999',
+}
+
+
+@pytest.fixture(autouse=True)
+def cache_limpo():
+    auth_utils.limpar_cache_principais()
+    yield
+    auth_utils.limpar_cache_principais()
+
+
+def test_principal_em_cache_nao_guarda_senha(monkeypatch):
+    monkeypatch.setattr(UsuarioModel, 'buscar_por_id', staticmethod(lambda id_usuario: dict(USUARIO)))
+    principal = auth_utils._carregar_principal(3)
+    assert 'senha_hash' not in principal['usuario']
+    assert set(principal['usuario']) <= set(auth_utils.CAMPOS_PRINCIPAL)
+    assert principal['usuario']['data_nascimento'] == date(1990, 5, 1)
+    # segunda chamada vem do cache, sem ir ao banco
+    monkeypatch.setattr(UsuarioModel, 'buscar_por_id', staticmethod(lambda id_usuario: None))
+    assert auth_utils._carregar_principal(3) is principal
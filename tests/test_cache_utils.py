@@ -0,0 +1,46 @@
+from back.utils import cache_utils
+from back.utils.cache_utils import TTLCache
+
+
+def test_get_set_e_expiracao(monkeypatch):
+    agora = [100.0]
+    monkeypatch.setattr(cache_utils.time, 'monotonic', lambda: agora[0])
+    cache = TTLCache(ttl=10)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    agora[0] += 10
+    assert cache.get('a') is None
+
+
+def test_leitura_anterior_a_invalidacao_nao_grava():
+    cache = TTLCache(ttl=60)
+    geracao = cache.geracao()
+    cache.pop('a')  # invalidação no meio da carga
+    assert cache.set('a', 'velho', geracao=geracao) is False
+    assert cache.get('a') is None
+    assert cache.set('a', 'novo', geracao=cache.geracao()) is True
+    assert cache.get('a') == 'novo'
+
+
+def test_remover_se_e_clear_avancam_a_geracao():
+    cache = TTLCache(ttl=60)
+    cache.set((1, 'x'), 1)
+    cache.set((2, 'y'), 2)
+    geracao = cache.geracao()
+    assert cache.remover_se(lambda chave, _: chave[0] == 1) == 1
+    assert cache.get((2, 'y')) == 2
+    assert cache.geracao() == geracao + 1
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.geracao() == geracao + 2
+
+
+def test_limite_de_entradas_descarta_a_menos_usada():
+    cache = TTLCache(ttl=60, max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
@@ -0,0 +1,38 @@
+import re
+
+import pytest
+
+from back.utils.campanha_service import tipos_da_campanha, TIPOS_SANGUINEOS
+
+
+# mesma condição do INSERT da migração 006 (REGEXP por tipo sobre o texto em maiúsculas)
+def _tipos_como_na_migracao(valor):
+    valor = (valor or '').upper()
+    if 'TODOS' in valor:
+        return set(TIPOS_SANGUINEOS)
+    return {
+        tipo for tipo in TIPOS_SANGUINEOS
+        if re.search('(^|[^A-Z])' + tipo[:-1] + '[' + tipo[-1] + ']', valor)
+    }
+
+
+@pytest.mark.parametrize('valor, esperado', [
+    ('AB+', {'AB+'}),
+    ('O-, A+', {'O-', 'A+'}),
+    ('a+ e b-', {'A+', 'B-'}),
+    ('Todos os tipos', set(TIPOS_SANGUINEOS)),
+    ('AB +', set()),
+    ('NAB+', set()),
+    ('A+B-', {'A+', 'B-'}),
+    ('', set()),
+    (None, set()),
+])
+def test_tipos_da_campanha(valor, esperado):
+    assert tipos_da_campanha(valor) == esperado
+
+
+@pytest.mark.parametrize('valor', [
+    'AB+', 'AB-, B+', 'O+ O-', 'AB +', 'NAB+', 'XO-', 'A+B-', 'tipo: b+', '(O-)', 'todos', 'AB+/AB-',
+])
+def test_tipos_da_campanha_igual_ao_preenchimento_da_migracao(valor):
+    assert tipos_da_campanha(valor) == _tipos_como_na_migracao(valor)
@@ -0,0 +1,89 @@
+import re
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+
+# os models importam o conector do MySQL e o comando de manutenção importa o flask
+pytest.importorskip('mysql.connector')
+pytest.importorskip('flask')
+
+from back.models import models  # noqa: E402
+from back.models import AgendamentoModel  # noqa: E402
+from back.utils.manutencao import CONSULTAS_INDEXADAS  # noqa: E402
+
+MIGRACAO_INDICES = Path(__file__).resolve().parents[1] / 'database' / 'migrations' / '003_indices_agendamento.sql'
+
+# função aplicada à coluna impede o uso do índice (data_hora, id_hemocentro/id_usuario + status + data_hora)
+_FUNCAO_NA_COLUNA = re.compile(r'\b[A-Z_]+\s*\(\s*(?:a\.)?data_hora\s*\)', re.IGNORECASE)
+
+
+class _BancoFalso:
+    def __init__(self):
+        self.consultas = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.consultas.append((sql, params))
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return None
+
+    def after_commit(self, funcao):
+        pass
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    falso = _BancoFalso()
+
+    @contextmanager
+    def get_db_manager(prepared=False):
+        yield falso
+
+    monkeypatch.setattr(models, 'get_db_manager', get_db_manager)
+    return falso
+
+
+# só os filtros importam (MAX(data_hora) na lista de colunas é resolvido pelo índice)
+def _clausula_where(sql):
+    return re.split(r'\bWHERE\b', sql, maxsplit=1, flags=re.IGNORECASE)[-1]
+
+
+def _filtros_de_data(sql):
+    return re.findall(r'(?:a\.)?data_hora\s*(>=|<=|<|>|=|BETWEEN)', sql, re.IGNORECASE)
+
+
+@pytest.mark.parametrize('chamada', [
+    lambda: AgendamentoModel.listar_todos(status='pendente', id_hemocentro=1, data_inicio='2026-03-02', limite=50),
+    lambda: AgendamentoModel.listar_todos(id_hemocentro=1, limite=50, cursor=(datetime(2026, 3, 2, 10), 9)),
+    lambda: AgendamentoModel.contar_agendamentos_dia(1, date(2026, 3, 2)),
+    lambda: AgendamentoModel.buscar_agendamentos_hoje(1),
+    lambda: AgendamentoModel.listar_proximos_agendamentos(1, 7),
+    lambda: AgendamentoModel.preflight(1, 1, datetime(2026, 3, 3, 1, 30)),
+])
+def test_filtros_de_data_hora_sao_sargaveis(banco, chamada):
+    chamada()
+    assert banco.consultas
+    for sql, _ in banco.consultas:
+        assert not _FUNCAO_NA_COLUNA.search(_clausula_where(sql)), sql
+        assert 'BETWEEN' not in [op.upper() for op in _filtros_de_data(sql)], sql
+
+
+def test_dia_e_intervalo_semiaberto(banco):
+    AgendamentoModel.contar_agendamentos_dia(1, '2026-03-02')
+    sql, params = banco.consultas[0]
+    assert re.search(r'data_hora\s*>=\s*%s', sql) and re.search(r'data_hora\s*<\s*%s', sql)
+    assert params[-2:] == (datetime(2026, 3, 2), datetime(2026, 3, 3))
+
+
+@pytest.mark.parametrize('nome, sql, parametros, indice', CONSULTAS_INDEXADAS)
+def test_consultas_de_regressao(nome, sql, parametros, indice):
+    # verificar-indices roda EXPLAIN nessas consultas: precisam usar a coluna crua e um índice que exista
+    assert not _FUNCAO_NA_COLUNA.search(_clausula_where(sql)), nome
+    assert sql.count('%s') == len(parametros(datetime(2026, 3, 2), datetime(2026, 3, 3))), nome
+    assert indice in MIGRACAO_INDICES.read_text(encoding='utf-8'), nome
@@ -0,0 +1,74 @@
+from datetime import date
+
+from back.utils import elegibilidade_service
+from back.utils.elegibilidade_service import (
+    intervalo_minimo, proxima_doacao_permitida, proxima_doacao_do_tipo, elegibilidade,
+    invalidar_elegibilidade, INTERVALO_PADRAO_DIAS
+)
+
+
+def _com_ultima_doacao(monkeypatch, data, tipo, proxima=None):
+    monkeypatch.setattr(
+        elegibilidade_service, '_ultima_doacao',
+        lambda id_usuario: {'data': data, 'tipo': tipo, 'proxima': proxima}
+    )
+
+
+def test_intervalo_minimo_por_tipo():
+    assert intervalo_minimo('sangue_total') == 75
+    assert intervalo_minimo('plaquetas') == 2
+    assert intervalo_minimo('aferese') == 7
+
+
+def test_intervalo_minimo_tipo_desconhecido_usa_padrao():
+    assert intervalo_minimo('outro') == INTERVALO_PADRAO_DIAS
+
+
+def test_proxima_doacao_permitida():
+    assert proxima_doacao_permitida(None, 'sangue_total') is None
+    assert proxima_doacao_permitida(date(2026, 1, 1), 'sangue_total') == date(2026, 3, 17)
+
+
+def test_sem_doacoes_pode_doar(monkeypatch):
+    _com_ultima_doacao(monkeypatch, None, None)
+    resultado = elegibilidade(1, hoje=date(2026, 1, 1))
+    assert resultado['pode_doar'] is True
+    assert resultado['proxima_doacao_permitida'] is None
+    assert all(t['pode_doar'] for t in resultado['tipos'].values())
+
+
+def test_pode_doar_segue_o_tipo_da_ultima_doacao(monkeypatch):
+    # dias depois de sangue total: plaquetas liberadas, mas o doador (de sangue total) ainda não
+    _com_ultima_doacao(monkeypatch, date(2026, 1, 1), 'sangue_total')
+    resultado = elegibilidade(1, hoje=date(2026, 1, 5))
+    assert resultado['tipos']['plaquetas']['pode_doar'] is True
+    assert resultado['tipos']['sangue_total']['pode_doar'] is False
+    assert resultado['pode_doar'] is False
+    assert resultado['proxima_doacao_permitida'] == '2026-03-17'
+
+
+def test_usa_proxima_doacao_gravada_no_historico(monkeypatch):
+    _com_ultima_doacao(monkeypatch, date(2026, 1, 1), 'sangue_total', proxima=date(2026, 1, 10))
+    assert elegibilidade(1, hoje=date(2026, 1, 10))['pode_doar'] is True
+    assert elegibilidade(1, hoje=date(2026, 1, 9))['pode_doar'] is False
+
+
+def test_doacao_sem_agendamento_realizado_bloqueia_agendamento_e_elegibilidade(monkeypatch):
+    # doação registrada direto no histórico (id_agendamento NULL, nenhum Agendamento realizado)
+    historico = {
+        'id_doacao': 7, 'id_usuario': 42, 'id_agendamento': None,
+        'data_doacao': date(2026, 1, 1), 'tipo_doacao': 'sangue_total',
+        'proxima_doacao_permitida': date(2026, 3, 17)
+    }
+    monkeypatch.setattr(elegibilidade_service, '_carregar_ultima_doacao', lambda id_usuario: historico)
+    invalidar_elegibilidade(42)
+    try:
+        # o agendamento usa proxima_doacao_do_tipo; o GET /elegibilidade tem que concordar
+        proxima = proxima_doacao_do_tipo(42, 'sangue_total')
+        assert proxima == date(2026, 3, 17)
+        resultado = elegibilidade(42, hoje=date(2026, 2, 1))
+        assert resultado['tipos']['sangue_total']['proxima_doacao_permitida'] == proxima.isoformat()
+        assert resultado['tipos']['sangue_total']['pode_doar'] is False
+        assert resultado['pode_doar'] is False
+    finally:
+        invalidar_elegibilidade(42)
@@ -0,0 +1,132 @@
+import sys
+import time
+from contextlib import contextmanager
+
+import pytest
+
+# os models importam o conector do MySQL
+pytest.importorskip('mysql.connector')
+
+from back.models import models  # noqa: E402
+from back.models import EstoqueModel  # noqa: E402
+
+TIPOS = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+
+# custo de ida e volta ao banco numa rede local; cada execute/executemany conta uma vez
+# (o conector junta o executemany de INSERT num único INSERT multi-row)
+LATENCIA_SIMULADA = 0.002
+
+
+class _BancoFalso:
+    def __init__(self, latencia=0):
+        self.latencia = latencia
+        self.idas = 0
+        self.estoque = {tipo: 20 for tipo in TIPOS}
+        self.rowcount = 0
+        self._linhas = []
+
+    def _linha(self, tipo):
+        return {'id_hemocentro': 1, 'tipo_sanguineo': tipo, 'quantidade': self.estoque[tipo]}
+
+    def execute(self, sql, params=None):
+        self.idas += 1
+        time.sleep(self.latencia)
+        sql = ' '.join(sql.split())
+        if sql.startswith('INSERT INTO Estoque'):
+            _, tipo, _, delta = params
+            self.estoque[tipo] = self.estoque.get(tipo, 0) + delta
+            self._linhas = []
+        elif sql.startswith('SELECT') and 'tipo_sanguineo = %s' in sql:
+            self._linhas = [self._linha(params[1])]
+        elif sql.startswith('SELECT'):
+            self._linhas = [self._linha(tipo) for tipo in sorted(self.estoque)]
+        else:
+            self._linhas = []
+
+    def executemany(self, sql, seq_params):
+        self.idas += 1
+        time.sleep(self.latencia)
+        if sql.split()[2] == 'Estoque':
+            for _, tipo, quantidade in seq_params:
+                self.estoque[tipo] = quantidade
+
+    def fetchone(self):
+        return self._linhas[0] if self._linhas else None
+
+    def fetchall(self):
+        return self._linhas
+
+    def after_commit(self, funcao):
+        pass
+
+
+def _instalar(monkeypatch, banco):
+    transacoes = []
+
+    @contextmanager
+    def get_db_manager(prepared=False):
+        transacoes.append(banco.idas)
+        yield banco
+
+    monkeypatch.setattr(models, 'get_db_manager', get_db_manager)
+    return transacoes
+
+
+# fechamento de turno: entrada em todos os tipos, pelo caminho antigo (uma chamada por tipo)
+def _por_item(deltas):
+    for tipo, delta in deltas.items():
+        EstoqueModel.adicionar_estoque(1, tipo, delta, id_usuario=7)
+
+
+def _em_lote(deltas):
+    EstoqueModel.aplicar_movimentacoes(
+        1, [{'tipo_sanguineo': tipo, 'delta': delta} for tipo, delta in deltas.items()], id_usuario=7
+    )
+
+
+def _medir(monkeypatch, caminho, deltas, latencia=0):
+    banco = _BancoFalso(latencia)
+    transacoes = _instalar(monkeypatch, banco)
+    inicio = time.perf_counter()
+    caminho(deltas)
+    return banco, len(transacoes), time.perf_counter() - inicio
+
+
+def test_lote_e_por_item_chegam_ao_mesmo_estoque(monkeypatch):
+    deltas = {tipo: i + 1 for i, tipo in enumerate(TIPOS)}
+    por_item, _, _ = _medir(monkeypatch, _por_item, deltas)
+    lote, _, _ = _medir(monkeypatch, _em_lote, deltas)
+    assert lote.estoque == por_item.estoque
+
+
+def test_lote_usa_idas_constantes(monkeypatch):
+    for quantidade in (1, 4, 8):
+        deltas = {tipo: 3 for tipo in TIPOS[:quantidade]}
+        banco, transacoes, _ = _medir(monkeypatch, _em_lote, deltas)
+        # trava, upsert, livro, agregado diário, releitura
+        assert (transacoes, banco.idas) == (1, 5)
+
+
+def test_por_item_cresce_com_os_tipos(monkeypatch):
+    deltas = {tipo: 3 for tipo in TIPOS}
+    banco, transacoes, _ = _medir(monkeypatch, _por_item, deltas)
+    # upsert, releitura, livro, agregado diário por tipo
+    assert (transacoes, banco.idas) == (8, 32)
+
+
+# benchmark: PYTHONPATH=app python tests/test_estoque_lote.py [rodadas]
+if __name__ == '__main__':
+    rodadas = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    deltas = {tipo: 3 for tipo in TIPOS}
+    with pytest.MonkeyPatch.context() as mp:
+        for nome, caminho in (('por item', _por_item), ('lote', _em_lote)):
+            tempos = []
+            for _ in range(rodadas):
+                banco, transacoes, tempo = _medir(mp, caminho, deltas, LATENCIA_SIMULADA)
+                tempos.append(tempo)
+            tempos.sort()
+            print(
+                f"{nome:>9}: {transacoes} transação(ões), {banco.idas} idas ao banco, "
+                f"mediana {tempos[len(tempos) // 2] * 1000:.1f} ms "
+                f"(latência simulada {LATENCIA_SIMULADA * 1000:.0f} ms/ida, {rodadas} rodadas)"
+            )
@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+
+import pytest
+
+# os models importam o conector do MySQL
+pytest.importorskip('mysql.connector')
+
+from back.models import models  # noqa: E402
+from back.models import HemocentroModel  # noqa: E402
+
+CNPJ = '11.222.333/0001-81'
+
+
+class _BancoFalso:
+    def __init__(self, linha):
+        self.linha = linha
+        self.rowcount = 1
+        self.callbacks = []
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchone(self):
+        return self.linha
+
+    def after_commit(self, funcao):
+        self.callbacks.append(funcao)
+
+
+@pytest.fixture
+def invalidados(monkeypatch):
+    banco = _BancoFalso({'id_hemocentro': 7})
+    chamadas = []
+
+    @contextmanager
+    def get_db_manager(prepared=False):
+        yield banco
+        for funcao in banco.callbacks:
+            funcao()
+
+    monkeypatch.setattr(models, 'get_db_manager', get_db_manager)
+    monkeypatch.setattr(models, 'invalidar_snapshot', lambda *a: chamadas.append(('snapshot',) + a))
+    monkeypatch.setattr(models, 'invalidar_principal', lambda **kw: chamadas.append(('principal', kw)))
+    monkeypatch.setattr(models, 'invalidar_hemocentros', lambda: None)
+    monkeypatch.setattr(models, 'invalidar_catalogo', lambda: None)
+    monkeypatch.setattr(HemocentroModel, 'buscar_por_cnpj', staticmethod(lambda cnpj: {'id_hemocentro': 7}))
+    return chamadas
+
+
+# alteração por CNPJ limpa só o snapshot de estoque daquele hemocentro
+@pytest.mark.parametrize('chamada', [
+    lambda: HemocentroModel.atualizar(CNPJ, {'nome': 'Hemocentro Centro'}),
+    lambda: HemocentroModel.deletar(CNPJ),
+    lambda: HemocentroModel.atualizar_por_id(7, {'nome': 'Hemocentro Centro'}),
+])
+def test_alteracao_invalida_so_o_hemocentro_alterado(invalidados, chamada):
+    chamada()
+    assert ('snapshot', 7) in invalidados
+    assert all(c[1] is not None for c in invalidados if c[0] == 'snapshot')
+    principal = [c[1] for c in invalidados if c[0] == 'principal']
+    assert principal and principal[0]['id_hemocentro'] == 7
@@ -0,0 +1,25 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from back.utils import hemocentro_service
+from back.utils.hemocentro_service import esta_aberto
+
+
+def _grade_aberta_em(agora, fechamento=None):
+    dia = (agora.weekday() + 1) % 7
+    return {dia: [(time(agora.hour, 0), fechamento or time(agora.hour, 59, 59))]}
+
+
+def test_esta_aberto_dentro_e_fora_da_grade():
+    agora = datetime(2026, 3, 2, 10, 30)
+    grade = _grade_aberta_em(agora)
+    assert esta_aberto(grade, agora)
+    assert not esta_aberto(grade, agora + timedelta(hours=2))
+    assert not esta_aberto(grade, agora + timedelta(days=1))
+
+
+# sem 'agora', vale o relógio no fuso do hemocentro, não o do servidor
+def test_esta_aberto_usa_fuso_do_hemocentro(monkeypatch):
+    fuso = ZoneInfo('Pacific/Kiritimati')  # UTC+14: dia e hora diferentes de qualquer servidor em UTC
+    monkeypatch.setattr(hemocentro_service, 'FUSO_HORARIO', fuso)
+    assert esta_aberto(_grade_aberta_em(datetime.now(fuso), fechamento=time(23, 59, 59)))
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+import pytest
+
+from back.utils.paginacao import (
+    tamanho_pagina, codificar_cursor, decodificar_cursor, PAGINA_PADRAO, PAGINA_MAXIMA
+)
+
+
+def test_cursor_ida_e_volta():
+    cursor = codificar_cursor(datetime(2026, 3, 2, 16, 30, 15), 1234)
+    assert '=' not in cursor
+    assert decodificar_cursor(cursor) == (datetime(2026, 3, 2, 16, 30, 15), 1234)
+
+
+@pytest.mark.parametrize('cursor', ['', 'nao-e-base64!', codificar_cursor(datetime(2026, 1, 1), 1)[:-3]])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor)
+
+
+def test_tamanho_pagina():
+    assert tamanho_pagina(None) == PAGINA_PADRAO
+    assert tamanho_pagina('') == PAGINA_PADRAO
+    assert tamanho_pagina('10') == 10
+    assert tamanho_pagina(str(PAGINA_MAXIMA + 1)) == PAGINA_MAXIMA
+    with pytest.raises(ValueError):
+        tamanho_pagina('0')
+    with pytest.raises(ValueError):
+        tamanho_pagina('abc')
@@ -0,0 +1,61 @@
+from datetime import date, datetime, time, timezone, timedelta
+
+from back.utils.slots import slot_de, slots_do_dia, para_hora_local, para_utc, intervalo_utc_do_dia_local
+from back.utils.hemocentro_service import janelas_do_dia
+
+JANELAS = [(time(8, 0), time(12, 0)), (time(13, 0), time(17, 0))]
+
+
+def test_slot_de_alinha_pela_abertura():
+    assert slot_de(datetime(2026, 3, 2, 8, 44), JANELAS, 30) == datetime(2026, 3, 2, 8, 30)
+    assert slot_de(datetime(2026, 3, 2, 13, 0), JANELAS, 45) == datetime(2026, 3, 2, 13, 0)
+    assert slot_de(datetime(2026, 3, 2, 14, 40), JANELAS, 45) == datetime(2026, 3, 2, 14, 30)
+
+
+def test_slot_de_fora_do_funcionamento():
+    assert slot_de(datetime(2026, 3, 2, 7, 59), JANELAS, 30) is None
+    assert slot_de(datetime(2026, 3, 2, 12, 0), JANELAS, 30) is None
+    assert slot_de(datetime(2026, 3, 2, 17, 0), JANELAS, 30) is None
+
+
+def test_slot_de_sem_horarios_cadastrados():
+    assert slot_de(datetime(2026, 3, 2, 23, 50), None, 30) == datetime(2026, 3, 2, 23, 30)
+
+
+def test_slots_do_dia():
+    slots = slots_do_dia(date(2026, 3, 2), [(time(13, 0), time(14, 0)), (time(8, 0), time(9, 0))], 30)
+    assert slots == [
+        datetime(2026, 3, 2, 8, 0), datetime(2026, 3, 2, 8, 30),
+        datetime(2026, 3, 2, 13, 0), datetime(2026, 3, 2, 13, 30),
+    ]
+    assert len(slots_do_dia(date(2026, 3, 2), None, 60)) == 24
+
+
+def test_janelas_do_dia():
+    agenda = {'tem_horarios': True, 'grade': {1: JANELAS}}
+    assert janelas_do_dia(agenda, date(2026, 3, 2)) == JANELAS  # segunda-feira
+    assert janelas_do_dia(agenda, date(2026, 3, 1)) == []  # domingo sem horário
+    assert janelas_do_dia({'tem_horarios': False, 'grade': {}}, date(2026, 3, 2)) is None
+
+
+def test_conversao_utc_e_hora_local():
+    # America/Sao_Paulo (padrão): UTC-3, sem horário de verão
+    assert para_hora_local(datetime(2026, 3, 2, 19, 0)) == datetime(2026, 3, 2, 16, 0)
+    assert para_utc(datetime(2026, 3, 2, 16, 0)) == datetime(2026, 3, 2, 19, 0)
+    com_fuso = datetime(2026, 3, 2, 16, 0, tzinfo=timezone(timedelta(hours=-3)))
+    assert para_hora_local(com_fuso) == datetime(2026, 3, 2, 16, 0)
+
+
+def test_horario_com_fuso_cai_no_slot_local():
+    # 16:00-03:00 é 19:00 UTC; o slot precisa ser o das 16:00 locais, dentro do funcionamento
+    pedido = datetime.fromisoformat('2026-03-02T16:00-03:00')
+    local = para_hora_local(pedido)
+    assert slot_de(local, JANELAS, 30) == datetime(2026, 3, 2, 16, 0)
+
+
+def test_intervalo_utc_do_dia_local():
+    # 22:30 locais de 02/03 = 01:30 UTC de 03/03: continua sendo o dia 02/03 local
+    inicio, fim = intervalo_utc_do_dia_local(datetime(2026, 3, 3, 1, 30))
+    assert inicio == datetime(2026, 3, 2, 3, 0)
+    assert fim == datetime(2026, 3, 3, 3, 0)
+    assert inicio <= datetime(2026, 3, 3, 1, 30) < fim